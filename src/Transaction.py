@@ -2,33 +2,87 @@
 Transaction class for handling RBC credit card transactions
 """
 
+import sys
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
+
+# Values of Transaction.status
+STATUS_NEW = 'new'              # Parsed, not uploaded yet
+STATUS_UPLOADED = 'uploaded'    # Page created in Notion
+STATUS_EXISTS = 'exists'        # Already in Notion (or repeated in the same batch), not uploaded again
+STATUS_FAILED = 'failed'        # Upload failed
 
 
 class Transaction:
-    def __init__(self, id: str, amount: float, date: datetime, title: str, location: str):
+    """
+    Compact record for one DEBIT transaction, used from the parser through to the uploader
+
+    Slotted (no per-instance __dict__), with merchant, location and account strings interned
+    so repeated merchants share one string. Category, upload status, the ID of the Notion page
+    created for it and the needs-review flag (set when a headless run uploads a provisional
+    category) are carried inline.
+    Also supports dict-style access (transaction['title'], transaction.get('account', ''))
+    so code written against the old transaction dictionaries keeps working.
+    """
+
+    __slots__ = ('id', 'amount', 'date', 'title', 'location', 'account', 'category', 'status', 'needs_review',
+                 'page_id')
+
+    FIELDS = frozenset(__slots__)
+
+    def __init__(self, id: str, amount: float, date: Optional[datetime], title: str, location: str,
+                 account: str = '', category: Optional[str] = None, status: str = STATUS_NEW,
+                 needs_review: bool = False, page_id: Optional[str] = None):
         self.id = id
         self.amount = amount
         self.date = date
-        self.title = title
-        self.location = location
-        self.category = "Misc"  # Default category
+        self.title = sys.intern(title)
+        self.location = sys.intern(location)
+        self.account = sys.intern(account)
+        self.category = category  # None until categorized
+        self.status = status
+        self.needs_review = needs_review  # Provisional category, waiting in the review queue
+        self.page_id = page_id  # Notion page created by the upload, None if it wasn't uploaded by this run
 
     def set_category(self, category: str):
         """Set the transaction category"""
-        self.category = category
+        self.category = sys.intern(category)
+
+    def __getitem__(self, key: str):
+        if key not in Transaction.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in Transaction.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in Transaction.FIELDS
+
+    def get(self, key: str, default=None):
+        """dict.get() equivalent"""
+        return getattr(self, key) if key in Transaction.FIELDS else default
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.__slots__)
 
     def to_dict(self) -> dict:
         """Convert transaction to dictionary format"""
-        return {
-            'id': self.id,
-            'amount': self.amount,
-            'date': self.date,
-            'title': self.title,
-            'location': self.location,
-            'category': self.category
-        }
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Transaction):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    __hash__ = None  # Mutable (category, status)
+
+    def __repr__(self) -> str:
+        return (f"Transaction(id={self.id!r}, amount={self.amount!r}, date={self.date!r}, title={self.title!r}, "
+                f"location={self.location!r}, account={self.account!r}, category={self.category!r}, "
+                f"status={self.status!r}, needs_review={self.needs_review!r}, page_id={self.page_id!r})")
 
     def __str__(self) -> str:
-        return f"Transaction({self.title}, ${self.amount:.2f}, {self.category})"
\ No newline at end of file
+        return f"Transaction({self.title}, ${self.amount:.2f}, {self.category or 'Uncategorized'})"
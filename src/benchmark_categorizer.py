@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Categorizer throughput benchmark against the deterministic fake Ollama server
+Compares one-request-per-transaction, batched, batched + concurrent, and warm-cache runs
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama_server import FakeOllamaServer
+from qfx_parser import QFXParser
+from synthetic_qfx import write_synthetic_qfx
+from transaction_categorizer import TransactionCategorizer
+
+# (label, batch_size, max_parallel_requests, warm cache)
+MODES = [
+    ('single', 1, 1, False),
+    ('batched', 10, 1, False),
+    ('batched+parallel', 10, 4, False),
+    ('warm cache', 10, 4, True),
+]
+
+
+def load_transactions(count: int, seed: int, unmatched_ratio: float) -> List[Dict]:
+    """Parse a synthetic QFX file with the given number of STMTTRN blocks"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        qfx_path = os.path.join(temp_dir, 'synthetic.qfx')
+        write_synthetic_qfx(qfx_path, count, seed=seed, unmatched_ratio=unmatched_ratio)
+        return QFXParser(qfx_path).parse_file()
+
+
+def benchmark_mode(transactions: List[Dict], label: str, batch_size: int, parallel: int,
+                   warm_cache: bool, cache_path: str, args) -> Dict:
+    """Categorize every transaction against a fresh fake server and report throughput"""
+    with FakeOllamaServer(latency=args.latency, token_latency=args.token_latency,
+                          prompt_token_latency=args.prompt_token_latency, num_parallel=args.num_parallel) as server:
+        # A zero threshold accepts every AI answer, so no manual prompts interrupt the run
+        categorizer = TransactionCategorizer(model_name='llama3.2', confidence_threshold=0.0,
+                                             batch_size=batch_size, max_parallel_requests=parallel,
+                                             cache_path=cache_path, host=server.host, use_embeddings=False)
+        if warm_cache:
+            with contextlib.redirect_stdout(io.StringIO()):
+                categorizer.categorize_transactions(transactions)
+            for counter in ('chat_requests', 'eval_count', 'prompt_eval_count', 'cached_prompt_tokens'):
+                server.stats[counter] = 0
+
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            categorizer.categorize_transactions(transactions)
+        seconds = time.perf_counter() - start_time
+        categorizer.category_cache.close()
+
+        result = {
+            'mode': label,
+            'batch_size': batch_size,
+            'max_parallel_requests': parallel,
+            'warm_cache': warm_cache,
+            'seconds': round(seconds, 3),
+            'transactions_per_sec': round(len(transactions) / seconds, 1) if seconds else None,
+            'chat_requests': server.stats['chat_requests'],
+            'prompt_eval_count': server.stats['prompt_eval_count'],
+            'cached_prompt_tokens': server.stats['cached_prompt_tokens'],
+            'eval_count': server.stats['eval_count'],
+            'max_concurrent': server.stats['max_concurrent'],
+        }
+
+    print(f"   {label:<17} {result['transactions_per_sec']:>8.1f} txn/s, {result['chat_requests']:>4} request(s), "
+          f"{result['prompt_eval_count']:>7,} prompt tokens evaluated ({result['cached_prompt_tokens']:>7,} cached), "
+          f"{result['eval_count']:>6,} output tokens")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TransactionCategorizer against a fake Ollama server")
+    parser.add_argument('--transactions', type=int, default=200, help="STMTTRN blocks to generate")
+    parser.add_argument('--unmatched-ratio', type=float, default=0.5,
+                        help="Share of merchants no rule matches (these reach the LLM)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds per chat request")
+    parser.add_argument('--token-latency', type=float, default=0.002, help="Extra seconds per output token")
+    parser.add_argument('--prompt-token-latency', type=float, default=0.0005,
+                        help="Extra seconds per prompt token the server has not cached")
+    parser.add_argument('--num-parallel', type=int, default=4, help="Requests the fake server runs at once")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=Path, default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    transactions = load_transactions(args.transactions, args.seed, args.unmatched_ratio)
+    print(f"🤖 Categorizing {len(transactions)} DEBIT transactions with a fake Ollama server "
+          f"({args.latency * 1000:.0f}ms/request, {args.num_parallel} parallel slot(s))...")
+
+    results = []
+    for label, batch_size, parallel, warm_cache in MODES:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_path = os.path.join(temp_dir, 'categorization_cache.db')
+            results.append(benchmark_mode(transactions, label, batch_size, parallel, warm_cache, cache_path, args))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args) | {'output': str(args.output)}, 'results': results}, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
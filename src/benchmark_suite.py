@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the parsing and formatting hot paths
+Times QFXParser.parse_file, _parse_date, _apply_rules, _format_transaction_for_notion and the
+spending analytics on synthetic QFX files, tracks peak memory, and writes the results to a JSON file
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from qfx_parser import QFXParser
+from synthetic_qfx import write_synthetic_qfx
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_OUTPUT = Path(__file__).parent.parent / 'benchmark_results.json'
+DATE_PATTERN = re.compile(r'<DTPOSTED>([^<\r\n]+)')
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    """Run a function several times and return the fastest wall-clock time in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+def peak_memory(function: Callable[[], object]) -> int:
+    """Return the peak traced allocation (bytes) while running a function"""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def timing_entry(seconds: float, operations: int, peak_bytes: Optional[int] = None) -> Dict:
+    """Machine-readable timing record"""
+    entry = {
+        'seconds': round(seconds, 6),
+        'operations': operations,
+        'us_per_op': round(seconds / operations * 1e6, 3) if operations else None,
+        'ops_per_sec': round(operations / seconds) if seconds else None,
+    }
+    if peak_bytes is not None:
+        entry['peak_memory_bytes'] = peak_bytes
+    return entry
+
+
+def benchmark_size(transaction_count: int, seed: int, repeat: int, categorizer, notion_client) -> Dict:
+    """Benchmark every hot path on one synthetic file"""
+    print(f"\n📊 {transaction_count:,} synthetic transactions")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        qfx_path = os.path.join(temp_dir, 'synthetic.qfx')
+        file_bytes = write_synthetic_qfx(qfx_path, transaction_count, seed=seed)
+
+        # Each run gets a fresh parser so the date cache starts cold, as it does in a real sync
+        parse = lambda: QFXParser(qfx_path).parse_file()
+        transactions = parse()
+        parse_seconds = best_time(parse, repeat)
+        parse_peak = peak_memory(parse)
+
+        with open(qfx_path, 'r', encoding='utf-8') as f:
+            raw_dates = DATE_PATTERN.findall(f.read())
+
+    def parse_dates():
+        parser = QFXParser(qfx_path)
+        for raw_date in raw_dates:
+            parser._parse_date(raw_date)
+
+    def apply_rules():
+        return [categorizer._apply_rules(transaction) for transaction in transactions]
+
+    categories = [category or 'Misc' for category in apply_rules()]
+
+    def format_for_notion():
+        for transaction, category in zip(transactions, categories):
+            notion_client._format_transaction_for_notion(transaction, category)
+
+    results = {
+        'transactions': transaction_count,
+        'debit_transactions': len(transactions),
+        'file_bytes': file_bytes,
+        'rule_matches': sum(1 for category in apply_rules() if category),
+        'parse_file': timing_entry(parse_seconds, len(transactions), parse_peak),
+        'parse_date': timing_entry(best_time(parse_dates, repeat), len(raw_dates)),
+        'apply_rules': timing_entry(best_time(apply_rules, repeat), len(transactions)),
+        'format_for_notion': timing_entry(best_time(format_for_notion, repeat), len(transactions)),
+    }
+
+    # Analytics is optional (numpy); categories come from the rules, as in `main.py --report`
+    try:
+        from spending_analytics import SpendingAnalytics
+    except ImportError:
+        SpendingAnalytics = None
+    if SpendingAnalytics is not None:
+        categorizer.categorize_offline(transactions)
+        analytics = SpendingAnalytics(transactions)
+        results['analytics_load'] = timing_entry(best_time(lambda: SpendingAnalytics(transactions), repeat),
+                                                 len(transactions))
+        results['analytics_report'] = timing_entry(best_time(analytics.format_report, repeat), len(analytics))
+
+    print(f"   parse_file:        {results['parse_file']['seconds']:.3f}s "
+          f"({results['parse_file']['ops_per_sec']:,}/s, peak {parse_peak / 1024 / 1024:.1f} MiB)")
+    for name in ('parse_date', 'apply_rules', 'format_for_notion', 'analytics_load', 'analytics_report'):
+        if name not in results:
+            continue
+        print(f"   {name + ':':<18} {results[name]['seconds']:.3f}s ({results[name]['us_per_op']:.2f} µs/op)")
+    print(f"   Rules matched {results['rule_matches']:,}/{len(transactions):,} DEBIT transactions")
+    return results
+
+
+def git_revision() -> Optional[str]:
+    """Current git commit of the repository, if available"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(previous: Dict, current: Dict):
+    """Print the time ratio (current / previous) of every metric present in both runs"""
+    previous_by_size = {result['transactions']: result for result in previous.get('results', [])}
+    print(f"\n🔍 Compared with {previous.get('git_revision') or 'previous run'} (ratio < 1.00 is faster):")
+    for result in current['results']:
+        old = previous_by_size.get(result['transactions'])
+        if not old:
+            continue
+        for name in ('parse_file', 'parse_date', 'apply_rules', 'format_for_notion',
+                     'analytics_load', 'analytics_report'):
+            if name in old and name in result and old[name]['seconds']:
+                ratio = result[name]['seconds'] / old[name]['seconds']
+                marker = '⚠️ ' if ratio > 1.1 else '  '
+                print(f" {marker} {result['transactions']:>9,} {name:<18} {ratio:.2f}x")
+
+
+def run_benchmarks(sizes: List[int], seed: int = 42, repeat: int = 3) -> Dict:
+    """Run the suite for every size and return the results document"""
+    from notion_client import NotionClient
+    from transaction_categorizer import TransactionCategorizer
+
+    # No network or model access happens here; the clients are only used for their local helpers
+    categorizer = TransactionCategorizer(model_name='benchmark', use_cache=False)
+    notion_client = NotionClient(api_key='benchmark', database_id='benchmark')
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+        'results': [benchmark_size(size, seed, repeat, categorizer, notion_client) for size in sizes],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing, rule matching and Notion formatting")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Transaction counts to generate (default: 1000 10000 100000; up to 1000000)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the synthetic QFX generator")
+    parser.add_argument('--repeat', type=int, default=3, help="Timing runs per measurement, fastest is kept")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT,
+                        help=f"JSON results file (default: {DEFAULT_OUTPUT.name} in the project root)")
+    parser.add_argument('--compare', type=Path, default=None,
+                        help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, seed=args.seed, repeat=args.repeat)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
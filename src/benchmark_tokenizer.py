@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-field regex extraction vs single-pass tag tokenizer
+Generates a synthetic QFX file and times both ways of pulling fields out of every STMTTRN block
+"""
+
+import sys
+import os
+import re
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from qfx_parser import QFXParser
+from synthetic_qfx import write_synthetic_qfx
+
+FIELDS = ['TRNTYPE', 'FITID', 'DTPOSTED', 'TRNAMT', 'NAME', 'MEMO']
+
+
+def benchmark_tokenizer(transaction_count: int = 100_000):
+    print(f"Benchmarking field extraction on {transaction_count:,} synthetic transactions...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        qfx_path = os.path.join(temp_dir, 'synthetic.qfx')
+        write_synthetic_qfx(qfx_path, transaction_count)
+
+        with open(qfx_path, 'r', encoding='utf-8') as f:
+            blocks = re.findall(r'<STMTTRN>(.*?)</STMTTRN>', f.read(), re.DOTALL)
+
+        parser = QFXParser(qfx_path)
+
+        # Baseline: one regex search per field (six scans per block)
+        start_time = time.perf_counter()
+        per_field = [{field: parser._extract_field_value(block, field) for field in FIELDS} for block in blocks]
+        per_field_time = time.perf_counter() - start_time
+
+        # Single pass over each block
+        start_time = time.perf_counter()
+        single_pass = [parser._extract_fields(block) for block in blocks]
+        single_pass_time = time.perf_counter() - start_time
+
+        mismatches = sum(
+            1 for expected, actual in zip(per_field, single_pass)
+            if any(expected[field] != actual.get(field, '') for field in FIELDS)
+        )
+
+        start_time = time.perf_counter()
+        parsed = parser.parse_file()
+        parse_time = time.perf_counter() - start_time
+
+    print(f"   Per-field regex:    {per_field_time:.3f}s")
+    print(f"   Single-pass tokens: {single_pass_time:.3f}s ({per_field_time / single_pass_time:.1f}x faster)")
+    print(f"   Full parse_file():  {parse_time:.3f}s for {len(parsed):,} DEBIT transactions")
+
+    if mismatches:
+        print(f"❌ {mismatches} block(s) extracted differently")
+        return False
+
+    print("✅ Both extractors returned identical fields")
+    return True
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    benchmark_tokenizer(count)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Uploader throughput benchmark against the local fake Notion API
+Measures transactions/second for several worker counts under simulated latency and faults
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_notion_server import FakeNotionServer
+from notion_client import NotionClient
+from qfx_parser import QFXParser
+from synthetic_qfx import write_synthetic_qfx
+
+
+def load_transactions(count: int, seed: int) -> List[Dict]:
+    """Parse a synthetic QFX file with the given number of STMTTRN blocks"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        qfx_path = os.path.join(temp_dir, 'synthetic.qfx')
+        write_synthetic_qfx(qfx_path, count, seed=seed)
+        return QFXParser(qfx_path).parse_file()
+
+
+def benchmark_workers(transactions: List[Dict], workers: int, args) -> Dict:
+    """Upload every transaction to a fresh fake server and report throughput"""
+    with FakeNotionServer(latency=args.latency, latency_jitter=args.latency_jitter,
+                          rate_limit_every=args.rate_limit_every, retry_after=args.retry_after,
+                          error_rate=args.error_rate, seed=args.seed) as server:
+        client = NotionClient(api_key='benchmark', database_id=server.database_id, base_url=server.base_url,
+                              max_workers=workers, requests_per_second=args.requests_per_second)
+
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            uploaded = client.upload_transactions(transactions)
+        seconds = time.perf_counter() - start_time
+
+        stored_ids = server.transaction_ids()
+        latency = client.get_latency_stats()
+        result = {
+            'workers': workers,
+            'uploaded': uploaded,
+            'pages_stored': len(stored_ids),
+            'duplicate_pages': len(stored_ids) - len(set(stored_ids)),
+            'seconds': round(seconds, 3),
+            'transactions_per_sec': round(len(transactions) / seconds, 1) if seconds else None,
+            'requests': server.stats['requests'],
+            'rate_limited': server.stats['rate_limited'],
+            'server_errors': server.stats['server_errors'],
+            'connections_opened': latency['connections_opened'],
+            'p95_latency_ms': round(latency['p95'] * 1000, 1),
+        }
+
+    print(f"   {workers:>2} worker(s): {result['transactions_per_sec']:>8.1f} txn/s, "
+          f"{result['uploaded']}/{len(transactions)} uploaded, {result['requests']} requests "
+          f"({result['rate_limited']} 429s, {result['server_errors']} 5xx), "
+          f"{result['duplicate_pages']} duplicate page(s)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NotionClient uploads against a local fake Notion API")
+    parser.add_argument('--transactions', type=int, default=500, help="STMTTRN blocks to generate")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--requests-per-second', type=float, default=1000.0,
+                        help="Client rate limit (the real API allows ~3)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated server latency in seconds")
+    parser.add_argument('--latency-jitter', type=float, default=0.02)
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="Answer every Nth request with a 429")
+    parser.add_argument('--retry-after', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability of a 5xx per request")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=Path, default=None, help="Optional JSON results file")
+    args = parser.parse_args()
+
+    transactions = load_transactions(args.transactions, args.seed)
+    print(f"📤 Uploading {len(transactions)} DEBIT transactions to a fake Notion API "
+          f"({args.latency * 1000:.0f}ms latency)...")
+    results = [benchmark_workers(transactions, workers, args) for workers in args.workers]
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args) | {'output': str(args.output)}, 'results': results}, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Persistent merchant -> category cache for LLM categorization results
+Stored in SQLite so repeat syncs only ask the LLM about merchants it has never seen
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+
+class CategoryCache:
+    """
+    On-disk cache of categorization results keyed by normalized merchant string.
+
+    Every entry records the hash of the category list and descriptions it was produced
+    with; entries made under a different hash are dropped when the cache is opened, so
+    editing categories or descriptions in transaction_rules.txt invalidates the cache.
+    Entries also expire after ttl_days, and the least recently used entries are evicted
+    once the cache holds more than max_entries.
+    """
+
+    def __init__(self, cache_path: Union[str, Path], categories_hash: str,
+                 ttl_days: float = 90, max_entries: int = 5000):
+        self.cache_path = Path(cache_path)
+        self.categories_hash = categories_hash
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS merchant_categories (
+                merchant TEXT PRIMARY KEY,
+                category TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                model TEXT NOT NULL,
+                categories_hash TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._purge_stale()
+
+    @staticmethod
+    def hash_categories(categories: List[str], descriptions: Dict[str, str]) -> str:
+        """Hash the category list and descriptions that cached answers depend on"""
+        digest = hashlib.sha256()
+        for category in sorted(categories):
+            digest.update(f"{category}\t{descriptions.get(category, '')}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _purge_stale(self):
+        """Drop entries made with other categories, expired entries and LRU overflow"""
+        with self._lock, self._connection:
+            invalidated = self._connection.execute(
+                "DELETE FROM merchant_categories WHERE categories_hash != ?", (self.categories_hash,)
+            ).rowcount
+            self._connection.execute(
+                "DELETE FROM merchant_categories WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._evict()
+
+        if invalidated:
+            print(f"🗑️  Categories changed, cleared {invalidated} cached merchant categorization(s)")
+
+    def _evict(self):
+        """Remove least recently used entries beyond max_entries (caller holds the lock)"""
+        self._connection.execute("""
+            DELETE FROM merchant_categories WHERE merchant IN (
+                SELECT merchant FROM merchant_categories
+                ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def get(self, merchant: str) -> Optional[tuple[str, float]]:
+        """
+        Return the cached (category, confidence) for a merchant, or None
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT category, confidence, created_at FROM merchant_categories WHERE merchant = ?",
+                (merchant,)
+            ).fetchone()
+
+            if row is None or row[2] < now - self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE merchant_categories SET last_used = ? WHERE merchant = ?", (now, merchant)
+            )
+
+        self.hits += 1
+        return row[0], row[1]
+
+    def put(self, merchant: str, category: str, confidence: float, model: str):
+        """
+        Store a categorization result for a merchant, replacing any previous one
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute("""
+                INSERT OR REPLACE INTO merchant_categories
+                    (merchant, category, confidence, model, categories_hash, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (merchant, category, confidence, model, self.categories_hash, now, now))
+            self._evict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM merchant_categories").fetchone()[0]
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._connection.close()
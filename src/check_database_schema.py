@@ -24,7 +24,8 @@ def check_database_schema():
         "Notion-Version": "2022-06-28"
     }
     
-    url = f"https://api.notion.com/v1/databases/{database_id}"
+    base_url = os.getenv('NOTION_BASE_URL', "https://api.notion.com/v1").rstrip('/')
+    url = f"{base_url}/databases/{database_id}"
     
     try:
         response = requests.get(url, headers=headers)
@@ -0,0 +1,34 @@
+"""
+Environment configuration shared by all modules
+"""
+
+from pathlib import Path
+from typing import Optional
+
+# Project root .env file (parent of the src directory)
+ENV_PATH = Path(__file__).parent.parent / '.env'
+
+_environment_loaded = False
+
+
+def load_environment() -> Optional[Path]:
+    """
+    Load environment variables from the project's .env file, once per process
+    Returns the path of the .env file if it was loaded by this call, None otherwise
+    """
+    global _environment_loaded
+    if _environment_loaded:
+        return None
+    _environment_loaded = True
+
+    if not ENV_PATH.exists():
+        return None
+
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        # python-dotenv not installed, fallback to regular environment variables
+        return None
+
+    load_dotenv(ENV_PATH)
+    return ENV_PATH
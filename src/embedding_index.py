@@ -0,0 +1,174 @@
+"""
+On-disk vector index of confirmed categorizations for nearest-neighbour lookups
+Stored as a NumPy matrix of unit-length embeddings, searched with cosine similarity
+"""
+
+import io
+import threading
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency; the categorizer skips this tier without it
+    np = None
+
+from file_lock import atomic_write
+
+
+class EmbeddingIndex:
+    """
+    Embeddings of transaction texts (merchant title + location) labeled with the category
+    they were confirmed as, persisted to a .npz file.
+
+    - Vectors are L2-normalized on insert, so cosine similarity is a single matrix product.
+    - Re-adding a known text replaces its category instead of duplicating it.
+    - The index belongs to one embedding model; opening it with another model starts empty.
+    - Beyond max_entries the oldest entries are dropped.
+    """
+
+    def __init__(self, index_path: Union[str, Path], model: str, max_entries: int = 20000):
+        if np is None:
+            raise ImportError("numpy is required for the embedding index (pip install numpy)")
+
+        self.index_path = Path(index_path)
+        self.model = model
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.texts: List[str] = []
+        self.categories: List[str] = []
+        self._positions = {}
+        self._load()
+
+    def _load(self):
+        """Read the index file if it exists and was built with the same model"""
+        if not self.index_path.exists():
+            return
+        try:
+            with np.load(self.index_path, allow_pickle=False) as data:
+                if str(data['model']) != self.model:
+                    print(f"🧭 Embedding index was built with {data['model']}, starting a new one for {self.model}")
+                    return
+                self.vectors = data['vectors'].astype(np.float32)
+                self.texts = data['texts'].tolist()
+                self.categories = data['categories'].tolist()
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️  Could not read embedding index {self.index_path}: {e}")
+            return
+        self._positions = {text: position for position, text in enumerate(self.texts)}
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @staticmethod
+    def normalize(vectors) -> 'np.ndarray':
+        """Return float32 row vectors scaled to unit length (zero rows stay zero)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[np.newaxis, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add(self, texts: Sequence[str], vectors, categories: Sequence[str]):
+        """Label embedded texts with their confirmed categories"""
+        if not len(texts):
+            return
+        vectors = self.normalize(vectors)
+
+        with self._lock:
+            if len(self) and vectors.shape[1] != self.vectors.shape[1]:
+                print(f"⚠️  Embedding size changed ({self.vectors.shape[1]} -> {vectors.shape[1]}), rebuilding index")
+                self.vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+                self.texts, self.categories, self._positions = [], [], {}
+
+            base = len(self.vectors)
+            new_rows = []
+            for text, vector, category in zip(texts, vectors, categories):
+                position = self._positions.get(text)
+                if position is None:
+                    self._positions[text] = base + len(new_rows)
+                    new_rows.append(vector)
+                    self.texts.append(text)
+                    self.categories.append(category)
+                    continue
+                if position < base:
+                    self.vectors[position] = vector
+                else:
+                    new_rows[position - base] = vector
+                self.categories[position] = category
+
+            if new_rows:
+                existing = self.vectors if len(self.vectors) else np.zeros((0, vectors.shape[1]), dtype=np.float32)
+                self.vectors = np.vstack([existing, np.array(new_rows, dtype=np.float32)])
+
+            if len(self.texts) > self.max_entries:
+                drop = len(self.texts) - self.max_entries
+                self.vectors = self.vectors[drop:]
+                self.texts = self.texts[drop:]
+                self.categories = self.categories[drop:]
+                self._positions = {text: position for position, text in enumerate(self.texts)}
+            self._dirty = True
+
+    def nearest(self, query_vectors, k: int = 5) -> tuple['np.ndarray', 'np.ndarray']:
+        """
+        Cosine top-k for each query row
+        Returns (positions[m, k], similarities[m, k]), most similar first
+        """
+        queries = self.normalize(query_vectors)
+        with self._lock:
+            vectors = self.vectors
+        if not len(vectors) or queries.shape[1] != vectors.shape[1]:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty
+
+        k = min(k, len(vectors))
+        similarities = queries @ vectors.T
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_similarities, order, axis=1)
+
+    def classify(self, query_vectors, k: int = 5, min_similarity: float = 0.9, agreement: float = 0.8,
+                 allowed_categories: Optional[Sequence[str]] = None) -> List[Optional[tuple[str, float]]]:
+        """
+        Label each query by a similarity-weighted vote of its neighbours above min_similarity
+        A label is returned only if its share of the vote is at least agreement; the confidence
+        is that share times the best neighbour's similarity. Otherwise None
+        """
+        positions, similarities = self.nearest(query_vectors, k)
+        allowed = set(allowed_categories) if allowed_categories is not None else None
+        with self._lock:
+            categories = list(self.categories)
+
+        results = []
+        for row_positions, row_similarities in zip(positions, similarities):
+            votes = {}
+            best_similarity = {}
+            for position, similarity in zip(row_positions, row_similarities):
+                category = categories[position]
+                if similarity < min_similarity or (allowed is not None and category not in allowed):
+                    continue
+                votes[category] = votes.get(category, 0.0) + float(similarity)
+                best_similarity.setdefault(category, float(similarity))
+
+            if not votes:
+                results.append(None)
+                continue
+            category = max(votes, key=votes.get)
+            share = votes[category] / sum(votes.values())
+            results.append((category, share * best_similarity[category]) if share >= agreement else None)
+        return results
+
+    def save(self):
+        """Write the index to disk (atomically) if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            buffer = io.BytesIO()
+            np.savez(buffer, model=np.array(self.model), vectors=self.vectors,
+                     texts=np.array(self.texts, dtype=str), categories=np.array(self.categories, dtype=str))
+            self._dirty = False
+        atomic_write(self.index_path, buffer.getvalue())
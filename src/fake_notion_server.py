@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the Notion API that NotionClient uses
+Lets the uploader be load-tested offline, with configurable latency, 429s and 5xx faults
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DATABASE_PATH = re.compile(r'^/v1/databases/([^/]+)$')
+QUERY_PATH = re.compile(r'^/v1/databases/([^/]+)/query$')
+PAGES_PATH = '/v1/pages'
+PAGE_PATH = re.compile(r'^/v1/pages/([^/]+)$')
+
+# Schema matching the database the sync expects
+DATABASE_PROPERTIES = {
+    "Transaction Title": {"id": "title", "type": "title", "title": {}},
+    "ID": {"id": "id", "type": "rich_text", "rich_text": {}},
+    "Location": {"id": "loc", "type": "rich_text", "rich_text": {}},
+    "Date": {"id": "date", "type": "date", "date": {}},
+    "Amount": {"id": "amt", "type": "number", "number": {"format": "dollar"}},
+    "Transaction Category": {"id": "cat", "type": "select", "select": {"options": []}},
+    "Needs Review": {"id": "rev", "type": "checkbox", "checkbox": {}},
+}
+
+
+def _plain_text(rich_text: List[Dict]) -> str:
+    """Join the text content of a rich_text/title array"""
+    return ''.join(part.get('plain_text') or part.get('text', {}).get('content', '') for part in rich_text)
+
+
+def _property_value(page: Dict, name: str):
+    """Return a page property as a plain Python value (text, date string or number)"""
+    prop = page['properties'].get(name)
+    if prop is None:
+        return None
+    if prop['type'] in ('rich_text', 'title'):
+        return _plain_text(prop[prop['type']])
+    if prop['type'] == 'date':
+        return (prop['date'] or {}).get('start')
+    if prop['type'] == 'select':
+        return (prop['select'] or {}).get('name')
+    return prop.get(prop['type'])
+
+
+def _matches_filter(page: Dict, query_filter: Optional[Dict]) -> bool:
+    """Evaluate the subset of Notion's filter language used by NotionClient"""
+    if not query_filter:
+        return True
+    if 'and' in query_filter:
+        return all(_matches_filter(page, sub_filter) for sub_filter in query_filter['and'])
+    if 'or' in query_filter:
+        return any(_matches_filter(page, sub_filter) for sub_filter in query_filter['or'])
+
+    value = _property_value(page, query_filter.get('property', ''))
+    if 'rich_text' in query_filter or 'title' in query_filter:
+        condition = query_filter.get('rich_text') or query_filter.get('title')
+        value = value or ''
+        if 'equals' in condition:
+            return value == condition['equals']
+        if 'contains' in condition:
+            return condition['contains'] in value
+        if 'starts_with' in condition:
+            return value.startswith(condition['starts_with'])
+        if 'is_empty' in condition:
+            return not value
+        raise ValueError(f"Unsupported rich_text condition: {condition}")
+    if 'checkbox' in query_filter:
+        condition = query_filter['checkbox']
+        if 'equals' in condition:
+            return bool(value) == condition['equals']
+        if 'does_not_equal' in condition:
+            return bool(value) != condition['does_not_equal']
+        raise ValueError(f"Unsupported checkbox condition: {condition}")
+    if 'date' in query_filter:
+        condition = query_filter['date']
+        if value is None:
+            return False
+        day = value[:10]
+        if 'equals' in condition and day != condition['equals'][:10]:
+            return False
+        if 'on_or_after' in condition and day < condition['on_or_after'][:10]:
+            return False
+        if 'on_or_before' in condition and day > condition['on_or_before'][:10]:
+            return False
+        return True
+    raise ValueError(f"Unsupported filter: {query_filter}")
+
+
+class FakeNotionServer:
+    """
+    Threaded HTTP server implementing GET /v1/databases/{id}, POST /v1/databases/{id}/query
+    (rich_text/date/checkbox filters, pagination), POST /v1/pages and PATCH /v1/pages/{id},
+    with pages kept in memory.
+
+    Faults are injected before a request is handled, so a failed request changes nothing:
+    - latency (+ latency_jitter) seconds are slept on every request
+    - every rate_limit_every-th request gets a 429 with a Retry-After of retry_after seconds
+    - error_rate is the probability of a random 500/502/503 (seeded, so runs are repeatable)
+    except late_error_rate, the probability that a page is created and a 502/504 is returned anyway
+    (a gateway timing out on a request Notion completed)
+    """
+
+    def __init__(self, database_id: str = 'fake-database', host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, latency_jitter: float = 0.0, rate_limit_every: int = 0,
+                 retry_after: float = 1.0, error_rate: float = 0.0, seed: int = 0,
+                 database_title: str = 'Fake Transactions', late_error_rate: float = 0.0):
+        self.database_id = database_id
+        self.database_title = database_title
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.late_error_rate = late_error_rate
+
+        self.pages: List[Dict] = []
+        self.stats = {'requests': 0, 'rate_limited': 0, 'server_errors': 0, 'late_errors': 0, 'pages_created': 0,
+                      'pages_updated': 0, 'queries': 0, 'max_concurrent': 0}
+        self._active_requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """Value to use as NotionClient's base_url (or NOTION_BASE_URL)"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'FakeNotionServer':
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'FakeNotionServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def transaction_ids(self) -> List[str]:
+        """IDs of every stored page, in creation order (duplicates included)"""
+        with self._lock:
+            return [_property_value(page, 'ID') for page in self.pages]
+
+    def _next_fault(self) -> Optional[int]:
+        """Decide whether the current request fails, and with which status"""
+        with self._lock:
+            self.stats['requests'] += 1
+            if self.rate_limit_every and self.stats['requests'] % self.rate_limit_every == 0:
+                self.stats['rate_limited'] += 1
+                return 429
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats['server_errors'] += 1
+                return self._random.choice([500, 502, 503])
+            delay = self.latency + (self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        return None
+
+    def _late_fault(self) -> Optional[int]:
+        """Decide whether a request that was just handled is answered with a gateway error anyway"""
+        with self._lock:
+            if self.late_error_rate and self._random.random() < self.late_error_rate:
+                self.stats['late_errors'] += 1
+                return self._random.choice([502, 504])
+        return None
+
+    def _database(self) -> Dict:
+        return {
+            "object": "database",
+            "id": self.database_id,
+            "title": [{"type": "text", "text": {"content": self.database_title}, "plain_text": self.database_title}],
+            "properties": DATABASE_PROPERTIES,
+        }
+
+    def _query(self, body: Dict) -> Dict:
+        page_size = min(int(body.get('page_size', 100)), 100)
+        start = int(body.get('start_cursor') or 0)
+        with self._lock:
+            self.stats['queries'] += 1
+            matches = [page for page in self.pages if _matches_filter(page, body.get('filter'))]
+        results = matches[start:start + page_size]
+        has_more = start + page_size < len(matches)
+        return {
+            "object": "list",
+            "results": results,
+            "has_more": has_more,
+            "next_cursor": str(start + page_size) if has_more else None,
+        }
+
+    @staticmethod
+    def _page_properties(body: Dict) -> Dict:
+        """Validate a request's properties against the schema and convert them to page properties"""
+        properties = {}
+        for name, value in body.get('properties', {}).items():
+            schema = DATABASE_PROPERTIES.get(name)
+            if schema is None:
+                raise ValueError(f"{name} is not a property that exists.")
+            prop_type = schema['type']
+            if prop_type not in value:
+                raise ValueError(f"{name} is expected to be {prop_type}.")
+            prop_value = value[prop_type]
+            if prop_type in ('rich_text', 'title'):
+                prop_value = [dict(part, plain_text=part.get('text', {}).get('content', '')) for part in prop_value]
+            properties[name] = {"id": schema['id'], "type": prop_type, prop_type: prop_value}
+        return properties
+
+    def _create_page(self, body: Dict) -> Dict:
+        properties = self._page_properties(body)
+
+        now = datetime.now(timezone.utc).isoformat()
+        page = {
+            "object": "page",
+            "id": str(uuid.uuid4()),
+            "created_time": now,
+            "last_edited_time": now,
+            "parent": {"type": "database_id", "database_id": self.database_id},
+            "properties": properties,
+        }
+        with self._lock:
+            self.pages.append(page)
+            self.stats['pages_created'] += 1
+        return page
+
+    def _update_page(self, page_id: str, body: Dict) -> Optional[Dict]:
+        """Overwrite the given properties of a page; None if there is no such page"""
+        properties = self._page_properties(body)
+        with self._lock:
+            for page in self.pages:
+                if page['id'] == page_id:
+                    page['properties'].update(properties)
+                    page['last_edited_time'] = datetime.now(timezone.utc).isoformat()
+                    self.stats['pages_updated'] += 1
+                    return page
+        return None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_error(self, status: int, code: str, message: str, headers: Optional[Dict] = None):
+                self._send_json(status, {"object": "error", "status": status, "code": code, "message": message},
+                                headers)
+
+            def _read_body(self) -> Dict:
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+            def _handle(self, method: str):
+                # Read the body first so keep-alive connections stay in sync even when a fault is returned
+                try:
+                    body = self._read_body() if method in ('POST', 'PATCH') else {}
+                except ValueError:
+                    self._send_error(400, 'invalid_json', 'Request body is not valid JSON.')
+                    return
+
+                with server._lock:
+                    server._active_requests += 1
+                    server.stats['max_concurrent'] = max(server.stats['max_concurrent'], server._active_requests)
+                try:
+                    self._dispatch(method, body)
+                finally:
+                    with server._lock:
+                        server._active_requests -= 1
+
+            def _dispatch(self, method: str, body: Dict):
+                fault = server._next_fault()
+                if fault == 429:
+                    self._send_error(429, 'rate_limited', 'Rate limited.', {'Retry-After': f"{server.retry_after:g}"})
+                    return
+                if fault:
+                    self._send_error(fault, 'internal_server_error', 'Injected server error.')
+                    return
+
+                if not self.headers.get('Authorization', '').startswith('Bearer '):
+                    self._send_error(401, 'unauthorized', 'API token is invalid.')
+                    return
+
+                path = self.path.split('?', 1)[0]
+                database_match = DATABASE_PATH.match(path)
+                query_match = QUERY_PATH.match(path)
+                page_match = PAGE_PATH.match(path)
+                try:
+                    if method == 'GET' and database_match:
+                        if database_match.group(1) != server.database_id:
+                            self._send_error(404, 'object_not_found', 'Could not find database.')
+                            return
+                        self._send_json(200, server._database())
+                    elif method == 'POST' and query_match:
+                        if query_match.group(1) != server.database_id:
+                            self._send_error(404, 'object_not_found', 'Could not find database.')
+                            return
+                        self._send_json(200, server._query(body))
+                    elif method == 'POST' and path == PAGES_PATH:
+                        if body.get('parent', {}).get('database_id') != server.database_id:
+                            self._send_error(404, 'object_not_found', 'Could not find database.')
+                            return
+                        page = server._create_page(body)
+                        late_fault = server._late_fault()
+                        if late_fault:
+                            self._send_error(late_fault, 'internal_server_error', 'Injected gateway error.')
+                            return
+                        self._send_json(200, page)
+                    elif method == 'PATCH' and page_match:
+                        page = server._update_page(page_match.group(1), body)
+                        if page is None:
+                            self._send_error(404, 'object_not_found', 'Could not find page.')
+                            return
+                        self._send_json(200, page)
+                    else:
+                        self._send_error(400, 'invalid_request_url', 'Invalid request URL.')
+                except ValueError as e:
+                    self._send_error(400, 'validation_error', str(e))
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PATCH(self):
+                self._handle('PATCH')
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Notion API")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--database-id', default='fake-database')
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="Answer every Nth request with a 429")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability of a 500/502/503 per request")
+    parser.add_argument('--late-error-rate', type=float, default=0.0,
+                        help="Probability that a page is created but a 502/504 is returned")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeNotionServer(database_id=args.database_id, port=args.port, latency=args.latency,
+                              latency_jitter=args.latency_jitter, rate_limit_every=args.rate_limit_every,
+                              retry_after=args.retry_after, error_rate=args.error_rate, seed=args.seed,
+                              late_error_rate=args.late_error_rate)
+    print(f"🧪 Fake Notion API listening on {server.base_url}")
+    print(f"   NOTION_BASE_URL={server.base_url} NOTION_DATABASE_ID={args.database_id} NOTION_API_KEY=<anything>")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats}")
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
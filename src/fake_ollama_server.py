@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-in for the Ollama API (GET /api/tags, POST /api/chat, POST /api/embed)
+Answers categorization prompts from the rules file or a script, with configurable latency
+and a parallelism limit, so categorizer throughput can be measured without a real model
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from rule_matcher import RuleMatcher, normalize_pattern
+
+RULES_PATH = Path(__file__).parent.parent / 'transaction_rules.txt'
+
+# Transaction lines of the single and batch categorization prompts
+SINGLE_NAME_PATTERN = re.compile(r'^- Name: (.*)$', re.MULTILINE)
+BATCH_NAME_PATTERN = re.compile(r'^(\d+)\. Name: (.*?) \| Location:', re.MULTILINE)
+PATTERN_TITLE_PATTERN = re.compile(r'^Transaction title: (.*)$', re.MULTILINE)
+CATEGORY_LINE_PATTERN = re.compile(r'^- ([^:\n]+): ', re.MULTILINE)
+DIGIT_PATTERN = re.compile(r'[0-9]')
+
+EMBEDDING_DIMENSIONS = 256
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+DEFAULT_KEEP_ALIVE = 300.0  # Ollama unloads an idle model after 5 minutes by default
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def parse_keep_alive(value) -> float:
+    """keep_alive as seconds: a number, or a duration such as "30m"; negative means forever"""
+    if isinstance(value, (int, float)):
+        return float(value) if value >= 0 else math.inf
+    match = re.fullmatch(r'\s*(-?[0-9.]+)\s*(ms|s|m|h)?\s*', str(value))
+    if not match:
+        return DEFAULT_KEEP_ALIVE
+    seconds = float(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+    return seconds if seconds >= 0 else math.inf
+
+
+def embed_text(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """
+    Deterministic stand-in embedding: hashed character trigrams of the upper-cased text, unit length
+    Digits are folded together, so store numbers barely move a merchant's vector
+    """
+    vector = [0.0] * dimensions
+    padded = f"  {DIGIT_PATTERN.sub('0', text.upper())} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i:i + 3].encode('utf-8')) % dimensions] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def load_rules(rules_path: Union[str, Path] = RULES_PATH) -> Dict[str, str]:
+    """Read "SEARCH_STRING -> CATEGORY" rules (normalized search strings, file order kept, malformed skipped)"""
+    rules = {}
+    try:
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and ' -> ' in line:
+                    search_string, category = line.split(' -> ', 1)
+                    try:
+                        rules[normalize_pattern(search_string.strip().strip('"'))] = category.strip().strip('"')
+                    except ValueError:
+                        continue
+    except FileNotFoundError:
+        pass
+    return rules
+
+
+class FakeOllamaServer:
+    """
+    Threaded HTTP server that speaks enough of the Ollama API for TransactionCategorizer.
+
+    Replies are deterministic:
+    - script: raw reply texts returned in order (cycled), for exact scenarios
+    - otherwise each transaction in the prompt is answered by answer_fn(title), which defaults to
+      the rules file (rule_confidence) and falls back to fallback_category (fallback_confidence)
+
+    Requests with a format (e.g. a JSON schema) get JSON replies, and options.num_predict
+    truncates replies the way the real server stops generating (done_reason "length").
+    With json_schema=False, schema formats are rejected with HTTP 400 like Ollama before 0.5
+    (only format "json" is accepted).
+
+    Timing model: at most num_parallel requests are processed at once (others queue, like
+    OLLAMA_NUM_PARALLEL), each in a slot that keeps its last context. A request is charged
+    prompt_token_latency per prompt token not shared with the best slot's cached context
+    (that count is its prompt_eval_count), latency, and token_latency per generated token,
+    plus load_latency when the model is not loaded (first use, or idle past the request's
+    keep_alive). Responses carry eval_count-style fields.
+
+    Any listed model also answers /api/embed with embed_text() vectors (no latency).
+    """
+
+    def __init__(self, models: Optional[List[str]] = None, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, token_latency: float = 0.0, load_latency: float = 0.0,
+                 prompt_token_latency: float = 0.0, num_parallel: int = 1, script: Optional[List[str]] = None,
+                 answer_fn: Optional[Callable[[str], Tuple[str, float]]] = None,
+                 rules_path: Union[str, Path] = RULES_PATH, rule_confidence: float = 0.95,
+                 fallback_category: str = 'Misc', fallback_confidence: float = 0.9, json_schema: bool = True):
+        self.models = models or ['llama3.2:latest']
+        self.latency = latency
+        self.token_latency = token_latency
+        self.load_latency = load_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.num_parallel = max(1, num_parallel)
+        self.script = script
+        self.rule_confidence = rule_confidence
+        self.fallback_category = fallback_category
+        self.fallback_confidence = fallback_confidence
+        self.json_schema = json_schema
+        self.rule_matcher = RuleMatcher(load_rules(rules_path)) if answer_fn is None else None
+        self.answer_fn = answer_fn or self._rule_answer
+
+        self.requests: List[Dict] = []  # Every chat request body, in arrival order
+        self.stats = {'chat_requests': 0, 'transactions_answered': 0, 'prompt_eval_count': 0,
+                      'cached_prompt_tokens': 0, 'eval_count': 0, 'model_loads': 0, 'max_concurrent': 0,
+                      'max_queued': 0, 'busy_seconds': 0.0, 'embed_requests': 0, 'texts_embedded': 0,
+                      'rejected_formats': 0}
+        self._slots = threading.Semaphore(self.num_parallel)
+        self._slot_contexts = [''] * self.num_parallel  # Text each slot has cached (prompt + reply)
+        self._free_slots = list(range(self.num_parallel))
+        self._loaded_until: Dict[str, float] = {}       # model -> monotonic time it gets unloaded
+        self._active = 0
+        self._queued = 0
+        self._script_index = 0
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        """Value to use as TransactionCategorizer's host (or OLLAMA_HOST)"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeOllamaServer':
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'FakeOllamaServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _rule_answer(self, title: str) -> Tuple[str, float]:
+        """Category from the first matching rule, else the fallback"""
+        category = self.rule_matcher.match(title.upper())
+        if category:
+            return category, self.rule_confidence
+        return self.fallback_category, self.fallback_confidence
+
+    def _has_model(self, name: str) -> bool:
+        return any(model == name or model.split(':')[0] == name for model in self.models)
+
+    def reply_for(self, prompt: str, json_format: bool = False) -> Tuple[str, int]:
+        """Return (reply text, number of transactions answered) for a prompt, as JSON if asked"""
+        if self.script:
+            with self._lock:
+                reply = self.script[self._script_index % len(self.script)]
+                self._script_index += 1
+            return reply, 1
+
+        categories = set(CATEGORY_LINE_PATTERN.findall(prompt))
+
+        def answer(title: str) -> Tuple[str, float]:
+            category, confidence = self.answer_fn(title.strip())
+            if categories and category not in categories:
+                category = self.fallback_category
+            return category, confidence
+
+        batch = BATCH_NAME_PATTERN.findall(prompt)
+        if batch:
+            answers = [(int(number),) + answer(title) for number, title in batch]
+            if json_format:
+                # Results in prompt order, compact like grammar-constrained output
+                return json.dumps({"results": [[category, round(confidence, 2)] for _, category, confidence in answers]},
+                                  separators=(',', ':')), len(batch)
+            return '\n'.join(f"{number} | {category} | {confidence:.2f}"
+                             for number, category, confidence in answers), len(batch)
+
+        single = SINGLE_NAME_PATTERN.search(prompt)
+        if single:
+            category, confidence = answer(single.group(1))
+            if json_format:
+                return json.dumps({"category": category, "confidence": round(confidence, 2)}, separators=(',', ':')), 1
+            return f"Category: {category}\nConfidence: {confidence:.2f}", 1
+
+        pattern_title = PATTERN_TITLE_PATTERN.search(prompt)
+        if pattern_title:
+            # Pattern extraction: drop store numbers and reference codes
+            cleaned = re.sub(r'\s*[/#*].*$', '', pattern_title.group(1).strip().upper())
+            return cleaned or pattern_title.group(1).strip().upper(), 1
+
+        return f"Category: {self.fallback_category}\nConfidence: {self.fallback_confidence:.2f}", 0
+
+    def _chat(self, body: Dict) -> Dict:
+        """Produce a non-streaming /api/chat response, honoring the parallelism limit"""
+        prompt = '\n'.join(message.get('content', '') for message in body.get('messages', []))
+        reply, answered = self.reply_for(prompt, json_format=bool(body.get('format')))
+        reply_tokens = estimate_tokens(reply)
+        done_reason = 'stop'
+        num_predict = (body.get('options') or {}).get('num_predict')
+        if num_predict and num_predict > 0 and reply_tokens > num_predict:
+            reply, reply_tokens, done_reason = reply[:num_predict * 4], num_predict, 'length'
+        keep_alive = parse_keep_alive(body['keep_alive']) if body.get('keep_alive') is not None else DEFAULT_KEEP_ALIVE
+
+        with self._lock:
+            self._queued += 1
+            self.stats['max_queued'] = max(self.stats['max_queued'], self._queued)
+        queued_at = time.perf_counter()
+        with self._slots:
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self.stats['max_concurrent'] = max(self.stats['max_concurrent'], self._active)
+                cold = self._loaded_until.get(body.get('model'), 0.0) < time.monotonic()
+                if cold:
+                    # A (re)loaded model starts with empty caches
+                    self.stats['model_loads'] += 1
+                    self._slot_contexts = [''] * self.num_parallel
+                # Like the real server, use the free slot whose cached context shares the longest prefix
+                slot = max(self._free_slots, key=lambda i: len(os.path.commonprefix([self._slot_contexts[i], prompt])))
+                self._free_slots.remove(slot)
+                cached_characters = len(os.path.commonprefix([self._slot_contexts[slot], prompt]))
+            prompt_tokens = estimate_tokens(prompt[cached_characters:])
+            try:
+                load_seconds = self.load_latency if cold else 0.0
+                prompt_seconds = self.prompt_token_latency * prompt_tokens
+                eval_seconds = self.latency + self.token_latency * reply_tokens
+                time.sleep(load_seconds + prompt_seconds + eval_seconds)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._slot_contexts[slot] = prompt + reply
+                    self._free_slots.append(slot)
+                    self._loaded_until[body.get('model')] = time.monotonic() + keep_alive
+        total_seconds = time.perf_counter() - queued_at
+
+        with self._lock:
+            self.requests.append(body)
+            self.stats['chat_requests'] += 1
+            self.stats['transactions_answered'] += answered
+            self.stats['prompt_eval_count'] += prompt_tokens
+            self.stats['cached_prompt_tokens'] += estimate_tokens(prompt[:cached_characters]) if cached_characters else 0
+            self.stats['eval_count'] += reply_tokens
+            self.stats['busy_seconds'] += load_seconds + prompt_seconds + eval_seconds
+
+        return {
+            "model": body.get('model'),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": reply},
+            "done": True,
+            "done_reason": done_reason,
+            "total_duration": int(total_seconds * 1e9),
+            "load_duration": int(load_seconds * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": reply_tokens,
+            "eval_duration": int(eval_seconds * 1e9),
+        }
+
+    def _embed(self, body: Dict) -> Dict:
+        """Produce an /api/embed response for a string or a list of strings"""
+        texts = body.get('input', [])
+        if isinstance(texts, str):
+            texts = [texts]
+        with self._lock:
+            self.stats['embed_requests'] += 1
+            self.stats['texts_embedded'] += len(texts)
+        return {
+            "model": body.get('model'),
+            "embeddings": [embed_text(text) for text in texts],
+            "total_duration": 0,
+            "load_duration": 0,
+            "prompt_eval_count": sum(estimate_tokens(text) for text in texts),
+        }
+
+    def _tags(self) -> Dict:
+        return {"models": [
+            {"name": model, "model": model, "modified_at": "2025-01-01T00:00:00Z", "size": 0,
+             "digest": "0" * 64, "details": {"format": "gguf", "family": "fake", "parameter_size": "0B",
+                                             "quantization_level": "none"}}
+            for model in self.models
+        ]}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict, content_type: str = 'application/json'):
+                data = json.dumps(payload).encode('utf-8')
+                if content_type == 'application/x-ndjson':
+                    data += b'\n'
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] == '/api/tags':
+                    self._send_json(200, server._tags())
+                elif self.path == '/':
+                    data = b'Ollama is running'
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                except ValueError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+
+                path = self.path.split('?', 1)[0]
+                if path not in ('/api/chat', '/api/embed'):
+                    self._send_json(404, {"error": "not found"})
+                    return
+                if not server._has_model(body.get('model', '')):
+                    self._send_json(404, {"error": f"model '{body.get('model')}' not found"})
+                    return
+                if path == '/api/embed':
+                    self._send_json(200, server._embed(body))
+                    return
+                if not server.json_schema and isinstance(body.get('format'), dict):
+                    with server._lock:
+                        server.stats['rejected_formats'] += 1
+                    self._send_json(400, {"error": "json: cannot unmarshal object into Go struct field "
+                                                   "ChatRequest.format of type string"})
+                    return
+
+                # A streamed reply is sent as a single final NDJSON chunk
+                content_type = 'application/x-ndjson' if body.get('stream') else 'application/json'
+                self._send_json(200, server._chat(body), content_type)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a deterministic local stand-in for the Ollama API")
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--models', nargs='+', default=['llama3.2:latest'])
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds per chat request")
+    parser.add_argument('--token-latency', type=float, default=0.0, help="Extra seconds per generated token")
+    parser.add_argument('--load-latency', type=float, default=0.0,
+                        help="Cold start whenever a model is (re)loaded")
+    parser.add_argument('--prompt-token-latency', type=float, default=0.0,
+                        help="Seconds per prompt token not already cached by a slot")
+    parser.add_argument('--num-parallel', type=int, default=1, help="Requests processed at once (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument('--no-json-schema', action='store_true',
+                        help="Reject JSON schema formats like Ollama before 0.5")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(models=args.models, port=args.port, latency=args.latency,
+                              token_latency=args.token_latency, load_latency=args.load_latency,
+                              prompt_token_latency=args.prompt_token_latency,
+                              num_parallel=args.num_parallel, json_schema=not args.no_json_schema)
+    print(f"🧪 Fake Ollama API listening on {server.host} (models: {', '.join(args.models)})")
+    print(f"   OLLAMA_HOST={server.host} OLLAMA_NUM_PARALLEL={args.num_parallel}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats}")
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
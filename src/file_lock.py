@@ -0,0 +1,54 @@
+"""
+Cross-process file locking for shared files such as transaction_rules.txt
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path: Union[str, Path]) -> Iterator[None]:
+    """
+    Hold an exclusive lock on "<path>.lock" for the duration of the with-block
+    Blocks until any other process (or thread) holding the lock releases it
+    """
+    lock_path = f"{path}.lock"
+    with open(lock_path, 'a+') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write(path: Union[str, Path], content: Union[str, bytes], encoding: str = 'utf-8'):
+    """
+    Write a file by writing a temporary sibling and renaming it over the original,
+    so readers never see a half-written file (bytes content is written in binary mode)
+    """
+    temp_path = f"{path}.tmp"
+    if isinstance(content, bytes):
+        f = open(temp_path, 'wb')
+    else:
+        f = open(temp_path, 'w', encoding=encoding)
+    with f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
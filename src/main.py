@@ -4,68 +4,146 @@ RBC-Notion-Sync: Main application
 Parses RBC credit card QFX files, categorizes transactions with AI, and uploads to Notion
 """
 
+import argparse
 import os
+import queue
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import List
-
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    # Look for .env file in the project root
-    env_path = Path(__file__).parent.parent / '.env'
-    load_dotenv(env_path)
-    if env_path.exists():
-        print(f"📄 Loaded environment variables from {env_path}")
-except ImportError:
-    # python-dotenv not installed, fallback to regular environment variables
-    pass
+from typing import Dict, List, Optional, Set, Tuple
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from config import load_environment
 from qfx_parser import QFXParser
-from notion_client import NotionClient
-from transaction_categorizer import TransactionCategorizer
+from review_queue import ReviewQueue
+from sync_state import SyncState
 from Transaction import Transaction
 
+# Marks the end of a pipeline queue
+PIPELINE_DONE = object()
+
+
+def parse_qfx_file_worker(file_path: str) -> List[Transaction]:
+    """Parse one QFX file in a worker process (module-level so it can be pickled)"""
+    return QFXParser(file_path).parse_file()
+
 
 class RBCNotionSync:
-    def __init__(self):
+    def __init__(self, pipeline: bool = False, queue_size: int = 100, upload_batch_size: int = 25,
+                 parallel_parse: bool = False, parse_workers: Optional[int] = None,
+                 incremental: bool = True, state_path: Optional[Path] = None, mode: str = 'sync',
+                 interactive: bool = True, review_path: Optional[Path] = None):
         self.qfx_parser = None
         self.notion_client = None
         self.categorizer = None
         self.transactions = []
         
+        # Pipelined mode overlaps parsing, categorization and uploads
+        self.pipeline = pipeline
+        self.queue_size = queue_size  # Max transactions waiting between two stages
+        self.upload_batch_size = upload_batch_size
+        
+        # Parallel mode parses all files in a process pool and syncs them as one stream
+        self.parallel_parse = parallel_parse
+        self.parse_workers = parse_workers
+        
         # Set up input directory
         self.input_dir = Path(__file__).parent.parent / "input"
         
+        # Incremental mode skips files and transactions that earlier runs already synced
+        self.incremental = incremental
+        self.state_path = state_path or Path(__file__).parent.parent / "sync_state.db"
+        self._sync_state: Optional[SyncState] = None
+        
+        # Headless runs never wait for input: low-confidence transactions are uploaded with a
+        # provisional category and queued for a later --review
+        self.interactive = interactive
+        self.review_path = review_path or Path(__file__).parent.parent / "review_queue.db"
+        self._review_queue: Optional[ReviewQueue] = None
+        
+        # 'sync' (default), 'parse-only', 'rules-only', 'report', 'compact-rules' or 'review';
+        # parse-only, rules-only and report never contact Notion or Ollama
+        self.mode = mode
+        
+    @property
+    def sync_state(self) -> SyncState:
+        """Incremental sync state, opened (creating sync_state.db) the first time a sync needs it"""
+        if self._sync_state is None:
+            self._sync_state = SyncState(self.state_path)
+        return self._sync_state
+    
+    @property
+    def review_queue(self) -> ReviewQueue:
+        """Review queue, opened (creating review_queue.db) the first time a headless sync or --review needs it"""
+        if self._review_queue is None:
+            self._review_queue = ReviewQueue(self.review_path)
+        return self._review_queue
+    
+    def _has_review_queue(self) -> bool:
+        """Whether a review queue exists, without creating one"""
+        return self._review_queue is not None or self.review_path.exists()
+    
     def setup_clients(self):
-        """Initialize all client connections"""
+        """
+        Initialize all client connections
+        The Notion and Ollama health checks run concurrently; heavy client modules are only imported here
+        """
         print("🔧 Setting up clients...")
         
-        # Initialize Notion client
+        if not self.setup_categorizer():
+            return False
+        
+        if not self.setup_notion_client():
+            return False
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            notion_check = executor.submit(self.notion_client.test_connection)
+            # Fetches and caches the Ollama model list; the model itself is checked below
+            models_check = executor.submit(self.categorizer._get_available_models)
+            notion_ok = notion_check.result()
+            models_check.result()
+        
+        if not notion_ok:
+            print("❌ Notion connection failed")
+            return False
+        
+        if not self.interactive and not self.notion_client.has_review_property:
+            print(f"💡 Add a '{self.notion_client.review_property}' checkbox property to the database "
+                  f"to flag provisional categories in Notion")
+        
+        # Model selection may prompt the user, so it runs on the main thread after the checks
+        if not self.categorizer.test_connection():
+            print("❌ Ollama connection failed")
+            return False
+        
+        print("✅ All clients set up successfully")
+        return True
+    
+    def setup_notion_client(self) -> bool:
+        """Initialize the Notion client (no requests yet)"""
         try:
+            from notion_client import NotionClient
             self.notion_client = NotionClient()
-            if not self.notion_client.test_connection():
-                print("❌ Notion connection failed")
-                return False
+            return True
         except Exception as e:
             print(f"❌ Error setting up Notion client: {e}")
             return False
-        
-        # Initialize transaction categorizer
+    
+    def setup_categorizer(self) -> bool:
+        """Initialize the transaction categorizer (rules and cache only, no Ollama calls yet)"""
         try:
-            self.categorizer = TransactionCategorizer()
-            if not self.categorizer.test_connection():
-                print("❌ Ollama connection failed")
-                return False
+            from transaction_categorizer import TransactionCategorizer
+            # Only headless runs queue transactions for review
+            review_queue = None if self.interactive else self.review_queue
+            self.categorizer = TransactionCategorizer(interactive=self.interactive, review_queue=review_queue)
+            return True
         except Exception as e:
             print(f"❌ Error setting up transaction categorizer: {e}")
             return False
-        
-        print("✅ All clients set up successfully")
-        return True
     
     def find_qfx_files(self) -> List[Path]:
         """Find all QFX files in the input directory"""
@@ -73,25 +151,111 @@ class RBCNotionSync:
         qfx_files.extend(list(self.input_dir.glob("*.QFX")))
         return qfx_files
     
-    def parse_qfx_file(self, file_path: Path) -> List[dict]:
+    def parse_qfx_file(self, file_path: Path) -> List[Transaction]:
         """Parse a QFX file and return transactions"""
         print(f"📁 Parsing QFX file: {file_path.name}")
         
         parser = QFXParser(str(file_path))
-        transactions = parser.parse_file()
+        transactions = parser.parse_file(include=self._new_transaction_filter())
+        self.qfx_parser = parser
         
         parser.print_summary()
+        if parser.skipped_count:
+            print(f"⏭️  Skipped {parser.skipped_count} transaction(s) already synced in earlier runs")
         return transactions
     
-    def categorize_transactions(self, transactions: List[dict]) -> List[str]:
-        """Categorize transactions using AI"""
+    def _new_transaction_filter(self):
+        """Parser filter that drops transactions behind each account's high-water mark"""
+        if not self.incremental:
+            return None
+        # Nothing was synced before, so there is nothing to filter (and no state file to create yet)
+        if self._sync_state is None and not self.state_path.exists():
+            return None
+        return self.sync_state.is_new_transaction
+    
+    def _hash_if_not_synced(self, file_path: Path) -> Optional[str]:
+        """
+        Return the file's content hash, or None if incremental mode already synced this exact file
+        """
+        content_hash = SyncState.hash_file(file_path)
+        if self.incremental and self.sync_state.is_file_processed(content_hash):
+            print(f"⏭️  Skipping {file_path.name}: already synced (unchanged since last run)")
+            return None
+        return content_hash
+    
+    def _track_sync(self, transactions: List[Transaction]):
+        """
+        Note parsed transactions as part of the sync in progress, before any AI or Notion work,
+        so a failure anywhere afterwards keeps their accounts' high-water marks where they were
+        """
+        for transaction in transactions:
+            self.sync_state.track(transaction)
+    
+    def _record_sync(self, files: List[Tuple[str, str]], transactions: List[Transaction], uploaded_count: int):
+        """
+        Save sync state once every transaction made it to Notion
+        Partially uploaded files are left unrecorded so the next run retries them
+        High-water marks are only staged here; run() saves them once every file is done
+        """
+        if uploaded_count == len(transactions):
+            self.sync_state.commit(files, len(transactions))
+        else:
+            self.sync_state.discard()
+            print("⚠️  Some transactions failed to upload; sync state not updated so they are retried next run")
+    
+    def categorize_transactions(self, transactions: List[Transaction]) -> List[str]:
+        """Categorize transactions using AI (each transaction's category is also set inline)"""
         print(f"\n🤖 Categorizing {len(transactions)} transactions...")
         return self.categorizer.categorize_transactions(transactions)
     
-    def upload_to_notion(self, transactions: List[dict], categories: List[str]) -> int:
-        """Upload transactions to Notion database"""
+    def upload_to_notion(self, transactions: List[Transaction], existing_ids: Optional[Set[str]] = None) -> int:
+        """
+        Upload categorized transactions to Notion database
+        Flagged transactions are queued for review only once their page has been created
+        """
         print(f"\n📤 Uploading {len(transactions)} transactions to Notion...")
-        return self.notion_client.upload_transactions(transactions, categories)
+        uploaded = self.notion_client.upload_transactions(transactions, existing_ids=existing_ids)
+        if self.categorizer is not None:
+            self.categorizer.queue_reviews(transactions)
+        return uploaded
+    
+    def _existing_ids_for_batch(self, transactions: List[Transaction], known: Dict,
+                                statement_range: Tuple[Optional[datetime], Optional[datetime]]) -> Optional[Set[str]]:
+        """
+        Existing Notion IDs for one pipelined upload batch, fetched once per file
+        The first batch fetches the whole statement period (its DTSTART..DTEND, widened to the
+        batch's own dates) and later batches reuse the set; only a batch dated outside the fetched
+        window triggers another (wider) fetch. known holds the fetched state between batches
+        Returns None if the query failed, so the batch falls back to its own duplicate checks
+        """
+        dates = [transaction['date'] for transaction in transactions if transaction['date']]
+        # Undated transactions are uploaded with today's date, so they need the whole database
+        full = len(dates) != len(transactions)
+        if known.get('ids') is not None and (known['full'] or (
+                not full and known['start'] <= min(dates) and max(dates) <= known['end'])):
+            return known['ids']
+        
+        start = end = None
+        if not full:
+            candidates = [date for date in (min(dates), max(dates)) + tuple(statement_range) if date]
+            if known.get('ids') is not None:
+                candidates += [known['start'], known['end']]
+            start, end = min(candidates), max(candidates)
+            print(f"🔎 Fetching existing transaction IDs from {start.date()} to {end.date()}...")
+        else:
+            print("🔎 Fetching all existing transaction IDs...")
+        
+        fetched = self.notion_client.fetch_existing_transaction_ids(start, end)
+        if fetched is None:
+            print("⚠️  Falling back to per-batch duplicate checks")
+            return None
+        print(f"   Found {len(fetched)} existing transaction(s)")
+        
+        # Keep pages this run already created, in case the query missed them
+        if known.get('ids') is not None:
+            fetched |= known['ids']
+        known.update(ids=fetched, full=full, start=start, end=end)
+        return fetched
     
     def process_single_file(self, file_path: Path):
         """Process a single QFX file"""
@@ -99,24 +263,257 @@ class RBCNotionSync:
         print(f"Processing: {file_path.name}")
         print(f"{'='*60}")
         
+        content_hash = self._hash_if_not_synced(file_path)
+        if content_hash is None:
+            return
+        
         # Parse QFX file
         transactions = self.parse_qfx_file(file_path)
         
         if not transactions:
-            print("❌ No transactions found in file")
+            if self.qfx_parser.skipped_count:
+                print("✅ No new transactions since the last sync")
+                self._record_sync([(content_hash, file_path.name)], [], 0)
+            else:
+                print("❌ No transactions found in file")
             return
         
+        self._track_sync(transactions)
+        
         # Categorize transactions
-        categories = self.categorize_transactions(transactions)
+        self.categorize_transactions(transactions)
         
         # Upload to Notion
-        uploaded_count = self.upload_to_notion(transactions, categories)
+        uploaded_count = self.upload_to_notion(transactions)
+        self._record_sync([(content_hash, file_path.name)], transactions, uploaded_count)
         
         print(f"\n✅ Processed {file_path.name}: {uploaded_count}/{len(transactions)} transactions uploaded")
     
+    def parse_files_parallel(self, qfx_files: List[Path]) -> List[Transaction]:
+        """
+        Parse several QFX files across CPU cores and merge them into one list
+        Transactions are deduplicated by account and ID across files (first occurrence wins),
+        since overlapping statement exports of one account repeat the same transactions;
+        FITIDs are only unique within an account, so other accounts' rows are kept
+        """
+        workers = min(len(qfx_files), self.parse_workers or os.cpu_count() or 1)
+        print(f"📁 Parsing {len(qfx_files)} QFX files with {workers} worker process(es)...")
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed_files = list(executor.map(parse_qfx_file_worker, [str(path) for path in qfx_files]))
+        
+        # The high-water mark filter runs here, in the parent process, before any LLM or network work
+        include = self._new_transaction_filter()
+        
+        merged = []
+        seen_ids = set()
+        duplicates = 0
+        skipped = 0
+        for qfx_file, transactions in zip(qfx_files, parsed_files):
+            print(f"   - {qfx_file.name}: {len(transactions)} DEBIT transactions")
+            for transaction in transactions:
+                key = (transaction['account'], transaction['id'])
+                if key in seen_ids:
+                    duplicates += 1
+                    continue
+                if include and not include(transaction):
+                    skipped += 1
+                    continue
+                seen_ids.add(key)
+                merged.append(transaction)
+        
+        print(f"📊 {len(merged)} unique transactions ({duplicates} duplicate(s) across files removed)")
+        if skipped:
+            print(f"⏭️  Skipped {skipped} transaction(s) already synced in earlier runs")
+        return merged
+    
+    def process_files_parallel(self, qfx_files: List[Path]):
+        """
+        Parse all QFX files in parallel, then categorize and upload the merged stream once
+        """
+        print(f"\n{'='*60}")
+        print(f"Processing {len(qfx_files)} files (parallel parse)")
+        print(f"{'='*60}")
+        
+        files = []
+        for qfx_file in qfx_files:
+            content_hash = self._hash_if_not_synced(qfx_file)
+            if content_hash:
+                files.append((content_hash, qfx_file.name))
+        qfx_files = [qfx_file for qfx_file in qfx_files if qfx_file.name in {name for _, name in files}]
+        
+        if not qfx_files:
+            return
+        
+        transactions = self.parse_files_parallel(qfx_files)
+        
+        if not transactions:
+            print("✅ No new transactions to sync")
+            self._record_sync(files, [], 0)
+            return
+        
+        self._track_sync(transactions)
+        self.categorize_transactions(transactions)
+        uploaded_count = self.upload_to_notion(transactions)
+        self._record_sync(files, transactions, uploaded_count)
+        
+        print(f"\n✅ Processed {len(qfx_files)} files: {uploaded_count}/{len(transactions)} transactions uploaded")
+    
+    def _queue_put(self, target: queue.Queue, item, stop_event: threading.Event) -> bool:
+        """
+        Put an item on a bounded queue, blocking while it is full (backpressure)
+        Returns False if the pipeline was stopped before the item could be queued
+        """
+        while not stop_event.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _queue_take_batch(self, source: queue.Queue, max_items: int, stop_event: threading.Event) -> Tuple[list, bool]:
+        """
+        Wait for at least one item, then take whatever else is ready (up to max_items)
+        Returns (items, finished) where finished means the upstream stage is done
+        """
+        items = []
+        while not items:
+            if stop_event.is_set():
+                return items, True
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is PIPELINE_DONE:
+                return items, True
+            items.append(item)
+        
+        while len(items) < max_items:
+            try:
+                item = source.get_nowait()
+            except queue.Empty:
+                break
+            if item is PIPELINE_DONE:
+                return items, True
+            items.append(item)
+        
+        return items, False
+    
+    def process_single_file_pipelined(self, file_path: Path):
+        """
+        Process a single QFX file as three overlapping stages connected by bounded queues:
+        parse (background thread) -> categorize (this thread, may prompt the user) -> upload (background thread)
+        Transactions are uploaded as soon as they are categorized
+        """
+        print(f"\n{'='*60}")
+        print(f"Processing (pipelined): {file_path.name}")
+        print(f"{'='*60}")
+        
+        content_hash = self._hash_if_not_synced(file_path)
+        if content_hash is None:
+            return
+        
+        parsed_queue = queue.Queue(maxsize=self.queue_size)
+        categorized_queue = queue.Queue(maxsize=self.queue_size)
+        stop_event = threading.Event()
+        errors = []
+        uploaded = [0]
+        skipped = [0]
+        # Statement period from the QFX header, known before the first transaction is queued
+        statement_range = [None, None]
+        
+        def parse_stage():
+            try:
+                parser = QFXParser(str(file_path))
+                for transaction in parser.iter_transactions(include=self._new_transaction_filter()):
+                    statement_range[:] = [parser.statement_start, parser.statement_end]
+                    if not self._queue_put(parsed_queue, transaction, stop_event):
+                        return
+                skipped[0] = parser.skipped_count
+            except Exception as e:
+                errors.append(f"parse: {e}")
+            finally:
+                self._queue_put(parsed_queue, PIPELINE_DONE, stop_event)
+        
+        def upload_stage():
+            # Existing IDs are fetched once for the file and shared by every batch
+            known_ids = {}
+            try:
+                finished = False
+                while not finished:
+                    transactions, finished = self._queue_take_batch(categorized_queue, self.upload_batch_size, stop_event)
+                    if transactions:
+                        existing_ids = self._existing_ids_for_batch(transactions, known_ids, tuple(statement_range))
+                        uploaded[0] += self.upload_to_notion(transactions, existing_ids)
+            except Exception as e:
+                errors.append(f"upload: {e}")
+                stop_event.set()
+        
+        parse_thread = threading.Thread(target=parse_stage, name="qfx-parse", daemon=True)
+        upload_thread = threading.Thread(target=upload_stage, name="notion-upload", daemon=True)
+        parse_thread.start()
+        upload_thread.start()
+        
+        # Categorize in chunks big enough to keep every parallel LLM request busy
+        categorize_chunk = max(1, self.categorizer.batch_size) * self.categorizer.max_parallel_requests
+        total_transactions = 0
+        
+        try:
+            finished = False
+            while not finished:
+                transactions, finished = self._queue_take_batch(parsed_queue, categorize_chunk, stop_event)
+                if not transactions:
+                    continue
+                
+                total_transactions += len(transactions)
+                for transaction in transactions:
+                    self.sync_state.track(transaction)
+                self.categorize_transactions(transactions)
+                for transaction in transactions:
+                    if not self._queue_put(categorized_queue, transaction, stop_event):
+                        break
+        except BaseException:
+            stop_event.set()
+            self.sync_state.discard()
+            raise
+        finally:
+            self._queue_put(categorized_queue, PIPELINE_DONE, stop_event)
+            upload_thread.join()
+            stop_event.set()
+            parse_thread.join()
+        
+        for error in errors:
+            print(f"❌ Pipeline {error}")
+        
+        # Transactions were tracked as they flowed through, so only the counts are needed here
+        if errors or uploaded[0] != total_transactions:
+            self.sync_state.discard()
+            print("⚠️  Some transactions failed to upload; sync state not updated so they are retried next run")
+        else:
+            self.sync_state.commit([(content_hash, file_path.name)], total_transactions)
+        
+        if skipped[0]:
+            print(f"⏭️  Skipped {skipped[0]} transaction(s) already synced in earlier runs")
+        
+        if not total_transactions:
+            if not skipped[0]:
+                print("❌ No transactions found in file")
+            return
+        
+        print(f"\n✅ Processed {file_path.name}: {uploaded[0]}/{total_transactions} transactions uploaded")
+    
     def run(self):
         """Main execution function"""
         print("🚀 Starting RBC-Notion-Sync")
+        
+        if self.mode == 'compact-rules':
+            self.run_compact_rules()
+            return
+        if self.mode == 'review':
+            self.run_review()
+            return
+        
         print(f"Input directory: {self.input_dir}")
         
         # Check if input directory exists
@@ -135,28 +532,274 @@ class RBCNotionSync:
         for file in qfx_files:
             print(f"   - {file.name}")
         
+        if self.mode == 'parse-only':
+            self.run_parse_only(qfx_files)
+            return
+        if self.mode == 'rules-only':
+            self.run_rules_only(qfx_files)
+            return
+        if self.mode == 'report':
+            self.run_report(qfx_files)
+            return
+        
         # Setup clients
         if not self.setup_clients():
             print("❌ Failed to setup clients. Please check your configuration.")
             return
         
+        if self.parallel_parse and len(qfx_files) > 1:
+            try:
+                self.process_files_parallel(qfx_files)
+            except Exception as e:
+                print(f"❌ Error processing files: {e}")
+                self.sync_state.discard()
+            self.sync_state.save_watermarks()
+            print("\n🎉 Sync completed!")
+            self.notion_client.print_latency_stats()
+            self.categorizer.compact_rules()
+            self.print_review_reminder()
+            return
+        
         # Process each file
         total_processed = 0
         for qfx_file in qfx_files:
             try:
-                self.process_single_file(qfx_file)
+                if self.pipeline:
+                    self.process_single_file_pipelined(qfx_file)
+                else:
+                    self.process_single_file(qfx_file)
                 total_processed += 1
             except Exception as e:
                 print(f"❌ Error processing {qfx_file.name}: {e}")
+                self.sync_state.discard()
                 continue
         
+        # Marks advance once, after every file: files are filtered against the marks of earlier runs only
+        self.sync_state.save_watermarks()
+        
         print(f"\n🎉 Sync completed! Processed {total_processed}/{len(qfx_files)} files")
+        self.notion_client.print_latency_stats()
+        self.categorizer.compact_rules()
+        self.print_review_reminder()
+    
+    def print_review_reminder(self):
+        """Point out transactions that headless runs left for review"""
+        if not self._has_review_queue():
+            return
+        pending = len(self.review_queue.pending())
+        if pending:
+            print(f"📝 {pending} low-confidence transaction(s) uploaded with a provisional category; "
+                  f"run with --review to resolve them")
+    
+    def run_review(self):
+        """
+        Resolve transactions queued by headless runs, then patch their Notion pages in bulk
+        Answers are saved as they are given, and pages that could not be patched stay queued,
+        so an interrupted review picks up where it left off
+        """
+        if not self._has_review_queue():
+            print("✅ No transactions waiting for review")
+            return
+        pending = self.review_queue.pending()
+        if not pending and not self.review_queue.resolved():
+            print("✅ No transactions waiting for review")
+            return
+        
+        if not self.setup_categorizer() or not self.setup_notion_client():
+            return
+        if not self.notion_client.test_connection():
+            print("❌ Notion connection failed")
+            return
+        
+        if pending:
+            self.review_pending(pending)
+        
+        resolved = self.review_queue.resolved()
+        if not resolved:
+            return
+        print(f"\n📤 Updating {len(resolved)} Notion page(s)...")
+        page_ids = {item['id']: item['page_id'] for item in resolved if item['page_id']}
+        updated = self.notion_client.update_categories({item['id']: item['category'] for item in resolved}, page_ids)
+        self.review_queue.remove(updated)
+        
+        print(f"\n✅ Review completed: {len(updated)}/{len(resolved)} page(s) updated, "
+              f"{len(self.review_queue)} transaction(s) still queued")
+        self.notion_client.print_latency_stats()
+        self.categorizer.compact_rules()
+    
+    def review_pending(self, pending: List[Dict]):
+        """Ask for the category of the queued transactions once per merchant (or accept every suggestion at once)"""
+        print(f"\n📝 {len(pending)} transaction(s) waiting for review:")
+        for item in pending:
+            print(f"   {item['date'] or '':<10.10} {item['title'][:30]:<30} ${abs(item['amount']):>9.2f}  "
+                  f"→ {item['suggested_category']} ({item['confidence']:.2f})")
+        
+        if not self.interactive:
+            print("⚠️  Reviewing needs a terminal; only earlier answers are sent to Notion")
+            return
+        
+        try:
+            accept_all = input(f"\nAccept all {len(pending)} suggestion(s)? (y/N): ").strip().lower() == 'y'
+        except (EOFError, KeyboardInterrupt):
+            print("\n⚠️  Review cancelled")
+            return
+        
+        if accept_all:
+            for item in pending:
+                self.categorizer._cache_category(item, item['suggested_category'], 1.0, "manual")
+            self.review_queue.resolve({item['id']: item['suggested_category'] for item in pending})
+            return
+        
+        # One answer per merchant labels every queued transaction from it
+        for group in self.categorizer.group_by_merchant(pending):
+            items = [pending[i] for i in group]
+            try:
+                category = self.categorizer._ask_user_for_merchant(
+                    items, [(item['suggested_category'], item['confidence']) for item in items])
+            except EOFError:
+                print("\n⚠️  Review stopped; the remaining transactions stay queued")
+                return
+            self.review_queue.resolve({item['id']: category for item in items})
+    
+    def run_compact_rules(self):
+        """Merge rules journaled by earlier (e.g. interrupted) runs into transaction_rules.txt"""
+        from rule_journal import RuleJournal
+        journal = RuleJournal()
+        pending = len(journal.entries())
+        if not pending:
+            print(f"✅ No journaled rules to merge into {journal.rules_path.name}")
+            return
+        try:
+            merged = journal.compact()
+            print(f"📋 Merged {merged} of {pending} journaled rule(s)/description(s) into {journal.rules_path.name}")
+        except Exception as e:
+            print(f"❌ Error merging rule journal: {e}")
+    
+    def run_parse_only(self, qfx_files: List[Path]):
+        """Parse every file and print a summary, without contacting Notion or Ollama"""
+        total_transactions = 0
+        for qfx_file in qfx_files:
+            try:
+                total_transactions += len(self.parse_qfx_file(qfx_file))
+            except Exception as e:
+                print(f"❌ Error parsing {qfx_file.name}: {e}")
+        
+        print(f"\n🎉 Parse completed! {total_transactions} new transaction(s) in {len(qfx_files)} file(s)")
+    
+    def run_rules_only(self, qfx_files: List[Path]):
+        """
+        Parse every file and report how many transactions the categorization rules cover
+        Nothing is sent to the LLM or to Notion
+        """
+        if not self.setup_categorizer():
+            return
+        
+        total_transactions = 0
+        category_counts: Dict[str, int] = {}
+        unmatched: Dict[str, int] = {}
+        for qfx_file in qfx_files:
+            try:
+                transactions = self.parse_qfx_file(qfx_file)
+            except Exception as e:
+                print(f"❌ Error parsing {qfx_file.name}: {e}")
+                continue
+            
+            total_transactions += len(transactions)
+            for transaction in transactions:
+                category = self.categorizer._apply_rules(transaction)
+                if category:
+                    category_counts[category] = category_counts.get(category, 0) + 1
+                else:
+                    unmatched[transaction['title']] = unmatched.get(transaction['title'], 0) + 1
+        
+        matched = sum(category_counts.values())
+        coverage = matched / total_transactions * 100 if total_transactions else 0.0
+        print(f"\n📏 Rules matched {matched}/{total_transactions} transactions ({coverage:.1f}%)")
+        for category, count in sorted(category_counts.items(), key=lambda item: -item[1]):
+            print(f"   - {category}: {count}")
+        
+        if unmatched:
+            print("\n❓ Most frequent unmatched merchants:")
+            for title, count in sorted(unmatched.items(), key=lambda item: -item[1])[:10]:
+                print(f"   - {title} ({count})")
+    
+    def run_report(self, qfx_files: List[Path]):
+        """
+        Print a local spending report over every transaction in the input files
+        Categories come from the rules and the merchant cache only (no LLM, no Notion)
+        """
+        try:
+            from spending_analytics import SpendingAnalytics
+        except ImportError as e:
+            print(f"❌ {e}")
+            return
+        if not self.setup_categorizer():
+            return
+        
+        # The report covers the full history, so earlier syncs are not filtered out
+        transactions = []
+        seen_ids = set()
+        for qfx_file in qfx_files:
+            try:
+                parsed = QFXParser(str(qfx_file)).parse_file()
+            except Exception as e:
+                print(f"❌ Error parsing {qfx_file.name}: {e}")
+                continue
+            for transaction in parsed:
+                # FITIDs are only unique within an account
+                key = (transaction.account, transaction.id)
+                if key not in seen_ids:
+                    seen_ids.add(key)
+                    transactions.append(transaction)
+        
+        categorized = self.categorizer.categorize_offline(transactions)
+        print(f"📁 {len(transactions)} unique transaction(s), {categorized} categorized by rules or cache\n")
+        
+        try:
+            SpendingAnalytics(transactions).print_report()
+        except ImportError as e:
+            print(f"❌ {e}")
 
 
 def main():
     """Entry point for the application"""
+    parser = argparse.ArgumentParser(description="Sync RBC QFX transactions to Notion")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Overlap parsing, categorization and uploads instead of running them one after another")
+    parser.add_argument('--queue-size', type=int, default=100,
+                        help="Max transactions buffered between pipeline stages (default: 100)")
+    parser.add_argument('--parallel-parse', action='store_true',
+                        help="Parse all QFX files across CPU cores and sync them as one deduplicated stream")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for --parallel-parse (default: number of CPUs)")
+    parser.add_argument('--full', action='store_true',
+                        help="Reprocess every file and transaction, ignoring what earlier runs already synced")
+    parser.add_argument('--headless', action='store_true',
+                        help="Never prompt: upload low-confidence transactions with a provisional category and "
+                             "queue them for --review (implied when stdin is not a terminal)")
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument('--parse-only', action='store_const', const='parse-only', dest='mode',
+                            help="Only parse the QFX files and print a summary (no Notion or Ollama)")
+    mode_group.add_argument('--rules-only', action='store_const', const='rules-only', dest='mode',
+                            help="Parse and report categorization rule coverage (no Notion or Ollama)")
+    mode_group.add_argument('--report', action='store_const', const='report', dest='mode',
+                            help="Print a spending report per month, category and merchant (needs numpy; no Notion or Ollama)")
+    mode_group.add_argument('--review', action='store_const', const='review', dest='mode',
+                            help="Resolve transactions queued by --headless runs and update their Notion pages")
+    mode_group.add_argument('--compact-rules', action='store_const', const='compact-rules', dest='mode',
+                            help="Merge journaled rules and descriptions into transaction_rules.txt and exit")
+    parser.set_defaults(mode='sync')
+    args = parser.parse_args()
+    
+    env_path = load_environment()
+    if env_path:
+        print(f"📄 Loaded environment variables from {env_path}")
+    
     try:
-        sync = RBCNotionSync()
+        sync = RBCNotionSync(pipeline=args.pipeline, queue_size=args.queue_size,
+                             parallel_parse=args.parallel_parse, parse_workers=args.workers,
+                             incremental=not args.full, mode=args.mode,
+                             interactive=not args.headless and sys.stdin.isatty())
         sync.run()
     except KeyboardInterrupt:
         print("\n⚠️  Process interrupted by user")
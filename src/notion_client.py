@@ -3,24 +3,69 @@ Notion API client for uploading transactions
 """
 
 import os
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
-from pathlib import Path
+from typing import Dict, List, Optional, Set
 
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    # Look for .env file in the project root (parent of src directory)
-    env_path = Path(__file__).parent.parent / '.env'
-    load_dotenv(env_path)
-except ImportError:
-    # python-dotenv not installed, fallback to regular environment variables
-    pass
+from config import load_environment
+from Transaction import STATUS_EXISTS, STATUS_FAILED, STATUS_UPLOADED, Transaction
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket used to stay within Notion's request budget
+    Notion allows an average of 3 requests per second per integration
+    """
+    
+    def __init__(self, requests_per_second: float = 3.0, burst: Optional[float] = None):
+        self.rate = requests_per_second
+        self.capacity = burst if burst is not None else requests_per_second
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request token is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.last_refill
+                if elapsed > 0:
+                    self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                    self.last_refill = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                wait_time = (1 - self.tokens) / self.rate + max(0.0, self.last_refill - now)
+            time.sleep(wait_time)
+    
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given number of seconds (e.g. after a 429)"""
+        with self.lock:
+            self.tokens = 0
+            self.last_refill = max(self.last_refill, time.monotonic() + seconds)
 
 
 class NotionClient:
-    def __init__(self, api_key: Optional[str] = None, database_id: Optional[str] = None):
+    # Status codes that are worth retrying after a pause
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+    # Page creation isn't idempotent: a 5xx may arrive after Notion created the page, so only
+    # 429s (never processed) are retried blindly and other errors look for the page first
+    CREATE_RETRY_STATUS_CODES = {429}
+    DEFAULT_BASE_URL = "https://api.notion.com/v1"
+    
+    def __init__(self, api_key: Optional[str] = None, database_id: Optional[str] = None,
+                 max_workers: int = 4, requests_per_second: float = 3.0, max_retries: int = 5,
+                 pool_size: int = 10, timeout: float = 30.0, base_url: Optional[str] = None):
+        # Load environment variables from .env file (no-op if already loaded)
+        load_environment()
+        
         self.api_key = api_key or os.getenv('NOTION_API_KEY')
         self.database_id = database_id or os.getenv('NOTION_DATABASE_ID')
         
@@ -29,14 +74,114 @@ class NotionClient:
         if not self.database_id:
             raise ValueError("NOTION_DATABASE_ID environment variable is required")
         
-        self.base_url = "https://api.notion.com/v1"
+        # NOTION_BASE_URL points the client at another server, e.g. fake_notion_server.py for load tests
+        self.base_url = (base_url or os.getenv('NOTION_BASE_URL') or self.DEFAULT_BASE_URL).rstrip('/')
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "Notion-Version": "2022-06-28"
         }
+        
+        # Concurrency and rate limiting for uploads
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(requests_per_second)
+        
+        # Shared keep-alive session so every request (and every upload thread) reuses connections
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, self.max_workers))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+        
+        # Optional checkbox that marks pages uploaded with a provisional category (headless runs);
+        # only sent once test_connection() has seen it in the database schema
+        self.review_property = os.getenv('NOTION_REVIEW_PROPERTY', 'Needs Review')
+        self.has_review_property = False
+        
+        # Per-request latency samples (seconds), collected from all threads
+        self._latencies = []
+        self._latency_lock = threading.Lock()
     
-    def _format_transaction_for_notion(self, transaction: Dict, category: str = "Misc") -> Dict:
+    def _send_request(self, method: str, url: str, retry_statuses: Optional[Set[int]] = None,
+                      **kwargs) -> requests.Response:
+        """
+        Send a rate-limited request to Notion
+        429 and 5xx responses (or only retry_statuses, if given) are retried, honoring the
+        Retry-After header when present
+        The last response is returned as-is so callers can raise_for_status()
+        """
+        if retry_statuses is None:
+            retry_statuses = self.RETRY_STATUS_CODES
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            kwargs.setdefault('timeout', self.timeout)
+            start_time = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            finally:
+                with self._latency_lock:
+                    self._latencies.append(time.perf_counter() - start_time)
+            
+            if response.status_code not in retry_statuses or attempt >= self.max_retries:
+                return response
+            
+            retry_after = response.headers.get('Retry-After')
+            try:
+                delay = float(retry_after) if retry_after is not None else 2 ** attempt
+            except ValueError:
+                delay = 2 ** attempt
+            
+            print(f"⏳ Notion returned {response.status_code}, retrying in {delay:.1f}s...")
+            self.rate_limiter.pause(delay)
+            attempt += 1
+    
+    def get_latency_stats(self) -> Dict:
+        """
+        Return request latency statistics (in seconds) for this client
+        connections_opened counts TCP/TLS handshakes; the rest of the requests reused a pooled connection
+        """
+        with self._latency_lock:
+            samples = sorted(self._latencies)
+        
+        stats = {
+            'requests': len(samples),
+            'connections_opened': self._count_connections_opened(),
+            'total': sum(samples),
+            'mean': 0.0,
+            'p50': 0.0,
+            'p95': 0.0,
+            'max': 0.0
+        }
+        if samples:
+            stats['mean'] = stats['total'] / len(samples)
+            stats['p50'] = samples[len(samples) // 2]
+            stats['p95'] = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            stats['max'] = samples[-1]
+        return stats
+    
+    def _count_connections_opened(self) -> int:
+        """Count connections opened by the session's connection pools"""
+        try:
+            pools = self._adapter.poolmanager.pools
+            return sum(pools[key].num_connections for key in list(pools.keys()))
+        except Exception:
+            return 0
+    
+    def print_latency_stats(self):
+        """Print a summary of Notion request latency"""
+        stats = self.get_latency_stats()
+        if not stats['requests']:
+            return
+        print(f"🌐 Notion requests: {stats['requests']} over {stats['connections_opened']} connection(s), "
+              f"{stats['total']:.1f}s total "
+              f"(mean {stats['mean'] * 1000:.0f}ms, p50 {stats['p50'] * 1000:.0f}ms, "
+              f"p95 {stats['p95'] * 1000:.0f}ms, max {stats['max'] * 1000:.0f}ms)")
+    
+    def _format_transaction_for_notion(self, transaction: Transaction, category: str = "Misc") -> Dict:
         """
         Format transaction data for Notion API
         """
@@ -48,55 +193,69 @@ class NotionClient:
         if amount > 0:
             amount = -amount
         
-        return {
-            "properties": {
-                "ID": {
-                    "rich_text": [
-                        {
-                            "text": {
-                                "content": transaction['id']
-                            }
+        properties = {
+            "ID": {
+                "rich_text": [
+                    {
+                        "text": {
+                            "content": transaction['id']
                         }
-                    ]
-                },
-                "Transaction Title": {
-                    "title": [
-                        {
-                            "text": {
-                                "content": transaction['title']
-                            }
-                        }
-                    ]
-                },
-                "Location": {
-                    "rich_text": [
-                        {
-                            "text": {
-                                "content": transaction['location']
-                            }
+                    }
+                ]
+            },
+            "Transaction Title": {
+                "title": [
+                    {
+                        "text": {
+                            "content": transaction['title']
                         }
-                    ]
-                },
-                "Date": {
-                    "date": {
-                        "start": date_str
                     }
-                },
-                "Amount": {
-                    "number": amount
-                },
-                "Transaction Category": {
-                    "select": {
-                        "name": category
+                ]
+            },
+            "Location": {
+                "rich_text": [
+                    {
+                        "text": {
+                            "content": transaction['location']
+                        }
                     }
+                ]
+            },
+            "Date": {
+                "date": {
+                    "start": date_str
+                }
+            },
+            "Amount": {
+                "number": amount
+            },
+            "Transaction Category": {
+                "select": {
+                    "name": category
                 }
             }
         }
+        
+        if transaction.get('needs_review') and self.has_review_property:
+            properties[self.review_property] = {"checkbox": True}
+        
+        return {"properties": properties}
     
     def check_if_transaction_exists(self, transaction_id: str) -> bool:
         """
         Check if a transaction with the given ID already exists in the database
         """
+        try:
+            return self._query_page_id(transaction_id) is not None
+        except requests.exceptions.RequestException as e:
+            print(f"Error checking if transaction exists: {e}")
+            return False
+    
+    def _query_page_id(self, transaction_id: str) -> Optional[str]:
+        """
+        Return the ID of the page holding the given transaction, or None if there is none
+        A failed lookup raises instead of reporting the transaction missing
+        """
         url = f"{self.base_url}/databases/{self.database_id}/query"
         
         query_data = {
@@ -108,24 +267,145 @@ class NotionClient:
             }
         }
         
+        response = self._send_request('POST', url, json=query_data)
+        response.raise_for_status()
+        
+        results = response.json().get('results', [])
+        return results[0]['id'] if results else None
+    
+    @staticmethod
+    def _page_transaction_id(page: Dict) -> str:
+        """Transaction ID stored in a page's ID property ('' if missing)"""
+        rich_text = page.get('properties', {}).get('ID', {}).get('rich_text', [])
+        return ''.join(part.get('plain_text', '') for part in rich_text)
+    
+    def fetch_existing_transaction_ids(self, start_date: Optional[datetime] = None,
+                                       end_date: Optional[datetime] = None) -> Optional[Set[str]]:
+        """
+        Page through the database once and collect the IDs of existing transactions
+        If a date window is given, only pages dated inside it (inclusive) are fetched
+        Returns None if the query fails so callers can fall back to per-transaction checks
+        """
+        url = f"{self.base_url}/databases/{self.database_id}/query"
+        
+        date_filters = []
+        if start_date:
+            date_filters.append({"property": "Date", "date": {"on_or_after": start_date.date().isoformat()}})
+        if end_date:
+            date_filters.append({"property": "Date", "date": {"on_or_before": end_date.date().isoformat()}})
+        
+        query_data = {"page_size": 100}
+        if len(date_filters) == 1:
+            query_data["filter"] = date_filters[0]
+        elif date_filters:
+            query_data["filter"] = {"and": date_filters}
+        
+        existing_ids = set()
+        
         try:
-            response = requests.post(url, headers=self.headers, json=query_data)
-            response.raise_for_status()
+            while True:
+                response = self._send_request('POST', url, json=query_data)
+                response.raise_for_status()
+                data = response.json()
+                
+                for page in data.get('results', []):
+                    transaction_id = self._page_transaction_id(page)
+                    if transaction_id:
+                        existing_ids.add(transaction_id)
+                
+                if not data.get('has_more') or not data.get('next_cursor'):
+                    break
+                query_data["start_cursor"] = data['next_cursor']
             
-            results = response.json().get('results', [])
-            return len(results) > 0
+            return existing_ids
             
         except requests.exceptions.RequestException as e:
-            print(f"Error checking if transaction exists: {e}")
+            print(f"Error fetching existing transaction IDs: {e}")
+            return None
+    
+    def fetch_review_page_ids(self) -> Dict[str, str]:
+        """
+        Page through every page flagged for review once
+        Returns {transaction_id: page_id} (empty if the database has no review checkbox or the query fails)
+        """
+        if not self.has_review_property:
+            return {}
+        
+        url = f"{self.base_url}/databases/{self.database_id}/query"
+        query_data = {"page_size": 100, "filter": {"property": self.review_property, "checkbox": {"equals": True}}}
+        page_ids = {}
+        
+        try:
+            while True:
+                response = self._send_request('POST', url, json=query_data)
+                response.raise_for_status()
+                data = response.json()
+                
+                for page in data.get('results', []):
+                    transaction_id = self._page_transaction_id(page)
+                    if transaction_id:
+                        page_ids[transaction_id] = page['id']
+                
+                if not data.get('has_more') or not data.get('next_cursor'):
+                    break
+                query_data["start_cursor"] = data['next_cursor']
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching pages flagged for review: {e}")
+        return page_ids
+    
+    def update_transaction_category(self, page_id: str, category: str) -> bool:
+        """
+        Set a page's category and clear its review flag
+        Returns True if successful, False otherwise
+        """
+        properties = {"Transaction Category": {"select": {"name": category}}}
+        if self.has_review_property:
+            properties[self.review_property] = {"checkbox": False}
+        
+        try:
+            response = self._send_request('PATCH', f"{self.base_url}/pages/{page_id}", json={"properties": properties})
+            response.raise_for_status()
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Error updating page {page_id}: {e}")
             return False
     
-    def upload_transaction(self, transaction: Dict, category: str = "Misc") -> bool:
+    def update_categories(self, categories: Dict[str, str], page_ids: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        Patch the category of transactions a sync uploaded ({transaction_id: category})
+        Only pages a sync created are patched: those in page_ids (recorded at upload) or, for
+        transactions without one, pages still flagged for review, located with one paginated query.
+        A page that merely has the same transaction ID is never touched
+        Pages are patched by up to max_workers threads sharing the client's rate limiter
+        Returns the IDs of the transactions whose page was updated
+        """
+        page_ids = dict(page_ids or {})
+        if any(transaction_id not in page_ids for transaction_id in categories):
+            page_ids = {**self.fetch_review_page_ids(), **page_ids}
+        updates = []
+        for transaction_id, category in categories.items():
+            page_id = page_ids.get(transaction_id)
+            if page_id is None:
+                print(f"⚠️  No page created by a sync holds transaction {transaction_id}, leaving it queued")
+                continue
+            updates.append((transaction_id, page_id, category))
+        
+        if self.max_workers > 1 and len(updates) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(lambda item: self.update_transaction_category(item[1], item[2]), updates))
+        else:
+            results = [self.update_transaction_category(page_id, category) for _, page_id, category in updates]
+        
+        return [transaction_id for (transaction_id, _, _), updated in zip(updates, results) if updated]
+    
+    def upload_transaction(self, transaction: Transaction, category: str = "Misc", check_existing: bool = True) -> bool:
         """
         Upload a single transaction to Notion database
+        Set check_existing=False when the caller has already deduplicated the transaction
         Returns True if successful, False otherwise
         """
         # Check if transaction already exists
-        if self.check_if_transaction_exists(transaction['id']):
+        if check_existing and self.check_if_transaction_exists(transaction['id']):
             print(f"Transaction {transaction['id']} already exists, skipping...")
             return True
         
@@ -136,8 +416,24 @@ class NotionClient:
         notion_data["parent"] = {"database_id": self.database_id}
         
         try:
-            response = requests.post(url, headers=self.headers, json=notion_data)
+            for attempt in range(self.max_retries + 1):
+                response = self._send_request('POST', url, retry_statuses=self.CREATE_RETRY_STATUS_CODES,
+                                              json=notion_data)
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    break
+                
+                # The error may have come after the page was created; only post again if it wasn't
+                page_id = self._query_page_id(transaction['id'])
+                if page_id is not None:
+                    transaction['page_id'] = page_id
+                    print(f"✅ Uploaded: {transaction['title']} (${transaction['amount']:.2f}, "
+                          f"created despite a {response.status_code})")
+                    return True
+                delay = 2 ** attempt
+                print(f"⏳ Notion returned {response.status_code} creating a page, retrying in {delay:.1f}s...")
+                self.rate_limiter.pause(delay)
             response.raise_for_status()
+            transaction['page_id'] = response.json().get('id')
             
             print(f"✅ Uploaded: {transaction['title']} (${transaction['amount']:.2f})")
             return True
@@ -152,26 +448,93 @@ class NotionClient:
                     print(f"Response text: {e.response.text}")
             return False
     
-    def upload_transactions(self, transactions: List[Dict], categories: Optional[List[str]] = None) -> int:
+    def upload_transactions(self, transactions: List[Transaction], categories: Optional[List[str]] = None,
+                            prefetch_existing: bool = True, existing_ids: Optional[Set[str]] = None) -> int:
         """
         Upload multiple transactions to Notion database
+        Each transaction's own category is used unless a parallel categories list is given,
+        and its status is set to uploaded, exists or failed
+        With prefetch_existing, existing IDs in the statement's date window are fetched once
+        up front instead of querying Notion for every transaction
+        A caller uploading one statement in several batches can fetch the IDs once and pass
+        them as existing_ids instead (they must cover the batch's dates); IDs of the pages
+        created are added to that set, so a later batch repeating an ID skips it too
+        New pages are created by up to max_workers threads sharing the client's rate limiter
         Returns number of successfully uploaded transactions
         """
         if categories is None:
-            categories = ["Misc"] * len(transactions)
+            categories = [transaction.get('category') or "Misc" for transaction in transactions]
         
         if len(categories) != len(transactions):
             raise ValueError("Number of categories must match number of transactions")
         
+        if existing_ids is None and prefetch_existing and transactions:
+            existing_ids = self._prefetch_existing_ids(transactions)
+        
         successful_uploads = 0
+        pending = []
+        queued_ids = set()
         
         for transaction, category in zip(transactions, categories):
-            if self.upload_transaction(transaction, category):
+            if existing_ids is not None and transaction['id'] in existing_ids:
+                print(f"Transaction {transaction['id']} already exists, skipping...")
+                transaction['status'] = STATUS_EXISTS
+                successful_uploads += 1
+                continue
+            
+            # Avoid creating two pages when a statement repeats an ID
+            if transaction['id'] in queued_ids:
+                print(f"Transaction {transaction['id']} appears twice in this batch, skipping...")
+                transaction['status'] = STATUS_EXISTS
                 successful_uploads += 1
+                continue
+            
+            queued_ids.add(transaction['id'])
+            pending.append((transaction, category))
+        
+        # Without a prefetched ID set every upload has to check Notion itself
+        check_existing = existing_ids is None
+        
+        if self.max_workers > 1 and len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(
+                    lambda item: self.upload_transaction(item[0], item[1], check_existing=check_existing),
+                    pending
+                ))
+        else:
+            results = [self.upload_transaction(transaction, category, check_existing=check_existing)
+                       for transaction, category in pending]
+        
+        for (transaction, _), uploaded in zip(pending, results):
+            transaction['status'] = STATUS_UPLOADED if uploaded else STATUS_FAILED
+            if uploaded and existing_ids is not None:
+                existing_ids.add(transaction['id'])
+        successful_uploads += sum(1 for uploaded in results if uploaded)
         
         print(f"\n📊 Upload Summary: {successful_uploads}/{len(transactions)} transactions uploaded successfully")
         return successful_uploads
     
+    def _prefetch_existing_ids(self, transactions: List[Transaction]) -> Optional[Set[str]]:
+        """
+        Fetch existing IDs for the date window covered by the given transactions
+        """
+        dates = [t['date'] for t in transactions if t['date']]
+        
+        # Undated transactions are uploaded with today's date, so scan the whole database
+        if len(dates) == len(transactions):
+            start_date, end_date = min(dates), max(dates)
+            print(f"🔎 Fetching existing transaction IDs from {start_date.date()} to {end_date.date()}...")
+        else:
+            start_date, end_date = None, None
+            print("🔎 Fetching all existing transaction IDs...")
+        
+        existing_ids = self.fetch_existing_transaction_ids(start_date, end_date)
+        if existing_ids is None:
+            print("⚠️  Falling back to per-transaction duplicate checks")
+        else:
+            print(f"   Found {len(existing_ids)} existing transaction(s)")
+        return existing_ids
+    
     def test_connection(self) -> bool:
         """
         Test the connection to Notion API and database
@@ -179,11 +542,14 @@ class NotionClient:
         try:
             # Test API connection by getting database info
             url = f"{self.base_url}/databases/{self.database_id}"
-            response = requests.get(url, headers=self.headers)
+            response = self._send_request('GET', url)
             response.raise_for_status()
             
             database_info = response.json()
             print(f"✅ Connected to Notion database: {database_info.get('title', [{}])[0].get('plain_text', 'Unknown')}")
+            
+            review_schema = database_info.get('properties', {}).get(self.review_property, {})
+            self.has_review_property = review_schema.get('type') == 'checkbox'
             return True
             
         except requests.exceptions.RequestException as e:
@@ -1,18 +1,37 @@
 """
 QFX File Parser for RBC Credit Card Transactions
-Parses OFX/QFX files and extracts transaction data using regex-based parsing
+Parses OFX/QFX files and extracts transaction data using a single-pass regex tag tokenizer
 """
 
 import re
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional
+
+from Transaction import Transaction
+
+# Matches every opening tag and its inline value in one sweep: "<NAME>STARBUCKS" -> ("NAME", "STARBUCKS")
+# Closing tags ("</NAME>") are not matched, so both closed and unclosed SGML tags are handled
+TAG_PATTERN = re.compile(r'<([A-Za-z0-9.]+)>([^<\r\n]*)')
+
+# Account number of the statement that the following transactions belong to (value must be terminated)
+ACCOUNT_PATTERN = re.compile(rb'<ACCTID>([^<\r\n]+)[<\r\n]')
+
+# Start and end of a statement's transaction list (BANKTRANLIST header, before its STMTTRN blocks)
+STATEMENT_DATE_PATTERN = re.compile(rb'<(DTSTART|DTEND)>([^<\r\n]+)(?=[<\r\n])')
+
+# Bytes kept between chunks while looking for the next STMTTRN, enough to hold a split ACCTID line
+CHUNK_TAIL_SIZE = 256
 
 
 class QFXParser:
     def __init__(self, file_path: str):
         self.file_path = file_path
-        self.raw_content = ""
         self.transactions = []
+        self.account_id = ""  # Last ACCTID seen while parsing
+        self.statement_start: Optional[datetime] = None  # Earliest DTSTART seen while parsing
+        self.statement_end: Optional[datetime] = None    # Latest DTEND seen while parsing
+        self.skipped_count = 0  # Transactions rejected by the include filter
+        self._date_cache = {}
     
     def _parse_date(self, date_str: str) -> datetime:
         """
@@ -22,53 +41,59 @@ class QFXParser:
         Applies timezone conversion and adds 1 day to correct QFX date discrepancy.
         RBC QFX files consistently show dates 1 day behind the actual transaction dates
         visible in the banking interface.
+        
+        A statement only has a handful of distinct DTPOSTED values, so results are cached
+        by raw date string.
         """
         date_str = date_str.strip()
         
-        # Extract timezone offset if present
+        cached = self._date_cache.get(date_str)
+        if cached is None:
+            cached = self._parse_date_uncached(date_str)
+            self._date_cache[date_str] = cached
+        return cached
+    
+    def _parse_date_uncached(self, date_str: str) -> datetime:
+        """
+        Parse a stripped OFX date by slicing its fixed-width fields
+        """
+        # Split off timezone info, e.g. "[-5]"
         timezone_offset = 0
-        timezone_match = re.search(r'\[([+-]?\d+)\]', date_str)
-        if timezone_match:
-            timezone_offset = int(timezone_match.group(1))
+        bracket_index = date_str.find('[')
+        if bracket_index != -1:
+            timezone_text = date_str[bracket_index + 1:date_str.rfind(']')]
+            offset_digits = timezone_text[1:] if timezone_text[:1] in '+-' else timezone_text
+            if offset_digits.isdigit():
+                timezone_offset = int(timezone_text)
+            date_str = date_str[:bracket_index]
         
-        # Remove timezone info
-        date_str = re.sub(r'\[.*\]', '', date_str)
+        if len(date_str) < 8 or not date_str[:8].isdigit():
+            raise ValueError(f"Invalid date format: {date_str}")
         
-        # Parse the date and time
-        if len(date_str) >= 8:
-            # Extract date part (YYYYMMDD)
-            date_part = date_str[:8]
-            
-            # Extract time part if available (HHMMSS)
-            time_part = "000000"  # default to midnight
-            if len(date_str) >= 14:
-                time_part = date_str[8:14]
-            elif len(date_str) >= 12:
-                time_part = date_str[8:12] + "00"  # HHMM -> HHMMSS
-            elif len(date_str) >= 10:
-                time_part = date_str[8:10] + "0000"  # HH -> HHMMSS
-            
-            # Parse datetime
-            datetime_str = date_part + time_part
-            dt = datetime.strptime(datetime_str, '%Y%m%d%H%M%S')
-            
-            # Apply timezone offset to get the correct local date
-            if timezone_offset != 0:
-                tz = timezone(timedelta(hours=timezone_offset))
-                dt = dt.replace(tzinfo=tz)
-                # Convert to local time to get the correct date
-                dt = dt.astimezone()
-            
-            # Create date at midnight in local timezone
-            local_date = datetime(dt.year, dt.month, dt.day)
-            
-            # Add one day to correct QFX date discrepancy
-            # (QFX dates are consistently 1 day behind banking interface)
-            corrected_date = local_date + timedelta(days=1)
-            
-            return corrected_date
-        else:
+        # Time part is optional and may be HH, HHMM or HHMMSS (defaults to midnight)
+        time_length = min(len(date_str) - 8, 6) // 2 * 2
+        time_part = date_str[8:8 + time_length]
+        if time_part and not time_part.isdigit():
             raise ValueError(f"Invalid date format: {date_str}")
+        
+        dt = datetime(
+            int(date_str[0:4]), int(date_str[4:6]), int(date_str[6:8]),
+            int(time_part[0:2] or 0), int(time_part[2:4] or 0), int(time_part[4:6] or 0)
+        )
+        
+        # Apply timezone offset to get the correct local date
+        if timezone_offset != 0:
+            tz = timezone(timedelta(hours=timezone_offset))
+            dt = dt.replace(tzinfo=tz)
+            # Convert to local time to get the correct date
+            dt = dt.astimezone()
+        
+        # Create date at midnight in local timezone
+        local_date = datetime(dt.year, dt.month, dt.day)
+        
+        # Add one day to correct QFX date discrepancy
+        # (QFX dates are consistently 1 day behind banking interface)
+        return local_date + timedelta(days=1)
     
     def _extract_field_value(self, content: str, field_name: str) -> str:
         """
@@ -78,53 +103,133 @@ class QFXParser:
         match = re.search(pattern, content)
         return match.group(1).strip() if match else ""
     
-    def parse_file(self) -> List[Dict]:
+    def _extract_fields(self, content: str) -> Dict[str, str]:
         """
-        Parse the QFX file and extract transaction data using regex
-        Returns list of transaction dictionaries
+        Extract every tag value from an OFX block in a single pass
+        Keeps the first non-empty occurrence of each tag, like _extract_field_value
+        """
+        fields = {}
+        for tag, value in TAG_PATTERN.findall(content):
+            if value and tag not in fields:
+                fields[tag] = value.strip()
+        return fields
+    
+    def _decode_block(self, block: bytes) -> str:
+        """
+        Decode a raw STMTTRN block, falling back to latin-1 for non UTF-8 exports
         """
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as file:
-                self.raw_content = file.read()
+            return block.decode('utf-8')
         except UnicodeDecodeError:
-            # Try with different encoding
-            with open(self.file_path, 'r', encoding='latin-1') as file:
-                self.raw_content = file.read()
+            return block.decode('latin-1')
+    
+    def _update_account_id(self, content: bytes):
+        """
+        Remember the last ACCTID that appears in content (text between STMTTRN blocks),
+        and widen the statement period to the DTSTART/DTEND values found there
+        """
+        matches = ACCOUNT_PATTERN.findall(content)
+        if matches:
+            self.account_id = self._decode_block(matches[-1]).strip()
         
-        # Find all STMTTRN blocks using regex
-        stmttrn_pattern = r'<STMTTRN>(.*?)</STMTTRN>'
-        stmttrn_matches = re.findall(stmttrn_pattern, self.raw_content, re.DOTALL)
+        for tag, value in STATEMENT_DATE_PATTERN.findall(content):
+            try:
+                parsed = self._parse_date(self._decode_block(value))
+            except ValueError:
+                continue
+            if tag == b'DTSTART' and (self.statement_start is None or parsed < self.statement_start):
+                self.statement_start = parsed
+            elif tag == b'DTEND' and (self.statement_end is None or parsed > self.statement_end):
+                self.statement_end = parsed
+    
+    def _parse_stmttrn_block(self, stmttrn_content: str) -> Optional[Transaction]:
+        """
+        Convert the contents of one STMTTRN block into a Transaction
+        Returns None for non-DEBIT transactions and blocks that cannot be parsed
+        """
+        fields = self._extract_fields(stmttrn_content)
+        trntype = fields.get('TRNTYPE', '')
         
-        transactions = []
+        # Only process DEBIT transactions (purchases, not payments)
+        if trntype != 'DEBIT':
+            return None
+        
+        fitid = fields.get('FITID', '')
+        dtposted = fields.get('DTPOSTED', '')
+        trnamt = fields.get('TRNAMT', '')
+        name = fields.get('NAME', '')
+        memo = fields.get('MEMO', '')
+        
+        try:
+            return Transaction(
+                id=fitid,
+                amount=float(trnamt) if trnamt else 0.0,
+                date=self._parse_date(dtposted) if dtposted else None,
+                title=name,
+                location=memo,
+                account=self.account_id
+            )
+        except (ValueError, Exception) as e:
+            print(f"Warning: Could not parse transaction: {e}")
+            return None
+    
+    def iter_transactions(self, chunk_size: int = 1 << 16,
+                          include: Optional[Callable[[Transaction], bool]] = None) -> Iterator[Transaction]:
+        """
+        Stream DEBIT transactions from the QFX file, one STMTTRN block at a time
+        The file is read in fixed-size chunks, so memory stays flat regardless of file size
+        If include is given, transactions it returns False for are dropped (and counted in skipped_count)
+        """
+        open_tag = b'<STMTTRN>'
+        close_tag = b'</STMTTRN>'
+        buffer = b''
         
-        for stmttrn_content in stmttrn_matches:
-            # Extract transaction type first
-            trntype = self._extract_field_value(stmttrn_content, 'TRNTYPE')
-            
-            # Only process DEBIT transactions (purchases, not payments)
-            if trntype == 'DEBIT':
-                # Extract other fields
-                fitid = self._extract_field_value(stmttrn_content, 'FITID')
-                dtposted = self._extract_field_value(stmttrn_content, 'DTPOSTED')
-                trnamt = self._extract_field_value(stmttrn_content, 'TRNAMT')
-                name = self._extract_field_value(stmttrn_content, 'NAME')
-                memo = self._extract_field_value(stmttrn_content, 'MEMO')
+        with open(self.file_path, 'rb') as file:
+            while True:
+                chunk = file.read(chunk_size)
+                buffer += chunk
+                position = 0
                 
-                try:
-                    transaction_data = {
-                        'id': fitid,
-                        'type': trntype,
-                        'date': self._parse_date(dtposted) if dtposted else None,
-                        'amount': float(trnamt) if trnamt else 0.0,
-                        'title': name,
-                        'location': memo
-                    }
+                while True:
+                    start = buffer.find(open_tag, position)
+                    if start == -1:
+                        self._update_account_id(buffer[position:])
+                        # Keep a short tail in case a tag is split across chunks
+                        position = max(position, len(buffer) - CHUNK_TAIL_SIZE)
+                        break
+                    
+                    # Statement headers (and the account number) sit between blocks
+                    self._update_account_id(buffer[position:start])
                     
-                    transactions.append(transaction_data)
+                    end = buffer.find(close_tag, start + len(open_tag))
+                    if end == -1:
+                        # Block continues in the next chunk
+                        position = start
+                        break
                     
-                except (ValueError, Exception) as e:
-                    print(f"Warning: Could not parse transaction: {e}")
-                    continue
+                    block = buffer[start + len(open_tag):end]
+                    position = end + len(close_tag)
+                    
+                    transaction = self._parse_stmttrn_block(self._decode_block(block))
+                    if not transaction:
+                        continue
+                    if include and not include(transaction):
+                        self.skipped_count += 1
+                        continue
+                    yield transaction
+                
+                buffer = buffer[position:]
+                
+                if not chunk:
+                    break
+    
+    def parse_file(self, include: Optional[Callable[[Transaction], bool]] = None) -> List[Transaction]:
+        """
+        Parse the QFX file and extract transaction data
+        Returns list of Transaction records, optionally filtered by include
+        Use iter_transactions() to process very large files without holding them in memory
+        """
+        transactions = list(self.iter_transactions(include=include))
         
         self.transactions = transactions
         return transactions
@@ -137,8 +242,8 @@ class QFXParser:
         """Print a summary of parsed transactions"""
         print(f"Parsed {len(self.transactions)} DEBIT transactions")
         if self.transactions:
-            valid_dates = [t['date'] for t in self.transactions if t['date']]
+            valid_dates = [t.date for t in self.transactions if t.date]
             if valid_dates:
                 print(f"Date range: {min(valid_dates)} to {max(valid_dates)}")
-            total_amount = sum(t['amount'] for t in self.transactions)
+            total_amount = sum(t.amount for t in self.transactions)
             print(f"Total amount: ${total_amount:.2f}")
@@ -0,0 +1,107 @@
+"""
+Local queue of transactions uploaded with a provisional category during a headless sync
+The review command resolves them later and patches the Notion pages the sync created in bulk
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Union
+
+# Values of the status column
+STATUS_PENDING = 'pending'      # Waiting for a reviewer
+STATUS_RESOLVED = 'resolved'    # Category chosen, Notion page not patched yet
+
+
+class ReviewQueue:
+    """
+    SQLite-backed queue of low-confidence categorizations, keyed by transaction ID.
+
+    - add() records a transaction with the provisional category it was uploaded with and the
+      ID of the page created for it. Re-adding a transaction (e.g. a retried sync) keeps a
+      reviewer's earlier answer.
+    - resolve() stores the reviewer's category; remove() drops an item once its Notion
+      page carries that category, so a failed patch is retried by the next review.
+    """
+
+    def __init__(self, queue_path: Union[str, Path]):
+        self.queue_path = Path(queue_path)
+        self._connection = sqlite3.connect(str(self.queue_path))
+        with self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS review_items (
+                    transaction_id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    posted TEXT,
+                    suggested_category TEXT NOT NULL,
+                    confidence REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    category TEXT,
+                    queued_at REAL NOT NULL,
+                    page_id TEXT
+                )
+            """)
+            # Queues created before page IDs were recorded
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(review_items)")}
+            if 'page_id' not in columns:
+                self._connection.execute("ALTER TABLE review_items ADD COLUMN page_id TEXT")
+
+    def add(self, transaction: Dict, suggested_category: str, confidence: float):
+        """Queue a transaction uploaded with suggested_category as its provisional category (and its page_id)"""
+        posted = transaction['date'].isoformat() if transaction['date'] else None
+        with self._connection:
+            self._connection.execute("""
+                INSERT INTO review_items (transaction_id, title, location, amount, posted,
+                                          suggested_category, confidence, status, queued_at, page_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (transaction_id) DO UPDATE SET
+                    suggested_category = excluded.suggested_category,
+                    confidence = excluded.confidence,
+                    page_id = COALESCE(excluded.page_id, page_id)
+            """, (transaction['id'], transaction['title'], transaction['location'], transaction['amount'],
+                  posted, suggested_category, confidence, STATUS_PENDING, time.time(), transaction.get('page_id')))
+
+    def items(self, status: str) -> List[Dict]:
+        """Queued items with the given status, oldest first, as transaction-like dicts"""
+        rows = self._connection.execute("""
+            SELECT transaction_id, title, location, amount, posted, suggested_category, confidence, category, page_id
+            FROM review_items WHERE status = ? ORDER BY queued_at, transaction_id
+        """, (status,)).fetchall()
+        return [
+            {'id': transaction_id, 'title': title, 'location': location, 'amount': amount, 'date': posted,
+             'suggested_category': suggested_category, 'confidence': confidence, 'category': category,
+             'page_id': page_id}
+            for transaction_id, title, location, amount, posted, suggested_category, confidence, category, page_id
+            in rows
+        ]
+
+    def pending(self) -> List[Dict]:
+        """Items waiting for a reviewer"""
+        return self.items(STATUS_PENDING)
+
+    def resolved(self) -> List[Dict]:
+        """Items with a chosen category whose Notion page still has to be patched"""
+        return self.items(STATUS_RESOLVED)
+
+    def resolve(self, resolutions: Dict[str, str]):
+        """Record the reviewer's category for each {transaction_id: category}"""
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE review_items SET status = ?, category = ? WHERE transaction_id = ?",
+                [(STATUS_RESOLVED, category, transaction_id) for transaction_id, category in resolutions.items()]
+            )
+
+    def remove(self, transaction_ids: List[str]):
+        """Drop items whose Notion page has been patched"""
+        with self._connection:
+            self._connection.executemany("DELETE FROM review_items WHERE transaction_id = ?",
+                                         [(transaction_id,) for transaction_id in transaction_ids])
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM review_items").fetchone()[0]
+
+    def close(self):
+        """Close the underlying database connection"""
+        self._connection.close()
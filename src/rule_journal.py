@@ -0,0 +1,140 @@
+"""
+Append-only journal for rules and category descriptions accepted during a session
+Entries are durable as soon as they are appended; compact() merges them into the
+sectioned transaction_rules.txt with a single atomic rewrite
+"""
+
+import os
+from pathlib import Path
+from typing import List, Tuple, Union
+
+from file_lock import atomic_write, file_lock
+
+RULES_PATH = Path(__file__).parent.parent / 'transaction_rules.txt'
+DESCRIPTION_PREFIX = '# CATEGORY_DESC:'
+
+# Section of the rules file each category's rules are merged into
+SECTION_HEADERS = {
+    'Transportation': '# Transportation',
+    'Groceries': '# Groceries',
+    'Subscription': '# Subscriptions',
+    'Partying': '# Partying (Alcohol/Bars/Clubs)',
+    'Cafe': '# Coffee/Cafes',
+    'Eating Out': '# Eating Out',
+    'Clothing': '# Clothing',
+    'Technology': '# Technology',
+    'Events': '# Events',
+    'Vanity': '# Vanity',
+    'Misc': '# Misc (known patterns that should be misc)'
+}
+DEFAULT_SECTION = SECTION_HEADERS['Misc']
+
+
+def description_category(line: str) -> str:
+    """Category named by a "# CATEGORY_DESC: Category | Description" line, or '' if malformed"""
+    description_part = line[len(DESCRIPTION_PREFIX):].strip()
+    if ' | ' not in description_part:
+        return ''
+    return description_part.split(' | ', 1)[0].strip()
+
+
+def _section_end(lines: List[str], header: str) -> int:
+    """Index just past the last non-blank line of a section (end of file if the section is missing)"""
+    for i, line in enumerate(lines):
+        if line.strip() == header:
+            end = len(lines)
+            for j in range(i + 1, len(lines)):
+                if lines[j].strip().startswith('# ') and lines[j].strip() != header:
+                    end = j
+                    break
+            while end > i + 1 and not lines[end - 1].strip():
+                end -= 1
+            return end
+    return len(lines)
+
+
+def merge_entries(content: str, entries: List[str]) -> Tuple[str, int]:
+    """
+    Merge journal entries into rules file content
+    Rules go to the end of their category's section, descriptions to the end of the file;
+    entries already in the file are skipped, so merging the same journal twice is harmless
+    Returns (new content, number of entries merged)
+    """
+    lines = content.split('\n') if content else []
+    existing_lines = {line.strip() for line in lines}
+    described = {description_category(line.strip()) for line in lines
+                 if line.strip().startswith(DESCRIPTION_PREFIX)}
+
+    merged = 0
+    for entry in entries:
+        if entry.startswith(DESCRIPTION_PREFIX):
+            category = description_category(entry)
+            if not category or category in described:
+                continue
+            lines.extend(['', entry])
+            described.add(category)
+        elif ' -> ' in entry:
+            if entry in existing_lines:
+                continue
+            category = entry.split(' -> ', 1)[1].strip()
+            lines.insert(_section_end(lines, SECTION_HEADERS.get(category, DEFAULT_SECTION)), entry)
+        else:
+            continue
+        existing_lines.add(entry)
+        merged += 1
+
+    return '\n'.join(lines), merged
+
+
+class RuleJournal:
+    """
+    "<rules file>.journal", written in the rules file's own line format.
+    Appends and compaction both hold the rules file's lock, so concurrent syncs don't lose entries.
+    """
+
+    def __init__(self, rules_path: Union[str, Path] = RULES_PATH):
+        self.rules_path = Path(rules_path)
+        self.journal_path = Path(f"{rules_path}.journal")
+
+    def append_rule(self, pattern: str, category: str):
+        """Record a rule"""
+        self._append(f"{pattern} -> {category}")
+
+    def append_description(self, category: str, description: str):
+        """Record a category description"""
+        self._append(f"{DESCRIPTION_PREFIX} {category} | {description}")
+
+    def _append(self, line: str):
+        with file_lock(self.rules_path):
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def entries(self) -> List[str]:
+        """Journaled lines not yet merged into the rules file, oldest first"""
+        if not self.journal_path.exists():
+            return []
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def compact(self) -> int:
+        """
+        Merge the journal into the rules file (one atomic rewrite) and remove it
+        Returns the number of entries merged
+        """
+        with file_lock(self.rules_path):
+            entries = self.entries()
+            if not entries:
+                return 0
+
+            content = ''
+            if self.rules_path.exists():
+                with open(self.rules_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            content, merged = merge_entries(content, entries)
+            if merged:
+                atomic_write(self.rules_path, content)
+            # Removed only after the rules file is replaced; a crash in between re-merges as a no-op
+            os.remove(self.journal_path)
+        return merged
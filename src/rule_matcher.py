@@ -0,0 +1,342 @@
+"""
+Multi-pattern rule matcher for transaction categorization
+Compiles all "SEARCH_STRING -> CATEGORY" rules into one Aho-Corasick automaton, and all
+wildcard and regex rules into one combined regular expression
+
+Rule grammar (left-hand side of "... -> CATEGORY"); clauses joined with " && " must all hold:
+    STARBUCKS               title contains STARBUCKS
+    ^UBER                   title starts with UBER
+    EATS$                   title ends with EATS
+    ^PRESTO FARE$           title is exactly PRESTO FARE
+    glob:AMZN MKTP CA*      whole title matches a wildcard pattern (*, ?, [...])
+    re:^(LYFT|UBER) +RIDE   regular expression found in the title (case-insensitive)
+    location:TORONTO        the same predicates against the location (location:^..., location:glob:..., location:re:...)
+    amount:0..5.50          amount (ignoring sign) in a range; either end may be left open (amount:100..)
+"""
+
+import fnmatch
+import heapq
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+CLAUSE_SEPARATOR = ' && '
+FIELDS = ('title', 'location', 'amount')
+
+# Sentinels placed around the title, so anchored rules are plain strings in the automaton
+TITLE_START = '\x02'
+TITLE_END = '\x03'
+
+Clause = Tuple[str, str, object]  # (field, kind, value)
+
+# Title clause kinds that are plain strings in the automaton
+STRING_KINDS = ('contains', 'prefix', 'suffix', 'exact')
+
+
+def _split_field(clause: str) -> Tuple[str, str]:
+    field, colon, body = clause.partition(':')
+    if colon and field.lower() in FIELDS:
+        return field.lower(), body
+    return 'title', clause
+
+
+def parse_rule(pattern: str) -> List[Clause]:
+    """
+    Parse a rule's left-hand side into (field, kind, value) clauses
+    kind is contains, prefix, suffix, exact, glob or regex for title/location, and range for amount
+    Raises ValueError if the rule is malformed
+    """
+    clauses = []
+    for clause in pattern.split(CLAUSE_SEPARATOR):
+        field, body = _split_field(clause)
+
+        if field == 'amount':
+            low, dots, high = body.partition('..')
+            try:
+                if dots:
+                    bounds = (float(low) if low.strip() else None, float(high) if high.strip() else None)
+                else:
+                    bounds = (float(body), float(body))
+            except ValueError:
+                raise ValueError(f"invalid amount range {body!r} (expected MIN..MAX)")
+            clauses.append((field, 'range', bounds))
+            continue
+
+        if body[:5].lower() == 'glob:':
+            kind, value = 'glob', body[5:]
+        elif body[:3].lower() == 're:':
+            kind, value = 'regex', body[3:]
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise ValueError(f"invalid regular expression {value!r}: {e}")
+        else:
+            starts = body.startswith('^')
+            ends = body.endswith('$') and len(body) > starts
+            value = body[1 if starts else 0:len(body) - 1 if ends else len(body)]
+            kind = {(False, False): 'contains', (True, False): 'prefix',
+                    (False, True): 'suffix', (True, True): 'exact'}[(starts, ends)]
+
+        if not value:
+            raise ValueError(f"empty pattern in {clause!r}")
+        clauses.append((field, kind, value))
+    return clauses
+
+
+def _format_number(value: Optional[float]) -> str:
+    return '' if value is None else f"{value:f}".rstrip('0').rstrip('.')
+
+
+def normalize_pattern(pattern: str) -> str:
+    """
+    Canonical form of a rule's left-hand side: search text upper-cased (titles are matched
+    upper-cased), regular expressions left as written. Raises ValueError if the rule is malformed
+    """
+    parts = []
+    for field, kind, value in parse_rule(pattern):
+        if kind == 'range':
+            low, high = value
+            text = _format_number(low) if low == high else f"{_format_number(low)}..{_format_number(high)}"
+        elif kind == 'regex':
+            text = f"re:{value}"
+        elif kind == 'glob':
+            text = f"glob:{value.upper()}"
+        else:
+            text = (('^' if kind in ('prefix', 'exact') else '') + value.upper()
+                    + ('$' if kind in ('suffix', 'exact') else ''))
+        parts.append(text if field == 'title' else f"{field}:{text}")
+    return CLAUSE_SEPARATOR.join(parts)
+
+
+def _regex_source(kind: str, value: str) -> str:
+    """Regex that matches from the start of the field when the glob/regex clause holds"""
+    if kind == 'glob':
+        return fnmatch.translate(value)
+    return f".*?(?:{value})"
+
+
+def _clause_predicate(field: str, kind: str, value) -> Callable[[str, str, Optional[float]], bool]:
+    """Compile one clause into a check of (title, location, amount)"""
+    if kind == 'range':
+        low, high = value
+
+        def check_amount(title: str, location: str, amount: Optional[float]) -> bool:
+            if amount is None:
+                return False
+            amount = abs(amount)
+            return (low is None or amount >= low) and (high is None or amount <= high)
+        return check_amount
+
+    if kind in ('glob', 'regex'):
+        compiled = re.compile(_regex_source(kind, value), re.IGNORECASE | re.DOTALL)
+        test = lambda text: compiled.match(text) is not None
+    elif kind == 'contains':
+        test = lambda text: value in text
+    elif kind == 'prefix':
+        test = lambda text: text.startswith(value)
+    elif kind == 'suffix':
+        test = lambda text: text.endswith(value)
+    else:
+        test = lambda text: text == value
+
+    if field == 'title':
+        return lambda title, location, amount: test(title)
+    # Only location rules read the location, so it is upper-cased here rather than by every caller
+    return lambda title, location, amount: test(location.upper())
+
+
+def _search_string(kind: str, value: str) -> str:
+    """Automaton string of a plain or anchored title clause"""
+    return {'contains': value, 'prefix': TITLE_START + value,
+            'suffix': value + TITLE_END, 'exact': TITLE_START + value + TITLE_END}[kind]
+
+
+class RuleMatcher:
+    """
+    Aho-Corasick automaton over rule search strings.
+
+    A title is scanned once, character by character, no matter how many rules exist.
+    When several rules match, the one declared first wins (rules file order, then rules
+    added during the session), which is the same precedence as checking rules in order.
+
+    Rules of other kinds are compiled alongside it:
+    - anchored title rules (^X, X$, ^X$) are automaton strings around start/end sentinels
+    - single glob/regex title rules form one alternation, tried once per title, whose first
+      matching branch is the earliest declared of them
+    - rules with several clauses or on location/amount are keyed in the automaton by their first
+      plain or anchored title clause, so the scan yields the few that could hold; those and the
+      rules without such a clause are checked in order, and only while they could still beat
+      the best match found so far
+    """
+
+    def __init__(self, rules: Optional[Dict[str, str]] = None):
+        self._goto: List[Dict[str, int]] = [{}]  # state -> {character: next state}
+        self._fail: List[int] = [0]              # state -> failure link
+        self._terminal: List[int] = [-1]         # state -> index of the first rule ending here
+        self._best: List[int] = [-1]             # state -> best rule index reachable via failure links
+        self._patterns: List[str] = []
+        self._categories: List[str] = []
+        self._pattern_index: Dict[str, int] = {}
+        self._regex_rules: List[Tuple[int, str]] = []   # (rule index, regex source), declaration order
+        self._combined = None                           # Alternation of _regex_rules
+        self._regex_fallback: List[Tuple[int, 're.Pattern']] = []
+        self._conditional: Dict[int, List[Callable]] = {}  # rule index -> clause checks
+        self._unkeyed: List[int] = []                   # Conditional rules without a title string clause
+        self._triggers: Dict[int, List[int]] = {}       # state -> conditional rules keyed by its string
+        self._trigger_out: List[int] = [-1]             # state -> nearest state on its failure chain with triggers
+        self._needs_build = False
+
+        for pattern, category in (rules or {}).items():
+            self.add(pattern, category)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def add(self, pattern: str, category: str):
+        """
+        Add a rule (see the module docstring for the grammar)
+        Re-adding an existing pattern updates its category but keeps its precedence
+        Raises ValueError if the rule is malformed
+        """
+        if pattern in self._pattern_index:
+            self._categories[self._pattern_index[pattern]] = category
+            return
+
+        clauses = parse_rule(pattern)
+        rule_index = len(self._patterns)
+        self._patterns.append(pattern)
+        self._categories.append(category)
+        self._pattern_index[pattern] = rule_index
+        self._needs_build = True
+
+        field, kind, value = clauses[0]
+        if len(clauses) > 1 or field != 'title':
+            self._conditional[rule_index] = [_clause_predicate(*clause) for clause in clauses]
+            key = next((clause for clause in clauses if clause[0] == 'title' and clause[1] in STRING_KINDS), None)
+            if key is None:
+                self._unkeyed.append(rule_index)
+            else:
+                self._triggers.setdefault(self._insert(_search_string(key[1], key[2])), []).append(rule_index)
+            return
+        if kind in ('glob', 'regex'):
+            self._regex_rules.append((rule_index, _regex_source(kind, value)))
+            return
+
+        state = self._insert(_search_string(kind, value))
+        if self._terminal[state] == -1:
+            self._terminal[state] = rule_index
+
+    def _insert(self, search_string: str) -> int:
+        """Extend the trie with a string and return its final state; failure links are recomputed lazily"""
+        state = 0
+        for character in search_string:
+            next_state = self._goto[state].get(character)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append(-1)
+                self._best.append(-1)
+                self._trigger_out.append(-1)
+                self._goto[state][character] = next_state
+            state = next_state
+        return state
+
+    def _build(self):
+        """Compute failure links and best-match outputs, and compile the glob/regex alternation"""
+        self._build_automaton()
+
+        self._combined = None
+        self._regex_fallback = []
+        if self._regex_rules:
+            source = '|'.join(f"(?P<_rule{index}>{body})" for index, body in self._regex_rules)
+            try:
+                self._combined = re.compile(source, re.IGNORECASE | re.DOTALL)
+            except re.error:
+                # e.g. a rule with inline global flags, which can't be embedded; check each rule instead
+                self._regex_fallback = [(index, re.compile(body, re.IGNORECASE | re.DOTALL))
+                                        for index, body in self._regex_rules]
+
+        self._needs_build = False
+
+    def _build_automaton(self):
+        """Compute failure links and best-match outputs with a breadth-first walk of the trie"""
+        self._best[0] = self._terminal[0]
+        queue = []
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        position = 0
+        while position < len(queue):
+            state = queue[position]
+            position += 1
+
+            inherited = self._best[self._fail[state]]
+            own = self._terminal[state]
+            if own == -1 or (inherited != -1 and inherited < own):
+                self._best[state] = inherited
+            else:
+                self._best[state] = own
+            self._trigger_out[state] = state if state in self._triggers else self._trigger_out[self._fail[state]]
+
+            for character, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and character not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(character, 0)
+                queue.append(child)
+
+    def match(self, text: str, location: str = '', amount: Optional[float] = None) -> Optional[str]:
+        """
+        Return the category of the highest-precedence rule that holds for a transaction, or None
+        text is the upper-cased title; location and amount are only read by rules on those fields
+        """
+        if self._needs_build:
+            self._build()
+
+        goto = self._goto
+        fail = self._fail
+        best_for_state = self._best
+        trigger_out = self._trigger_out
+        triggers = self._triggers
+
+        best = best_for_state[0]
+        triggered = set()  # Conditional rules whose title string occurs
+        state = 0
+        for character in TITLE_START + text + TITLE_END:
+            while state and character not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(character, 0)
+
+            output = trigger_out[state]
+            while output != -1:
+                triggered.update(triggers[output])
+                output = trigger_out[fail[output]]
+
+            candidate = best_for_state[state]
+            if candidate != -1 and (best == -1 or candidate < best):
+                best = candidate
+                if best == 0:
+                    break
+
+        if self._combined is not None and (best == -1 or self._regex_rules[0][0] < best):
+            found = self._combined.match(text)
+            if found:
+                index = int(found.lastgroup[len('_rule'):])
+                if best == -1 or index < best:
+                    best = index
+        for index, compiled in self._regex_fallback:
+            if best != -1 and index > best:
+                break
+            if compiled.match(text):
+                best = index
+                break
+
+        for index in heapq.merge(sorted(triggered), self._unkeyed):
+            if best != -1 and index > best:
+                break
+            if all(check(text, location, amount) for check in self._conditional[index]):
+                best = index
+                break
+
+        return self._categories[best] if best != -1 else None
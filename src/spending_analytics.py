@@ -0,0 +1,159 @@
+"""
+Local spending analytics over parsed, categorized transactions
+Transactions are loaded once into columnar NumPy arrays; every report is a vectorized group-by
+"""
+
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, only needed for analytics
+    np = None
+
+from transaction_categorizer import extract_merchant_pattern
+
+UNCATEGORIZED = 'Uncategorized'
+
+
+class SpendingAnalytics:
+    """
+    Columnar view of transactions:
+    - days: date as int32 days since 1970-01-01
+    - amounts: spend as float64 (purchases positive, refunds negative)
+    - category_codes / merchant_codes: int32 indexes into self.categories / self.merchants
+
+    Undated transactions are left out (counted in skipped_count).
+    """
+
+    def __init__(self, transactions: Sequence, merchant_key: Callable[[str], str] = extract_merchant_pattern):
+        if np is None:
+            raise ImportError("numpy is required for spending analytics (pip install numpy)")
+
+        category_index: Dict[str, int] = {}
+        merchant_index: Dict[str, int] = {}
+        merchant_by_title: Dict[str, int] = {}
+        epoch = date(1970, 1, 1).toordinal()
+
+        days, amounts, category_codes, merchant_codes = [], [], [], []
+        self.skipped_count = 0
+        for transaction in transactions:
+            transaction_date = transaction['date']
+            if transaction_date is None:
+                self.skipped_count += 1
+                continue
+
+            title = transaction['title']
+            merchant_code = merchant_by_title.get(title)
+            if merchant_code is None:
+                merchant_code = merchant_index.setdefault(merchant_key(title), len(merchant_index))
+                merchant_by_title[title] = merchant_code
+
+            category = transaction.get('category') or UNCATEGORIZED
+            days.append(transaction_date.toordinal() - epoch)
+            amounts.append(-transaction['amount'])
+            category_codes.append(category_index.setdefault(category, len(category_index)))
+            merchant_codes.append(merchant_code)
+
+        self.days = np.array(days, dtype=np.int32)
+        self.amounts = np.array(amounts, dtype=np.float64)
+        self.category_codes = np.array(category_codes, dtype=np.int32)
+        self.merchant_codes = np.array(merchant_codes, dtype=np.int32)
+        self.categories: List[str] = list(category_index)
+        self.merchants: List[str] = list(merchant_index)
+
+        # Months since 1970-01 (datetime64[M] stores exactly that)
+        self.months = self.days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def date_range(self) -> Optional[tuple[date, date]]:
+        """First and last transaction date"""
+        if not len(self):
+            return None
+        first, last = self.days.min(), self.days.max()
+        return (np.datetime64(int(first), 'D').astype(date), np.datetime64(int(last), 'D').astype(date))
+
+    def total(self) -> float:
+        """Total spend"""
+        return float(self.amounts.sum())
+
+    def category_totals(self) -> Dict[str, tuple[float, int]]:
+        """{category: (total spend, transaction count)}, largest spend first"""
+        sums = np.bincount(self.category_codes, weights=self.amounts, minlength=len(self.categories))
+        counts = np.bincount(self.category_codes, minlength=len(self.categories))
+        order = np.argsort(-sums, kind='stable')
+        return {self.categories[i]: (float(sums[i]), int(counts[i])) for i in order}
+
+    def monthly_category_totals(self) -> tuple[List[str], List[str], 'np.ndarray', 'np.ndarray']:
+        """
+        Spend and counts per month and category, covering every month in the date range
+        Returns (month labels "YYYY-MM", categories, sums[month, category], counts[month, category])
+        """
+        if not len(self):
+            return [], list(self.categories), np.zeros((0, len(self.categories))), np.zeros((0, len(self.categories)), dtype=np.int64)
+
+        first_month = int(self.months.min())
+        month_count = int(self.months.max()) - first_month + 1
+        category_count = len(self.categories)
+
+        keys = (self.months - first_month) * category_count + self.category_codes
+        sums = np.bincount(keys, weights=self.amounts, minlength=month_count * category_count)
+        counts = np.bincount(keys, minlength=month_count * category_count)
+
+        labels = np.arange(first_month, first_month + month_count).astype('datetime64[M]').astype(str).tolist()
+        return (labels, list(self.categories),
+                sums.reshape(month_count, category_count), counts.reshape(month_count, category_count))
+
+    def top_merchants(self, limit: int = 10, category: Optional[str] = None) -> List[tuple[str, float, int]]:
+        """[(merchant, total spend, count)] for the biggest merchants, optionally within one category"""
+        codes, amounts = self.merchant_codes, self.amounts
+        if category is not None:
+            if category not in self.categories:
+                return []
+            mask = self.category_codes == self.categories.index(category)
+            codes, amounts = codes[mask], amounts[mask]
+
+        sums = np.bincount(codes, weights=amounts, minlength=len(self.merchants))
+        counts = np.bincount(codes, minlength=len(self.merchants))
+        limit = min(limit, int(np.count_nonzero(counts)))
+        if limit <= 0:
+            return []
+
+        top = np.argpartition(-sums, limit - 1)[:limit]
+        top = top[np.argsort(-sums[top], kind='stable')]
+        return [(self.merchants[i], float(sums[i]), int(counts[i])) for i in top]
+
+    def format_report(self, top_limit: int = 10, recent_months: int = 12, top_categories: int = 4) -> str:
+        """Plain-text spending report: totals per category, recent months (biggest categories), top merchants"""
+        if not len(self):
+            return "No dated transactions to report on"
+
+        first, last = self.date_range()
+        lines = [f"📈 Spending report: {len(self)} transactions from {first} to {last}, total ${self.total():,.2f}"]
+        if self.skipped_count:
+            lines.append(f"   ({self.skipped_count} undated transaction(s) left out)")
+
+        lines.append("\n🗂️  By category:")
+        for category, (amount, count) in self.category_totals().items():
+            lines.append(f"   {category:<20} ${amount:>12,.2f}  ({count} transactions)")
+
+        labels, categories, sums, _ = self.monthly_category_totals()
+        shown = slice(max(0, len(labels) - recent_months), len(labels))
+        lines.append(f"\n📅 Last {len(labels[shown])} month(s):")
+        for label, row in zip(labels[shown], sums[shown]):
+            nonzero = np.flatnonzero(row)
+            parts = ', '.join(f"{categories[i]} ${row[i]:,.0f}"
+                              for i in nonzero[np.argsort(-row[nonzero], kind='stable')][:top_categories])
+            lines.append(f"   {label}: ${row.sum():>10,.2f}  {parts}")
+
+        lines.append(f"\n🏪 Top {top_limit} merchants:")
+        for merchant, amount, count in self.top_merchants(top_limit):
+            lines.append(f"   {merchant:<30} ${amount:>12,.2f}  ({count} transactions)")
+
+        return '\n'.join(lines)
+
+    def print_report(self, top_limit: int = 10, recent_months: int = 12):
+        """Print format_report()"""
+        print(self.format_report(top_limit, recent_months))
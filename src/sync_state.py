@@ -0,0 +1,190 @@
+"""
+Local sync state for incremental runs
+Remembers which QFX files were already synced and how far each account has been synced
+"""
+
+import hashlib
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Union
+
+
+class SyncState:
+    """
+    SQLite-backed manifest of processed files plus a per-account high-water mark.
+
+    - Files are recorded by content hash, so an unchanged export is skipped outright
+      (even if renamed), while a re-downloaded statement with new rows is processed.
+    - For each account the latest synced posting date is kept together with the IDs of
+      the transactions synced on that date. Transactions posted before the mark, or on
+      that date with a known ID, are treated as already synced.
+    - The marks are a snapshot taken when the state is opened: files synced during a run
+      only stage their marks, and save_watermarks() writes them once at the end of the run.
+      Files can therefore be processed in any order (e.g. March's export before February's)
+      without later files being filtered against a mark an earlier file of the same run set.
+    """
+
+    def __init__(self, state_path: Union[str, Path]):
+        self.state_path = Path(state_path)
+        self._connection = sqlite3.connect(str(self.state_path))
+        with self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS processed_files (
+                    content_hash TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    transaction_count INTEGER NOT NULL,
+                    processed_at REAL NOT NULL
+                )
+            """)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS account_watermarks (
+                    account_id TEXT PRIMARY KEY,
+                    last_posted TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS watermark_ids (
+                    account_id TEXT NOT NULL,
+                    transaction_id TEXT NOT NULL,
+                    PRIMARY KEY (account_id, transaction_id)
+                )
+            """)
+        self._watermarks = self._load_watermarks()
+        self._pending: Dict[str, tuple[datetime, Set[str]]] = {}
+        self._staged: Dict[str, tuple[datetime, Set[str]]] = {}  # Marks of files synced this run
+        self._failed_accounts: Set[str] = set()  # Accounts with a failed sync this run
+
+    @staticmethod
+    def hash_file(file_path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+        """Return the SHA-256 of a file's contents, read in chunks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _load_watermarks(self) -> Dict[str, tuple[datetime, Set[str]]]:
+        """Load {account_id: (last_posted, ids synced on that date)}"""
+        watermarks = {}
+        for account_id, last_posted in self._connection.execute(
+                "SELECT account_id, last_posted FROM account_watermarks"):
+            watermarks[account_id] = (datetime.fromisoformat(last_posted), set())
+        for account_id, transaction_id in self._connection.execute(
+                "SELECT account_id, transaction_id FROM watermark_ids"):
+            if account_id in watermarks:
+                watermarks[account_id][1].add(transaction_id)
+        return watermarks
+
+    def is_file_processed(self, content_hash: str) -> bool:
+        """Check whether a file with this content hash was already fully synced"""
+        row = self._connection.execute(
+            "SELECT 1 FROM processed_files WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        return row is not None
+
+    def get_watermark(self, account_id: str) -> Optional[datetime]:
+        """Return the latest synced posting date for an account, or None"""
+        watermark = self._watermarks.get(account_id)
+        return watermark[0] if watermark else None
+
+    def is_new_transaction(self, transaction: Dict) -> bool:
+        """
+        Return False for transactions at or behind the account's high-water mark
+        Meant to be used as the QFXParser include filter
+        """
+        watermark = self._watermarks.get(transaction.get('account', ''))
+        if watermark is None or transaction['date'] is None:
+            return True
+
+        last_posted, synced_ids = watermark
+        if transaction['date'] < last_posted:
+            return False
+        if transaction['date'] == last_posted:
+            return transaction['id'] not in synced_ids
+        return True
+
+    @staticmethod
+    def _merge_mark(marks: Dict[str, tuple[datetime, Set[str]]], account_id: str,
+                    last_posted: datetime, ids: Set[str]):
+        """Keep the newest posting date per account, with the union of the IDs on that date"""
+        current = marks.get(account_id)
+        if current is None or last_posted > current[0]:
+            marks[account_id] = (last_posted, set(ids))
+        elif last_posted == current[0]:
+            current[1].update(ids)
+
+    def track(self, transaction: Dict):
+        """
+        Note a transaction that is part of the sync in progress
+        Only the newest posting date and its IDs are kept per account, so memory stays small
+        """
+        if transaction['date'] is None:
+            return
+        self._merge_mark(self._pending, transaction.get('account', ''), transaction['date'], {transaction['id']})
+
+    def discard(self):
+        """
+        Forget tracked transactions after a failed sync
+        Their accounts' high-water marks are not advanced by this run, so whatever failed is
+        still ahead of the mark next time
+        """
+        self._failed_accounts.update(self._pending)
+        self._pending = {}
+
+    def commit(self, files: List[tuple[str, str]], transaction_count: int):
+        """
+        Record fully synced files ((content_hash, file_name) pairs) and stage the high-water
+        mark of every account seen through track(); save_watermarks() writes the marks
+        """
+        now = time.time()
+
+        with self._connection:
+            for content_hash, file_name in files:
+                self._connection.execute("""
+                    INSERT OR REPLACE INTO processed_files (content_hash, file_name, transaction_count, processed_at)
+                    VALUES (?, ?, ?, ?)
+                """, (content_hash, file_name, transaction_count, now))
+
+        for account_id, (last_posted, synced_ids) in self._pending.items():
+            self._merge_mark(self._staged, account_id, last_posted, synced_ids)
+        self._pending = {}
+
+    def save_watermarks(self):
+        """
+        Advance the high-water marks to everything committed this run (call once, at the end)
+        Accounts with a discarded sync keep their old mark. The new marks also become the
+        snapshot is_new_transaction() filters against
+        """
+        now = time.time()
+        staged = {account_id: mark for account_id, mark in self._staged.items()
+                  if account_id not in self._failed_accounts}
+
+        with self._connection:
+            for account_id, (last_posted, synced_ids) in staged.items():
+                current = self._watermarks.get(account_id)
+                if current and current[0] > last_posted:
+                    continue
+                if current and current[0] == last_posted:
+                    synced_ids = synced_ids | current[1]
+                else:
+                    self._connection.execute("DELETE FROM watermark_ids WHERE account_id = ?", (account_id,))
+
+                self._connection.execute("""
+                    INSERT OR REPLACE INTO account_watermarks (account_id, last_posted, updated_at)
+                    VALUES (?, ?, ?)
+                """, (account_id, last_posted.isoformat(), now))
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO watermark_ids (account_id, transaction_id) VALUES (?, ?)",
+                    [(account_id, transaction_id) for transaction_id in synced_ids]
+                )
+                self._watermarks[account_id] = (last_posted, set(synced_ids))
+
+        self._staged = {}
+        self._failed_accounts = set()
+
+    def close(self):
+        """Close the underlying database connection"""
+        self._connection.close()
@@ -0,0 +1,110 @@
+"""
+Deterministic synthetic RBC-style QFX files for benchmarks
+Merchant names are drawn from transaction_rules.txt so rule matching sees realistic input
+"""
+
+import random
+from pathlib import Path
+from typing import List, Optional, Union
+
+from rule_matcher import parse_rule
+
+RULES_PATH = Path(__file__).parent.parent / 'transaction_rules.txt'
+
+# Used when the rules file is missing or empty
+DEFAULT_MERCHANTS = ['STARBUCKS', 'PRESTO FARE', 'LOBLAWS', 'AMAZON', 'UBER CANADA']
+
+# Merchants no rule knows about, so a share of transactions falls through to the AI tier
+UNMATCHED_MERCHANTS = [
+    'SQ *CORNER BAKERY', 'PAYPAL *EBAY', 'CINEPLEX ENTERTAINMENT', 'PETRO-CANADA', 'INDIGO BOOKS',
+    'HOME DEPOT', 'IKEA NORTH YORK', 'SPORT CHEK', 'THE KEG STEAKHOUSE', 'MEC MOUNTAIN EQUIPMENT',
+]
+
+LOCATIONS = ['TORONTO ON', 'MISSISSAUGA ON', 'NORTH YORK ON', 'OTTAWA ON', 'MONTREAL QC', 'VANCOUVER BC', '']
+
+QFX_HEADER = (
+    "OFXHEADER:100\n"
+    "DATA:OFXSGML\n"
+    "VERSION:102\n"
+    "SECURITY:NONE\n"
+    "ENCODING:USASCII\n"
+    "CHARSET:1252\n"
+    "COMPRESSION:NONE\n"
+    "OLDFILEUID:NONE\n"
+    "NEWFILEUID:NONE\n"
+    "\n"
+    "<OFX><CREDITCARDMSGSRSV1><CCSTMTTRNRS><CCSTMTRS><CURDEF>CAD\n"
+    "<CCACCTFROM><ACCTID>{account_id}</CCACCTFROM>\n"
+    "<BANKTRANLIST><DTSTART>{year}0101<DTEND>{year}1231\n"
+)
+
+QFX_FOOTER = "</BANKTRANLIST></CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1></OFX>\n"
+
+
+def load_rule_merchants(rules_path: Union[str, Path] = RULES_PATH) -> List[str]:
+    """Return the search strings of every plain "SEARCH_STRING -> CATEGORY" (title contains) rule"""
+    merchants = []
+    try:
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and ' -> ' in line:
+                    search_string = line.split(' -> ', 1)[0].strip().strip('"')
+                    try:
+                        clauses = parse_rule(search_string)
+                    except ValueError:
+                        continue
+                    if len(clauses) == 1 and clauses[0][:2] == ('title', 'contains'):
+                        merchants.append(search_string)
+    except FileNotFoundError:
+        pass
+    return merchants or list(DEFAULT_MERCHANTS)
+
+
+def _merchant_title(rng: random.Random, merchant: str) -> str:
+    """Decorate a merchant name the way card statements do (store numbers, references)"""
+    style = rng.random()
+    if style < 0.4:
+        return f"{merchant} #{rng.randint(100, 99999)}"
+    if style < 0.6:
+        return f"{merchant}/{rng.randint(10**7, 10**8 - 1):X}"
+    return merchant
+
+
+def write_synthetic_qfx(path: Union[str, Path], transaction_count: int, seed: int = 42,
+                        merchants: Optional[List[str]] = None, unmatched_ratio: float = 0.2,
+                        credit_ratio: float = 0.1, account_id: str = '4510123412341234',
+                        year: int = 2025, fitid_offset: int = 0) -> int:
+    """
+    Write a synthetic RBC-style QFX file with the given number of STMTTRN blocks
+    FITIDs are numbered from fitid_offset, so files written with different offsets don't share IDs
+    The same arguments always produce the same file. Returns the file size in bytes
+    """
+    rng = random.Random(seed)
+    if merchants is None:
+        merchants = load_rule_merchants()
+
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(QFX_HEADER.format(account_id=account_id, year=year))
+        for i in range(transaction_count):
+            is_credit = rng.random() < credit_ratio
+            if is_credit:
+                title = 'PAYMENT - THANK YOU'
+                amount = f"{rng.randint(5000, 300000) / 100:.2f}"
+            else:
+                merchant = rng.choice(UNMATCHED_MERCHANTS if rng.random() < unmatched_ratio else merchants)
+                title = _merchant_title(rng, merchant)
+                amount = f"-{rng.randint(100, 50000) / 100:.2f}"
+
+            f.write(
+                "<STMTTRN>\n"
+                f"<TRNTYPE>{'CREDIT' if is_credit else 'DEBIT'}\n"
+                f"<DTPOSTED>{year}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}120000[-5]\n"
+                f"<TRNAMT>{amount}\n"
+                f"<FITID>{fitid_offset + i:015d}\n"
+                f"<NAME>{title}\n"
+                f"<MEMO>{rng.choice(LOCATIONS)}\n"
+                "</STMTTRN>\n"
+            )
+        f.write(QFX_FOOTER)
+        return f.tell()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent merchant category cache
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from category_cache import CategoryCache
+from fake_ollama_server import FakeOllamaServer
+from transaction_categorizer import TransactionCategorizer, merchant_cache_key
+
+def test_category_cache():
+    print("Testing category cache...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_file = os.path.join(temp_dir, 'categorization_cache.db')
+        categories = ['Cafe', 'Groceries', 'Misc']
+        descriptions = {'Cafe': 'Coffee shops', 'Groceries': 'Supermarkets'}
+        categories_hash = CategoryCache.hash_categories(categories, descriptions)
+
+        # Entries survive reopening the cache
+        cache = CategoryCache(cache_file, categories_hash)
+        cache.put('STARBUCKS', 'Cafe', 0.95, 'llama3.2')
+        cache.close()
+
+        cache = CategoryCache(cache_file, categories_hash)
+        if cache.get('STARBUCKS') != ('Cafe', 0.95):
+            print("❌ Cached entry was not persisted")
+            return False
+        print("✅ Entry persisted across runs")
+
+        if cache.get('UNKNOWN MERCHANT') is not None:
+            print("❌ Unknown merchant returned a cached category")
+            return False
+        print(f"✅ Hits: {cache.hits}, misses: {cache.misses}")
+        cache.close()
+
+        # Changing a description invalidates everything cached under the old hash
+        descriptions['Cafe'] = 'Coffee shops and bakeries'
+        cache = CategoryCache(cache_file, CategoryCache.hash_categories(categories, descriptions))
+        if len(cache) != 0:
+            print("❌ Entries were not invalidated after categories changed")
+            return False
+        print("✅ Entries invalidated after category descriptions changed")
+        cache.close()
+
+        # Least recently used entries are evicted beyond max_entries
+        cache = CategoryCache(cache_file, categories_hash, max_entries=2)
+        cache.put('LOBLAWS', 'Groceries', 0.9, 'llama3.2')
+        cache.put('METRO', 'Groceries', 0.9, 'llama3.2')
+        cache.get('LOBLAWS')
+        cache.put('BALZACS', 'Cafe', 0.9, 'llama3.2')
+        if cache.get('METRO') is not None or cache.get('LOBLAWS') is None:
+            print("❌ LRU eviction removed the wrong entry")
+            return False
+        print("✅ Least recently used entry evicted")
+        cache.close()
+
+        # Expired entries are ignored
+        cache = CategoryCache(cache_file, categories_hash, ttl_days=0)
+        if cache.get('BALZACS') is not None:
+            print("❌ Expired entry was returned")
+            return False
+        print("✅ Expired entries ignored")
+        cache.close()
+
+        # Payment processor prefixes keep the merchant behind them in the key
+        keys = [merchant_cache_key(title) for title in ('PAYPAL *NETFLIX', 'PAYPAL *UBEREATS',
+                                                        'SQ *PIZZA SHOP', 'SQ *BIKE SHOP')]
+        if len(set(keys)) != 4 or merchant_cache_key('STARBUCKS #12345') != 'STARBUCKS':
+            print(f"❌ Processor merchants share cache keys: {keys}")
+            return False
+        print(f"✅ Distinct keys behind processor prefixes: {keys}")
+
+        # A cached answer for one PayPal or Square merchant doesn't label the others
+        answers = {'PAYPAL *STEAMGAMES': 'Technology', 'PAYPAL *ETSY': 'Clothing',
+                   'SQ *MAPLE BAKERY': 'Cafe', 'SQ *BOLT CYCLES': 'Transportation'}
+        with FakeOllamaServer(answer_fn=lambda title: (answers[title], 0.95)) as server:
+            categorizer = TransactionCategorizer(model_name='llama3.2', batch_size=1, use_embeddings=False,
+                                                 cache_path=os.path.join(temp_dir, 'processor_cache.db'),
+                                                 host=server.host)
+            with contextlib.redirect_stdout(io.StringIO()):
+                categories = [categorizer.categorize_transactions(
+                    [{'id': title, 'title': title, 'location': '', 'amount': -10.0, 'date': None}])[0]
+                    for title in answers]
+            if categories != list(answers.values()) or server.stats['chat_requests'] != 4:
+                print(f"❌ Cached answer reused across processor merchants: {categories}")
+                return False
+            print("✅ Each PayPal/Square merchant asked separately and cached under its own key")
+            categorizer.category_cache.close()
+
+    return True
+
+if __name__ == "__main__":
+    test_category_cache()
@@ -30,7 +30,8 @@ def test_category_descriptions():
         'amount': -5.75
     }
     
-    prompt = categorizer._create_categorization_prompt(test_transaction)
+    messages = categorizer._create_categorization_messages([test_transaction])
+    prompt = '\n\n'.join(message['content'] for message in messages)
     print(f"\n🤖 Sample AI prompt with descriptions:")
     print("=" * 80)
     print(prompt[:1000] + "..." if len(prompt) > 1000 else prompt)
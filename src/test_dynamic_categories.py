@@ -37,7 +37,8 @@ def test_dynamic_categories():
         'amount': -25.50
     }
     
-    prompt = categorizer._create_categorization_prompt(test_transaction)
+    messages = categorizer._create_categorization_messages([test_transaction])
+    prompt = '\n\n'.join(message['content'] for message in messages)
     print(f"\n🤖 Sample AI prompt (first 500 chars):")
     print(prompt[:500] + "..." if len(prompt) > 500 else prompt)
     
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the embedding index and the nearest-neighbour categorization tier (no model needed)
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama_server import FakeOllamaServer, embed_text
+from transaction_categorizer import TransactionCategorizer
+
+def test_embedding_index():
+    print("Testing embedding index...")
+
+    try:
+        from embedding_index import EmbeddingIndex
+    except ImportError as e:
+        print(f"⚠️  Skipping: {e}")
+        return True
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index_path = os.path.join(temp_dir, 'embedding_index.npz')
+        try:
+            index = EmbeddingIndex(index_path, 'fake-embed')
+        except ImportError as e:
+            print(f"⚠️  Skipping: {e}")
+            return True
+
+        texts = ['STARBUCKS #123 TORONTO ON', 'STARBUCKS #456 OTTAWA ON', 'NOODLE BOX 12 TORONTO ON']
+        index.add(texts, [embed_text(text) for text in texts], ['Cafe', 'Cafe', 'Eating Out'])
+        index.add(texts[:1], [embed_text(texts[0])], ['Coffee'])  # Re-labeling replaces, not duplicates
+        if len(index) != 3 or index.categories[0] != 'Coffee':
+            print(f"❌ Unexpected index contents: {index.texts} {index.categories}")
+            return False
+        print(f"✅ {len(index)} entries indexed")
+
+        index.save()
+        reopened = EmbeddingIndex(index_path, 'fake-embed')
+        if reopened.texts != index.texts or reopened.categories != index.categories:
+            print("❌ Index did not round-trip through the file")
+            return False
+        if len(EmbeddingIndex(index_path, 'other-model')) != 0:
+            print("❌ Index built with another model was reused")
+            return False
+        print("✅ Saved and reloaded; other embedding models start empty")
+
+        queries = ['NOODLE BOX 7 TORONTO ON', 'HOME DEPOT TORONTO ON']
+        results = reopened.classify([embed_text(text) for text in queries], k=3, min_similarity=0.9)
+        if not results[0] or results[0][0] != 'Eating Out' or results[1] is not None:
+            print(f"❌ Unexpected neighbour labels: {results}")
+            return False
+        print(f"✅ Close variant labeled {results[0][0]} ({results[0][1]:.2f}), unrelated merchant left alone")
+
+        # Categorizer: an AI answer is learned, and the next variant of the merchant skips the LLM
+        with FakeOllamaServer(models=['llama3.2:latest', 'nomic-embed-text:latest'],
+                              answer_fn=lambda title: ('Eating Out', 0.95)) as server:
+            categorizer = TransactionCategorizer(model_name='llama3.2', use_cache=False, host=server.host,
+                                                 embedding_index_path=os.path.join(temp_dir, 'categorizer.npz'))
+            first = [{'id': '1', 'title': 'PHO HUNG #12', 'location': 'TORONTO ON', 'amount': -18.0, 'date': None}]
+            second = [{'id': '2', 'title': 'PHO HUNG #34', 'location': 'TORONTO ON', 'amount': -21.0, 'date': None}]
+            with contextlib.redirect_stdout(io.StringIO()):
+                categorizer.categorize_transactions(first)
+                chat_requests = server.stats['chat_requests']
+                categories = categorizer.categorize_transactions(second)
+            if categories != ['Eating Out'] or server.stats['chat_requests'] != chat_requests:
+                print(f"❌ Neighbour tier not used: {categories}, {server.stats}")
+                return False
+            print(f"✅ Second visit labeled by its neighbour ({server.stats['texts_embedded']} texts embedded, "
+                  f"{server.stats['chat_requests']} chat request(s))")
+            if not os.path.exists(os.path.join(temp_dir, 'categorizer.npz')):
+                print("❌ Categorizer did not save its index")
+                return False
+
+        # Embedding model missing: the tier is switched off with one warning, the LLM answers every batch
+        with FakeOllamaServer(models=['llama3.2:latest'], answer_fn=lambda title: ('Eating Out', 0.95)) as server:
+            categorizer = TransactionCategorizer(model_name='llama3.2', use_cache=False, host=server.host,
+                                                 embedding_index_path=os.path.join(temp_dir, 'missing.npz'))
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                categories = categorizer.categorize_transactions(first) + categorizer.categorize_transactions(second)
+            warnings = output.getvalue().count('Embedding model')
+            if categories != ['Eating Out'] * 2 or warnings != 1 or categorizer.use_embeddings:
+                print(f"❌ Failed embed not handled once: {categories}, {warnings} warning(s)")
+                return False
+            print("✅ Unavailable embedding model disabled the tier after one warning")
+
+    return True
+
+if __name__ == "__main__":
+    test_embedding_index()
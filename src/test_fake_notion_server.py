@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for NotionClient against the local fake Notion API (no credentials or network needed)
+"""
+
+import sys
+import os
+import contextlib
+import io
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_notion_server import FakeNotionServer
+from notion_client import NotionClient
+
+def make_transactions(count, first_day=1):
+    return [
+        {'id': f"TXN{i:05d}", 'date': datetime(2025, 7, first_day + i % 28), 'amount': -1.0 - i,
+         'title': f"MERCHANT {i}", 'location': 'TORONTO ON', 'account': '4510'}
+        for i in range(count)
+    ]
+
+def make_client(server, **kwargs):
+    return NotionClient(api_key='test', database_id=server.database_id, base_url=server.base_url,
+                        requests_per_second=1000, **kwargs)
+
+def test_fake_notion_server():
+    print("Testing NotionClient against the fake Notion API...")
+
+    # Uploads, prefetch pagination and duplicate skipping
+    with FakeNotionServer() as server:
+        client = make_client(server, max_workers=4)
+        if not client.test_connection():
+            return False
+
+        transactions = make_transactions(150)
+        with contextlib.redirect_stdout(io.StringIO()):
+            uploaded = client.upload_transactions(transactions)
+        if uploaded != 150 or len(server.pages) != 150:
+            print(f"❌ Expected 150 pages, uploaded={uploaded}, stored={len(server.pages)}")
+            return False
+        print(f"✅ Uploaded 150 transactions (max {server.stats['max_concurrent']} concurrent requests)")
+
+        existing = client.fetch_existing_transaction_ids(datetime(2025, 7, 1), datetime(2025, 7, 28))
+        if existing != {t['id'] for t in transactions}:
+            print("❌ Paginated ID fetch returned the wrong set")
+            return False
+        print(f"✅ Fetched {len(existing)} existing IDs across {server.stats['queries']} query page(s)")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.upload_transactions(transactions + make_transactions(160)[150:])
+        ids = server.transaction_ids()
+        if len(ids) != 160 or len(set(ids)) != 160:
+            print(f"❌ Re-upload created duplicates: {len(ids)} pages, {len(set(ids))} unique")
+            return False
+        print("✅ Re-upload only created the 10 new pages")
+
+        if not client.check_if_transaction_exists('TXN00003') or client.check_if_transaction_exists('NOPE'):
+            print("❌ rich_text equals filter returned the wrong answer")
+            return False
+        print("✅ Single-ID lookups work")
+
+    # 429s with Retry-After and injected 5xx errors are retried without losing or duplicating pages
+    with FakeNotionServer(rate_limit_every=7, retry_after=0.05, error_rate=0.1, seed=1) as server:
+        client = make_client(server, max_workers=4, max_retries=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            uploaded = client.upload_transactions(make_transactions(60))
+        ids = server.transaction_ids()
+        if uploaded != 60 or len(ids) != 60 or len(set(ids)) != 60:
+            print(f"❌ Faults caused lost or duplicate pages: uploaded={uploaded}, stored={len(ids)}")
+            return False
+        print(f"✅ Survived {server.stats['rate_limited']} 429(s) and {server.stats['server_errors']} 5xx error(s)")
+
+    # A gateway error after the page was created must not lead to a second page
+    with FakeNotionServer(late_error_rate=0.3, seed=2) as server:
+        client = make_client(server, max_workers=4)
+        with contextlib.redirect_stdout(io.StringIO()):
+            uploaded = client.upload_transactions(make_transactions(40))
+        ids = server.transaction_ids()
+        if uploaded != 40 or len(ids) != 40 or len(set(ids)) != 40 or not server.stats['late_errors']:
+            print(f"❌ Late errors caused lost or duplicate pages: uploaded={uploaded}, stored={len(ids)}")
+            return False
+        print(f"✅ {server.stats['late_errors']} error(s) after page creation, no duplicate pages")
+
+    return True
+
+if __name__ == "__main__":
+    test_fake_notion_server()
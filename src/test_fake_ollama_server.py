@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for TransactionCategorizer against the fake Ollama server (no model needed)
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama_server import FakeOllamaServer
+from transaction_categorizer import TransactionCategorizer
+
+TRANSACTIONS = [
+    {'id': str(i), 'title': title, 'location': 'TORONTO ON', 'amount': -12.5, 'date': None}
+    for i, title in enumerate(['STARBUCKS #123', 'LOBLAWS #1090', 'UNKNOWN SHOP', 'PRESTO FARE/ABC', 'HOME DEPOT'] * 4)
+]
+
+def test_fake_ollama_server():
+    print("Testing categorizer against the fake Ollama server...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_path = os.path.join(temp_dir, 'categorization_cache.db')
+
+        with FakeOllamaServer(latency=0.05, num_parallel=2) as server:
+            categorizer = TransactionCategorizer(model_name='llama3.2', batch_size=3, max_parallel_requests=4,
+                                                 use_cache=False, host=server.host)
+            if not categorizer.test_connection():
+                return False
+
+            # Rule-derived answers come back through the batch prompt and parser
+            suggestions = categorizer._suggest_categories(TRANSACTIONS[:5])
+            expected = ['Cafe', 'Groceries', 'Misc', 'Transportation', 'Misc']
+            if [suggestion[0] if suggestion else None for suggestion in suggestions] != expected:
+                print(f"❌ Unexpected batch suggestions: {suggestions}")
+                return False
+            print(f"✅ Batch answered: {[s[0] for s in suggestions]}")
+
+            # The server never runs more requests at once than its parallelism limit
+            with contextlib.redirect_stdout(io.StringIO()):
+                list(categorizer._suggest_categories(TRANSACTIONS))
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    list(executor.map(categorizer._get_ai_suggestion, TRANSACTIONS[:8]))
+            if server.stats['max_concurrent'] > 2 or server.stats['max_queued'] < 2:
+                print(f"❌ Parallelism limit not applied: {server.stats}")
+                return False
+            print(f"✅ At most {server.stats['max_concurrent']} request(s) ran at once "
+                  f"({server.stats['max_queued']} queued at peak)")
+
+            if not server.stats['eval_count'] or not server.stats['prompt_eval_count']:
+                print("❌ Token counts were not reported")
+                return False
+            print(f"✅ {server.stats['prompt_eval_count']} prompt tokens, {server.stats['eval_count']} output tokens")
+
+        # Requests put the static instructions in a system message ahead of the transactions,
+        # constrain the reply to a JSON schema and cap its length
+        with FakeOllamaServer(prompt_token_latency=0.0001) as server:
+            # Repeated charges are asked once, so one transaction per request gives two requests here
+            categorizer = TransactionCategorizer(model_name='llama3.2', batch_size=1, use_cache=False,
+                                                 use_embeddings=False, host=server.host)
+            with contextlib.redirect_stdout(io.StringIO()):
+                categorizer.categorize_transactions(TRANSACTIONS[:10])
+            first, second = server.requests[0], server.requests[1]
+            if (first['messages'][0]['role'] != 'system' or first['messages'][0] != second['messages'][0]
+                    or 'TORONTO ON' in first['messages'][0]['content']):
+                print("❌ System message is not static")
+                return False
+            if not first.get('format') or not first.get('options', {}).get('num_predict') or not first.get('keep_alive'):
+                print(f"❌ Missing format/num_predict/keep_alive: {first.get('format')}, {first.get('options')}")
+                return False
+            # The second request only evaluates what follows the shared system message
+            if server.stats['cached_prompt_tokens'] < server.stats['prompt_eval_count'] * 0.8:
+                print(f"❌ Shared prefix was not reused: {server.stats}")
+                return False
+            print(f"✅ Static system prefix reused ({server.stats['cached_prompt_tokens']} cached, "
+                  f"{server.stats['prompt_eval_count']} evaluated prompt tokens)")
+
+        # JSON replies are parsed, truncated ones keep their complete pairs, and the old line format still works
+        parsed = categorizer._parse_batch_response('{"results":[["Cafe",0.9],["Groceries",0.8],["Mi', 3)
+        if parsed != {0: ('Cafe', 0.9), 1: ('Groceries', 0.8)}:
+            print(f"❌ Unexpected truncated JSON parse: {parsed}")
+            return False
+        if (categorizer._parse_ai_response('{"results":[["Eating Out",0.75]]}') != ('Eating Out', 0.75)
+                or categorizer._parse_ai_response('Category: Cafe\nConfidence: 0.6') != ('Cafe', 0.6)):
+            print("❌ Single reply parsing failed")
+            return False
+        print("✅ JSON, truncated JSON and line replies parsed")
+
+        # Without the schema, mis-sized result lists and out-of-range confidences are rejected locally
+        if (categorizer._parse_batch_response('{"results":[["Cafe",0.9],["Groceries",0.8]]}', 3) != {}
+                or categorizer._parse_batch_response('{"results":[["Cafe",90],["Groceries",0.8]]}', 2)
+                != {1: ('Groceries', 0.8)}):
+            print("❌ Invalid plain JSON replies were accepted")
+            return False
+        print("✅ Mis-sized and out-of-range plain JSON replies rejected")
+
+        # A server without structured outputs rejects the schema once, then gets plain JSON requests
+        with FakeOllamaServer(json_schema=False, answer_fn=lambda title: ('Vanity', 0.9)) as server:
+            categorizer = TransactionCategorizer(model_name='llama3.2', batch_size=2, use_cache=False,
+                                                 use_embeddings=False, host=server.host)
+            unknown = [dict(transaction, title=f"ZYXW TRADING {letter}") for transaction, letter in zip(TRANSACTIONS, 'ABCDEF')]
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                categories = categorizer.categorize_transactions(unknown)
+            if (categories != ['Vanity'] * 6 or server.stats['rejected_formats'] != 1
+                    or output.getvalue().count('rejected the JSON schema') != 1
+                    or any(request.get('format') != 'json' for request in server.requests)):
+                print(f"❌ Schema fallback failed: {categories}, {server.stats['rejected_formats']} rejection(s)")
+                return False
+            print(f"✅ Schema rejected once, {server.stats['chat_requests']} plain JSON request(s) answered")
+
+        # Scripted replies are returned verbatim, and cached merchants skip the server on the next run
+        with FakeOllamaServer(script=["Category: Eating Out\nConfidence: 0.88"]) as server:
+            categorizer = TransactionCategorizer(model_name='llama3.2', batch_size=1, cache_path=cache_path,
+                                                 host=server.host)
+            transactions = [{'id': 'X', 'title': 'NEW BISTRO', 'location': '', 'amount': -30.0, 'date': None}]
+            with contextlib.redirect_stdout(io.StringIO()):
+                first = categorizer.categorize_transactions(transactions)
+                second = categorizer.categorize_transactions(transactions)
+            if first != ['Eating Out'] or second != ['Eating Out'] or server.stats['chat_requests'] != 1:
+                print(f"❌ Scripted/cached run failed: {first}, {second}, {server.stats['chat_requests']} request(s)")
+                return False
+            print("✅ Scripted reply used once, then served from the cache")
+            categorizer.category_cache.close()
+
+    return True
+
+if __name__ == "__main__":
+    test_fake_ollama_server()
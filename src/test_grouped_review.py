@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script for grouped manual review: one answer per merchant, identical charges sent to the LLM once
+"""
+
+import sys
+import os
+import builtins
+import contextlib
+import io
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama_server import FakeOllamaServer
+from transaction_categorizer import TransactionCategorizer
+
+def answer(title):
+    # Unsure about both unknown merchants
+    return ('Eating Out', 0.4) if title.startswith(('MYSTERY', 'ODDITY')) else ('Groceries', 0.95)
+
+def test_grouped_review():
+    print("Testing grouped manual review...")
+
+    transactions = [{'id': str(i), 'title': f"MYSTERY SHOP #{i}", 'location': 'TORONTO ON', 'amount': -5.0 - i,
+                     'date': None} for i in range(12)]
+    transactions += [{'id': f"F{i}", 'title': 'CORNER MART 22', 'location': 'TORONTO ON', 'amount': -30.0,
+                      'date': None} for i in range(3)]
+    transactions.append({'id': 'O1', 'title': 'ODDITY GOODS', 'location': 'OTTAWA ON', 'amount': -12.0, 'date': None})
+
+    with FakeOllamaServer(models=['llama3.2:latest'], answer_fn=answer) as server:
+        categorizer = TransactionCategorizer(model_name='llama3.2', use_cache=False, use_embeddings=False,
+                                             host=server.host, batch_size=20)
+        events = categorizer.categories.index('Events') + 1
+
+        # Each prompt is answered with a category number, then declines the rule
+        prompts = []
+        def fake_input(prompt=''):
+            prompts.append(prompt)
+            return 'n' if 'rule' in prompt else str(events)
+
+        original_input = builtins.input
+        builtins.input = fake_input
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                categories = categorizer.categorize_transactions(transactions)
+        finally:
+            builtins.input = original_input
+
+    category_prompts = [prompt for prompt in prompts if 'Select category' in prompt]
+    if len(category_prompts) != 2:
+        print(f"❌ Expected one prompt per merchant, got {len(category_prompts)}")
+        return False
+    if categories != ['Events'] * 12 + ['Groceries'] * 3 + ['Events']:
+        print(f"❌ Group answer not applied to every member: {categories}")
+        return False
+    print(f"✅ 13 low-confidence transactions from 2 merchants reviewed with {len(category_prompts)} prompts")
+
+    if server.stats['transactions_answered'] != 14:
+        print(f"❌ Identical charges were asked again: {server.stats['transactions_answered']} answered")
+        return False
+    print(f"✅ {server.stats['transactions_answered']} distinct transactions sent to the LLM for 16 charges")
+
+    # Merchants behind a payment processor prefix are reviewed separately
+    processor = [{'title': title} for title in ('PAYPAL *STEAMGAMES', 'SQ *MAPLE BAKERY', 'PAYPAL *ETSY',
+                                                'SQ *BOLT CYCLES', 'PAYPAL *ETSY 2')]
+    groups = categorizer.group_by_merchant(processor)
+    if groups != [[0], [1], [2, 4], [3]]:
+        print(f"❌ Processor merchants grouped together: {groups}")
+        return False
+    print("✅ PayPal and Square merchants grouped by the merchant behind the prefix")
+
+    return True
+
+if __name__ == "__main__":
+    test_grouped_review()
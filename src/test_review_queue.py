@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for headless categorization, the review queue and patching reviewed pages in Notion
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_notion_server import FakeNotionServer, _property_value
+from fake_ollama_server import FakeOllamaServer
+from notion_client import NotionClient
+from review_queue import ReviewQueue
+from transaction_categorizer import TransactionCategorizer
+from Transaction import Transaction
+
+def answer(title):
+    # The LLM is unsure about the unknown merchant only
+    return ('Eating Out', 0.4) if title.startswith('MYSTERY') else ('Groceries', 0.95)
+
+def test_review_queue():
+    print("Testing headless review queue...")
+
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            FakeOllamaServer(models=['llama3.2:latest'], answer_fn=answer) as ollama_server, \
+            FakeNotionServer() as notion_server:
+        queue = ReviewQueue(os.path.join(temp_dir, 'review_queue.db'))
+        categorizer = TransactionCategorizer(use_cache=False, use_embeddings=False, host=ollama_server.host,
+                                             interactive=False, review_queue=queue)
+        transactions = [
+            Transaction(f"TXN{i}", -10.0 - i, datetime(2025, 7, 1 + i), title, 'TORONTO ON')
+            for i, title in enumerate(['MYSTERY SHOP 1', 'FRESHCO 22', 'MYSTERY SHOP 2'])
+        ]
+
+        # Headless: no prompt, provisional category and flag; nothing is queued before the upload
+        with contextlib.redirect_stdout(io.StringIO()):
+            categories = categorizer.categorize_transactions(transactions)
+        if categories != ['Eating Out', 'Groceries', 'Eating Out'] or len(queue) != 0:
+            print(f"❌ Unexpected categories {categories} or queue {queue.pending()}")
+            return False
+        if [t.needs_review for t in transactions] != [True, False, True]:
+            print("❌ Low-confidence transactions were not flagged")
+            return False
+        print("✅ Categorized without prompting, low-confidence transactions flagged")
+
+        # TXN2 is already in Notion with a hand-picked category: only TXN0's new page is queued
+        client = NotionClient(api_key='test', database_id=notion_server.database_id,
+                              base_url=notion_server.base_url, requests_per_second=1000)
+        curated = Transaction('TXN2', -12.0, datetime(2025, 7, 3), 'MYSTERY SHOP 2', 'TORONTO ON', category='Events')
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.test_connection()
+            client.upload_transactions([curated])
+            client.upload_transactions(transactions)
+        queued = categorizer.queue_reviews(transactions)
+        flagged = [_property_value(page, 'ID') for page in notion_server.pages if _property_value(page, 'Needs Review')]
+        if queued != 1 or [item['id'] for item in queue.pending()] != ['TXN0'] or flagged != ['TXN0']:
+            print(f"❌ Unexpected queue {queue.pending()} or flagged pages {flagged}")
+            return False
+        if not queue.pending()[0]['page_id']:
+            print("❌ Created page ID was not recorded")
+            return False
+        print("✅ Only the page created by the sync was flagged and queued, with its page ID")
+
+        # Re-queuing on a retried sync keeps the reviewer's answer
+        queue.resolve({'TXN0': 'Events'})
+        queue.add(transactions[0], 'Eating Out', 0.4)
+        if len(queue.pending()) != 0 or [item['category'] for item in queue.resolved()] != ['Events']:
+            print(f"❌ Resolved items changed: {queue.resolved()}")
+            return False
+
+        # An item without a recorded page (e.g. queued by an older version) never patches an unflagged page
+        queue.add(transactions[2], 'Eating Out', 0.4)
+        queue.resolve({'TXN2': 'Vanity'})
+        resolved = queue.resolved()
+        with contextlib.redirect_stdout(io.StringIO()):
+            updated = client.update_categories({item['id']: item['category'] for item in resolved},
+                                               {item['id']: item['page_id'] for item in resolved if item['page_id']})
+        queue.remove(updated)
+        pages = {_property_value(page, 'ID'): page for page in notion_server.pages}
+        if (updated != ['TXN0'] or [item['id'] for item in queue.resolved()] != ['TXN2']
+                or _property_value(pages['TXN0'], 'Transaction Category') != 'Events'
+                or _property_value(pages['TXN2'], 'Transaction Category') != 'Events'
+                or any(_property_value(page, 'Needs Review') for page in pages.values())):
+            print(f"❌ Unexpected patch: updated={updated}, queue={queue.resolved()}")
+            return False
+        print(f"✅ Patched {notion_server.stats['pages_updated']} page(s); the hand-curated page was left alone")
+        queue.close()
+
+    return True
+
+if __name__ == "__main__":
+    test_review_queue()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Test script for the Aho-Corasick rule matcher and the rule grammar
+"""
+
+import sys
+import os
+import fnmatch
+import random
+import re
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rule_matcher import RuleMatcher, normalize_pattern
+
+def first_matching_rule(rules, title):
+    """Reference implementation: check each rule in order"""
+    for search_string, category in rules.items():
+        if search_string in title:
+            return category
+    return None
+
+def test_rule_matcher():
+    print("Testing rule matcher...")
+
+    rules = {
+        'UBER CANADA': 'Transportation',
+        'UBER': 'Eating Out',
+        'STARBUCKS': 'Cafe',
+        'BUCKS': 'Misc',
+    }
+    matcher = RuleMatcher(rules)
+
+    examples = {
+        'UBER CANADA/UBERTRIP': 'Transportation',   # both UBER rules match, first declared wins
+        'UBER EATS': 'Eating Out',
+        'STARBUCKS #12345': 'Cafe',                 # BUCKS also matches but is declared later
+        'BIG BUCKS': 'Misc',
+        'LOBLAWS': None,
+    }
+    for title, expected in examples.items():
+        result = matcher.match(title)
+        if result != expected:
+            print(f"❌ {title}: expected {expected}, got {result}")
+            return False
+        print(f"✅ {title} → {result}")
+
+    # Rules added later take effect immediately with the lowest precedence
+    rules['LOBLAWS'] = 'Groceries'
+    matcher.add('LOBLAWS', 'Groceries')
+    if matcher.match('LOBLAWS #1090') != 'Groceries':
+        print("❌ Rule added at runtime was not applied")
+        return False
+    print("✅ Runtime rule addition applied")
+
+    # Randomized comparison against the in-order reference
+    rng = random.Random(7)
+    alphabet = 'ABC *#'
+    for _ in range(200):
+        random_rules = {}
+        for _ in range(rng.randint(1, 40)):
+            pattern = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 5)))
+            random_rules[pattern] = f"Category {rng.randint(1, 20)}"
+        random_matcher = RuleMatcher(random_rules)
+        for _ in range(50):
+            title = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 25)))
+            if random_matcher.match(title) != first_matching_rule(random_rules, title):
+                print(f"❌ Mismatch for title {title!r}")
+                return False
+    print("✅ Randomized comparison with in-order rule checks passed")
+
+    return test_rule_grammar()
+
+def holds(pattern, title, location, amount):
+    """Reference implementation of one rule, clause by clause"""
+    for clause in pattern.split(' && '):
+        field, _, body = clause.partition(':') if clause.split(':')[0] in ('location', 'amount') else ('title', '', clause)
+        text = title if field == 'title' else location.upper()
+        if field == 'amount':
+            low, _, high = body.partition('..')
+            if amount is None or (low and abs(amount) < float(low)) or (high and abs(amount) > float(high)):
+                return False
+        elif body.startswith('glob:'):
+            if not fnmatch.fnmatchcase(text, body[5:]):
+                return False
+        elif body.startswith('re:'):
+            if not re.search(body[3:], text, re.IGNORECASE):
+                return False
+        elif body.startswith('^') and body.endswith('$'):
+            if text != body[1:-1]:
+                return False
+        elif body.startswith('^'):
+            if not text.startswith(body[1:]):
+                return False
+        elif body.endswith('$'):
+            if not text.endswith(body[:-1]):
+                return False
+        elif body not in text:
+            return False
+    return True
+
+def test_rule_grammar():
+    print("Testing rule grammar...")
+
+    rules = {
+        'amount:..3.50 && PRESTO': 'Transportation',
+        '^UBER EATS': 'Eating Out',
+        '^UBER': 'Transportation',
+        'glob:AMZN MKTP CA*': 'Misc',
+        're:^(SQ|TST) \\*.*(CAFE|COFFEE)': 'Cafe',
+        'BISTRO$': 'Eating Out',
+        '^PRESTO$': 'Misc',
+        'location:MONTREAL && glob:SQ *': 'Eating Out',
+        'PRESTO': 'Misc',
+    }
+    matcher = RuleMatcher(rules)
+
+    examples = [
+        (('PRESTO FARE/ABC', 'TORONTO ON', -3.30), 'Transportation'),  # amount rule declared first
+        (('PRESTO FARE/ABC', 'TORONTO ON', -40.0), 'Misc'),
+        (('UBER EATS TORONTO', '', -20.0), 'Eating Out'),
+        (('UBER CANADA/UBERTRIP', '', -20.0), 'Transportation'),
+        (('EATS UBER', '', -20.0), None),                              # not at the start
+        (('AMZN MKTP CA*2X4', '', -12.0), 'Misc'),
+        (('SQ *BLACK COFFEE', '', -4.0), 'Cafe'),
+        (('SQ *FOOD TRUCK', 'Montreal QC', -9.0), 'Eating Out'),       # location is case-insensitive
+        (('SQ *FOOD TRUCK', 'TORONTO ON', -9.0), None),
+        (('NEW BISTRO', '', -30.0), 'Eating Out'),
+        (('BISTRO NEW', '', -30.0), None),
+    ]
+    for (title, location, amount), expected in examples:
+        result = matcher.match(title, location, amount)
+        if result != expected:
+            print(f"❌ {title} / {location} / {amount}: expected {expected}, got {result}")
+            return False
+    print(f"✅ {len(examples)} anchored, wildcard, regex, location and amount examples")
+
+    for pattern, normalized in [('^uber eats', '^UBER EATS'), ('re:\\d+ bar', 're:\\d+ bar'),
+                                ('location:montreal && amount:5..', 'location:MONTREAL && amount:5..')]:
+        if normalize_pattern(pattern) != normalized:
+            print(f"❌ {pattern} normalized to {normalize_pattern(pattern)}")
+            return False
+    for invalid in ('re:(UNCLOSED', 'amount:cheap', '^$'):
+        try:
+            RuleMatcher({invalid: 'Misc'})
+            print(f"❌ Malformed rule accepted: {invalid}")
+            return False
+        except ValueError:
+            pass
+    print("✅ Rules normalized, malformed rules rejected")
+
+    # Randomized comparison of mixed rule kinds against the in-order reference
+    rng = random.Random(11)
+    alphabet = 'AB C'
+    kinds = ['{}', '^{}', '{}$', '^{}$', 'glob:*{}*', 'glob:{}?*', 're:{}+', 'location:{}', 'amount:{}..{} && {}',
+             'amount:{}..{} && ^{}$', 'location:{0} && {0}$', 'location:{0} && glob:{0}*']
+    for _ in range(200):
+        random_rules = {}
+        for _ in range(rng.randint(1, 30)):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 3)))
+            kind = rng.choice(kinds)
+            if kind.startswith('amount'):
+                low = rng.randint(0, 50)
+                pattern = kind.format(low, low + rng.randint(0, 50), text)
+            else:
+                pattern = kind.format(text)
+            random_rules[pattern] = f"Category {rng.randint(1, 20)}"
+        random_matcher = RuleMatcher(random_rules)
+        for _ in range(50):
+            title = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+            location = ''.join(rng.choice(alphabet.lower()) for _ in range(rng.randint(0, 6)))
+            amount = -rng.randint(0, 100)
+            expected = next((category for pattern, category in random_rules.items()
+                             if holds(pattern, title, location, amount)), None)
+            if random_matcher.match(title, location, amount) != expected:
+                print(f"❌ Mismatch for {title!r} / {location!r} / {amount}")
+                return False
+    print("✅ Randomized comparison of mixed rule kinds passed")
+
+    # Conditional rules are only checked when the automaton finds their title string
+    keyed = RuleMatcher({f"amount:..{i} && STORE {i:04d}": 'Misc' for i in range(1000)})
+    checked = []
+    for index, checks in keyed._conditional.items():
+        keyed._conditional[index] = [lambda *args, index=index: checked.append(index) or True] + checks
+    if keyed.match('STORE 0420 TORONTO', '', -5.0) != 'Misc' or checked != [420]:
+        print(f"❌ Conditional rules checked for an unrelated title: {len(checked)}")
+        return False
+    print("✅ 1000 conditional rules, only the one whose title string occurs was checked")
+
+    return True
+
+if __name__ == "__main__":
+    test_rule_matcher()
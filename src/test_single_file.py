@@ -38,7 +38,8 @@ def test_single_file_descriptions():
         'amount': -25.50
     }
     
-    prompt = categorizer._create_categorization_prompt(test_transaction)
+    messages = categorizer._create_categorization_messages([test_transaction])
+    prompt = '\n\n'.join(message['content'] for message in messages)
     print(f"\n🤖 Sample AI prompt with descriptions:")
     print("=" * 80)
     print(prompt[:800] + "..." if len(prompt) > 800 else prompt)
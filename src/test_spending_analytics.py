@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the vectorized spending analytics (compares against plain Python group-bys)
+"""
+
+import sys
+import os
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from Transaction import Transaction
+
+def make_transactions(count, seed=7):
+    rng = random.Random(seed)
+    merchants = ['STARBUCKS #{}', 'LOBLAWS #{}', 'PRESTO FARE/{}', 'NEW BISTRO']
+    categories = ['Cafe', 'Groceries', 'Transportation', None]
+    transactions = []
+    for i in range(count):
+        kind = rng.randrange(len(merchants))
+        transactions.append(Transaction(
+            id=str(i),
+            amount=-rng.randint(100, 10000) / 100,
+            date=datetime(2016, 1, 1) + timedelta(days=rng.randrange(3650)) if i % 50 else None,
+            title=merchants[kind].format(rng.randint(1, 999)),
+            location='TORONTO ON',
+            category=categories[kind]
+        ))
+    return transactions
+
+def test_spending_analytics():
+    print("Testing spending analytics...")
+
+    try:
+        from spending_analytics import SpendingAnalytics, UNCATEGORIZED
+        analytics = SpendingAnalytics([])
+    except ImportError as e:
+        print(f"⚠️  Skipping: {e}")
+        return True
+
+    transactions = make_transactions(5000)
+    analytics = SpendingAnalytics(transactions)
+    dated = [t for t in transactions if t.date]
+
+    if len(analytics) != len(dated) or analytics.skipped_count != len(transactions) - len(dated):
+        print(f"❌ Expected {len(dated)} dated transactions, got {len(analytics)}")
+        return False
+    print(f"✅ Loaded {len(analytics)} transactions ({analytics.skipped_count} undated skipped)")
+
+    # Per month and category, against a dictionary group-by
+    expected = defaultdict(float)
+    expected_counts = defaultdict(int)
+    for t in dated:
+        key = (t.date.strftime('%Y-%m'), t.category or UNCATEGORIZED)
+        expected[key] += -t.amount
+        expected_counts[key] += 1
+
+    labels, categories, sums, counts = analytics.monthly_category_totals()
+    for (month, category), amount in expected.items():
+        row, column = labels.index(month), categories.index(category)
+        if abs(sums[row, column] - amount) > 1e-6 or counts[row, column] != expected_counts[(month, category)]:
+            print(f"❌ {month} {category}: expected ${amount:.2f}, got ${sums[row, column]:.2f}")
+            return False
+    if abs(sums.sum() - sum(expected.values())) > 1e-6 or len(labels) != 120:
+        print(f"❌ Monthly totals do not add up ({len(labels)} months)")
+        return False
+    print(f"✅ Monthly category totals match over {len(labels)} months")
+
+    # Top merchants are grouped by normalized merchant name
+    top = analytics.top_merchants(3)
+    expected_top = defaultdict(float)
+    for t in dated:
+        expected_top[t.title.split(' #')[0].split('/')[0]] += -t.amount
+    best = sorted(expected_top.items(), key=lambda item: -item[1])[:3]
+    if [name for name, _, _ in top] != [name for name, _ in best]:
+        print(f"❌ Unexpected top merchants: {top}")
+        return False
+    print(f"✅ Top merchants: {[name for name, _, _ in top]}")
+
+    if not analytics.top_merchants(5, category='Cafe') == [top_entry for top_entry in analytics.top_merchants(5)
+                                                            if top_entry[0] == 'STARBUCKS']:
+        print("❌ Category filter on top merchants failed")
+        return False
+    print("✅ Top merchants filtered by category")
+
+    report = analytics.format_report()
+    if 'Groceries' not in report or 'LOBLAWS' not in report:
+        print("❌ Report is missing categories or merchants")
+        return False
+    print("✅ Report generated")
+
+    return True
+
+if __name__ == "__main__":
+    test_spending_analytics()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming QFX parser
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from qfx_parser import QFXParser
+
+SAMPLE_QFX = """OFXHEADER:100
+DATA:OFXSGML
+<OFX><CREDITCARDMSGSRSV1><CCSTMTTRNRS><CCSTMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250711120000[-5]
+<TRNAMT>-5.50
+<FITID>000000000001
+<NAME>STARBUCKS #12345
+<MEMO>TORONTO ON
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20250712120000[-5]
+<TRNAMT>250.00
+<FITID>000000000002
+<NAME>PAYMENT - THANK YOU
+<MEMO>
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250713120000[-5]
+<TRNAMT>-42.10
+<FITID>000000000003
+<NAME>LOBLAWS #1090
+<MEMO>TORONTO ON
+</STMTTRN>
+</BANKTRANLIST></CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1></OFX>
+"""
+
+def test_streaming_parser():
+    print("Testing streaming QFX parser...")
+
+    with tempfile.NamedTemporaryFile('w', suffix='.qfx', delete=False, encoding='utf-8') as f:
+        f.write(SAMPLE_QFX)
+        qfx_path = f.name
+
+    try:
+        parser = QFXParser(qfx_path)
+        expected = parser.parse_file()
+        print(f"parse_file(): {len(expected)} DEBIT transactions")
+
+        # Tiny chunk sizes force tags and blocks to be split across reads
+        for chunk_size in (1, 7, 64, 1 << 16):
+            streamed = list(parser.iter_transactions(chunk_size=chunk_size))
+            if streamed != expected:
+                print(f"❌ Chunk size {chunk_size}: streamed transactions differ from parse_file()")
+                return False
+            print(f"✅ Chunk size {chunk_size}: {len(streamed)} transactions match")
+
+        if [t['id'] for t in expected] != ['000000000001', '000000000003']:
+            print(f"❌ Unexpected transaction IDs: {[t['id'] for t in expected]}")
+            return False
+
+        print("✅ Streaming parser test passed")
+        return True
+    finally:
+        os.remove(qfx_path)
+
+if __name__ == "__main__":
+    test_streaming_parser()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test script comparing the sequential, pipelined and parallel-parse sync paths against the
+local fake Notion and Ollama APIs (no credentials, model or network needed)
+"""
+
+import sys
+import os
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_notion_server import FakeNotionServer, _property_value
+from fake_ollama_server import FakeOllamaServer
+from main import RBCNotionSync
+from notion_client import NotionClient
+from qfx_parser import QFXParser
+from synthetic_qfx import QFX_FOOTER, QFX_HEADER, write_synthetic_qfx
+from transaction_categorizer import TransactionCategorizer
+
+def write_statement(path, account_id, rows):
+    """Write a small QFX statement with (FITID, YYYYMMDD, title) DEBIT rows"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(QFX_HEADER.format(account_id=account_id, year=2025))
+        for fitid, day, title in rows:
+            f.write(f"<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>{day}120000[-5]\n<TRNAMT>-10.00\n"
+                    f"<FITID>{fitid}\n<NAME>{title}\n<MEMO>TORONTO ON\n</STMTTRN>\n")
+        f.write(QFX_FOOTER)
+
+def run_sync(mode, qfx_files, temp_dir, ollama_server):
+    """Sync the files in one mode into a fresh fake Notion database; returns ({ID: page values}, prefetches)"""
+    with FakeNotionServer() as notion_server:
+        sync = RBCNotionSync(pipeline=mode == 'pipelined', parallel_parse=mode == 'parallel', upload_batch_size=25,
+                             state_path=Path(temp_dir) / f"{mode}_state.db",
+                             review_path=Path(temp_dir) / f"{mode}_review.db")
+        sync.categorizer = TransactionCategorizer(model_name='llama3.2', use_cache=False, use_embeddings=False,
+                                                  host=ollama_server.host)
+        sync.notion_client = NotionClient(api_key='test', database_id=notion_server.database_id,
+                                          base_url=notion_server.base_url, requests_per_second=1000)
+
+        # Count date-window prefetches (each may span several query pages)
+        prefetches = [0]
+        fetch = sync.notion_client.fetch_existing_transaction_ids
+        def counting_fetch(*args):
+            prefetches[0] += 1
+            return fetch(*args)
+        sync.notion_client.fetch_existing_transaction_ids = counting_fetch
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            if mode == 'parallel':
+                sync.process_files_parallel(qfx_files)
+            else:
+                for qfx_file in qfx_files:
+                    if mode == 'pipelined':
+                        sync.process_single_file_pipelined(qfx_file)
+                    else:
+                        sync.process_single_file(qfx_file)
+
+        pages = {}
+        for page in notion_server.pages:
+            pages.setdefault(_property_value(page, 'ID'), []).append(
+                tuple(_property_value(page, name) for name in ('Transaction Title', 'Transaction Category',
+                                                               'Amount', 'Date')))
+        return pages, prefetches[0]
+
+def test_sync_modes():
+    print("Testing sequential, pipelined and parallel-parse syncs...")
+
+    with tempfile.TemporaryDirectory() as temp_dir, FakeOllamaServer(models=['llama3.2:latest']) as ollama_server:
+        qfx_files = [Path(temp_dir) / 'card_a.qfx', Path(temp_dir) / 'card_b.qfx']
+        write_synthetic_qfx(qfx_files[0], 300, seed=1, account_id='4510000000000001')
+        write_synthetic_qfx(qfx_files[1], 300, seed=2, account_id='4510000000000002', fitid_offset=10000)
+
+        sequential, _ = run_sync('sequential', qfx_files, temp_dir, ollama_server)
+        if not sequential or any(len(copies) != 1 for copies in sequential.values()):
+            print(f"❌ Sequential sync created {sum(map(len, sequential.values()))} pages for {len(sequential)} IDs")
+            return False
+        print(f"✅ Sequential sync uploaded {len(sequential)} transactions")
+
+        for mode in ('pipelined', 'parallel'):
+            pages, prefetches = run_sync(mode, qfx_files, temp_dir, ollama_server)
+            if pages != sequential:
+                missing = set(sequential) - set(pages)
+                print(f"❌ {mode} uploads differ from sequential: {len(pages)} IDs, {len(missing)} missing")
+                return False
+            expected_prefetches = 1 if mode == 'parallel' else len(qfx_files)
+            if prefetches != expected_prefetches:
+                print(f"❌ {mode} fetched existing IDs {prefetches} times (expected {expected_prefetches})")
+                return False
+            print(f"✅ {mode.capitalize()} sync uploaded the same pages ({prefetches} existing-ID prefetch(es))")
+
+        # Statements of one account processed newest first: the older file must not be filtered
+        # against the mark the newer one set earlier in the same run
+        march, february = Path(temp_dir) / 'mar.qfx', Path(temp_dir) / 'feb.qfx'
+        write_statement(march, '4510000000000009', [('M1', '20250310', 'STARBUCKS #1')])
+        write_statement(february, '4510000000000009', [('F1', '20250210', 'STARBUCKS #2')])
+        with FakeNotionServer() as notion_server:
+            for run in range(2):
+                sync = RBCNotionSync(state_path=Path(temp_dir) / 'order_state.db',
+                                     review_path=Path(temp_dir) / 'order_review.db')
+                sync.categorizer = TransactionCategorizer(model_name='llama3.2', use_cache=False,
+                                                          use_embeddings=False, host=ollama_server.host)
+                sync.notion_client = NotionClient(api_key='test', database_id=notion_server.database_id,
+                                                  base_url=notion_server.base_url, requests_per_second=1000)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for qfx_file in (march, february):
+                        sync.process_single_file(qfx_file)
+                    sync.sync_state.save_watermarks()
+            if sorted(notion_server.transaction_ids()) != ['F1', 'M1']:
+                print(f"❌ Out-of-order run uploaded {notion_server.transaction_ids()}")
+                return False
+            if sync.sync_state.get_watermark('4510000000000009').month != 3:
+                print(f"❌ Unexpected mark after the run: {sync.sync_state.get_watermark('4510000000000009')}")
+                return False
+        print("✅ March before February: both uploaded once, mark saved at the end of the run")
+
+        # Modes that never sync or review don't create the sync state or the review queue
+        for mode in ('parse-only', 'compact-rules'):
+            sync = RBCNotionSync(mode=mode, state_path=Path(temp_dir) / f"{mode}_state.db",
+                                 review_path=Path(temp_dir) / f"{mode}_review.db")
+            sync.input_dir = Path(temp_dir)
+            with contextlib.redirect_stdout(io.StringIO()):
+                sync.run()
+            if sync.state_path.exists() or sync.review_path.exists():
+                print(f"❌ --{mode} created local state files")
+                return False
+        print("✅ --parse-only and --compact-rules leave no state files behind")
+
+        # FITIDs repeat across accounts: only same-account overlaps are duplicates
+        overlapping = [Path(temp_dir) / f"card_{i}.qfx" for i in range(3)]
+        write_synthetic_qfx(overlapping[0], 300, seed=3, account_id='4510000000000003')
+        write_synthetic_qfx(overlapping[1], 300, seed=4, account_id='4510000000000004')
+        write_synthetic_qfx(overlapping[2], 300, seed=3, account_id='4510000000000003')
+        sync = RBCNotionSync(incremental=False, state_path=Path(temp_dir) / 'parse_state.db',
+                             review_path=Path(temp_dir) / 'parse_review.db')
+        with contextlib.redirect_stdout(io.StringIO()):
+            merged = sync.parse_files_parallel(overlapping)
+        per_file = [len(QFXParser(str(path)).parse_file()) for path in overlapping[:2]]
+        if len(merged) != sum(per_file):
+            print(f"❌ Parallel parse kept {len(merged)} of {sum(per_file)} rows across two accounts")
+            return False
+        print(f"✅ Parallel parse kept both accounts' {len(merged)} rows and dropped the repeated export")
+
+        # The spending report counts both accounts' rows too
+        report_dir = Path(temp_dir) / 'report'
+        report_dir.mkdir()
+        for path in overlapping:
+            path.rename(report_dir / path.name)
+        sync = RBCNotionSync(mode='report', state_path=Path(temp_dir) / 'report_state.db',
+                             review_path=Path(temp_dir) / 'report_review.db')
+        sync.input_dir = report_dir
+        sync.categorizer = TransactionCategorizer(use_cache=False, use_embeddings=False)
+        sync.setup_categorizer = lambda: True
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            sync.run()
+        if f"{sum(per_file)} unique transaction(s)" not in output.getvalue():
+            print(f"❌ Report did not cover {sum(per_file)} rows across two accounts")
+            return False
+        print(f"✅ Report covered both accounts' {sum(per_file)} rows")
+
+    return True
+
+if __name__ == "__main__":
+    test_sync_modes()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental sync state (processed files + per-account high-water marks)
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sync_state import SyncState
+
+def make_transaction(transaction_id, day, account='4510'):
+    return {'id': transaction_id, 'date': datetime(2025, 7, day), 'account': account}
+
+def test_sync_state():
+    print("Testing sync state...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        state_file = os.path.join(temp_dir, 'sync_state.db')
+        qfx_file = os.path.join(temp_dir, 'statement.qfx')
+        with open(qfx_file, 'w') as f:
+            f.write("<OFX></OFX>")
+
+        state = SyncState(state_file)
+        content_hash = SyncState.hash_file(qfx_file)
+        synced = [make_transaction('A', 10), make_transaction('B', 12), make_transaction('C', 12)]
+        for transaction in synced:
+            state.track(transaction)
+        state.commit([(content_hash, 'statement.qfx')], len(synced))
+        state.save_watermarks()
+        state.close()
+
+        # State survives reopening
+        state = SyncState(state_file)
+        if not state.is_file_processed(content_hash):
+            print("❌ Processed file was not recorded")
+            return False
+        print("✅ Processed file recorded by content hash")
+
+        if state.get_watermark('4510') != datetime(2025, 7, 12):
+            print(f"❌ Unexpected high-water mark: {state.get_watermark('4510')}")
+            return False
+        print(f"✅ High-water mark: {state.get_watermark('4510').date()}")
+
+        expectations = [
+            (make_transaction('OLD', 11), False),           # before the mark
+            (make_transaction('B', 12), False),             # on the mark, already synced
+            (make_transaction('D', 12), True),              # on the mark, new ID
+            (make_transaction('E', 13), True),              # after the mark
+            (make_transaction('F', 1, account='9999'), True),  # other account has no mark
+        ]
+        for transaction, expected in expectations:
+            if state.is_new_transaction(transaction) != expected:
+                print(f"❌ {transaction['id']} on {transaction['date'].date()}: expected new={expected}")
+                return False
+        print("✅ Transactions behind the high-water mark are filtered")
+
+        # Discarded syncs never move the mark, even if another file of the account succeeded
+        state.track(make_transaction('G', 20))
+        state.discard()
+        state.track(make_transaction('H', 25))
+        state.commit([], 1)
+        state.save_watermarks()
+        if state.get_watermark('4510') != datetime(2025, 7, 12):
+            print("❌ Discarded transactions advanced the high-water mark")
+            return False
+        print("✅ Discarded sync left the high-water mark unchanged")
+
+        # Within a run, files are filtered against the marks the run started with
+        state.track(make_transaction('M1', 28))
+        state.commit([('march', 'mar.qfx')], 1)
+        if not state.is_new_transaction(make_transaction('F1', 14)):
+            print("❌ A file synced earlier in the run moved the mark used for filtering")
+            return False
+        state.track(make_transaction('F1', 14))
+        state.commit([('february', 'feb.qfx')], 1)
+        state.save_watermarks()
+        if state.get_watermark('4510') != datetime(2025, 7, 28) or state.is_new_transaction(make_transaction('F1', 14)):
+            print(f"❌ Marks not saved at the end of the run: {state.get_watermark('4510')}")
+            return False
+        print("✅ Out-of-order files filtered against the starting mark, mark saved once at the end")
+        state.close()
+
+    return True
+
+if __name__ == "__main__":
+    test_sync_state()
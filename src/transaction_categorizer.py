@@ -3,16 +3,119 @@ LLM client for transaction categorization using Ollama
 Enhanced with rule-based categorization for known patterns
 """
 
-import ollama
+import itertools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from pathlib import Path
 import re
+import sqlite3
+import threading
+
+from category_cache import CategoryCache
+from rule_journal import RuleJournal
+from rule_matcher import RuleMatcher, normalize_pattern
+from Transaction import STATUS_UPLOADED
+
+# The Ollama client library is imported on first use so parse-only and rules-only runs start fast
+ollama = None
+
+
+def _ollama():
+    """Return the ollama module, importing it on first use"""
+    global ollama
+    if ollama is None:
+        import ollama as ollama_module
+        ollama = ollama_module
+    return ollama
+
+
+# Variable parts of a transaction title: /ABC123, #12345, *ABC123 and standalone numbers
+TITLE_CODE_PATTERN = re.compile(r'[/#*]\w+')
+TITLE_NUMBER_PATTERN = re.compile(r'\b\d+\b')
+
+# Payment processor prefix: one word right before a "*" at the start of the title, e.g. "PAYPAL *", "SQ *", "TST*"
+PROCESSOR_PREFIX_PATTERN = re.compile(r'^([A-Z0-9]+) ?\*\s*(?=\S)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def extract_merchant_pattern(transaction_title: str) -> str:
+    """
+    Reduce a transaction title to its merchant, e.g. "STARBUCKS #12345" -> "STARBUCKS"
+    Used as the merchant key for the category cache and for grouping by merchant
+    """
+    title_upper = transaction_title.upper()
+    
+    # Remove patterns like /ABC123, #12345, *ABC123, then standalone numbers and extra spaces
+    cleaned = TITLE_CODE_PATTERN.sub('', title_upper)
+    cleaned = TITLE_NUMBER_PATTERN.sub('', cleaned)
+    cleaned = WHITESPACE_PATTERN.sub(' ', cleaned).strip()
+    
+    # Take first 1-2 meaningful words
+    words = cleaned.split()
+    if len(words) >= 2:
+        return ' '.join(words[:2])
+    elif len(words) == 1:
+        return words[0]
+    else:
+        return title_upper
+
+
+def merchant_cache_key(transaction_title: str) -> str:
+    """
+    Key for the category cache and for grouping transactions by merchant
+    Like extract_merchant_pattern, but a payment processor prefix keeps the merchant behind it:
+    "PAYPAL *NETFLIX" -> "PAYPAL NETFLIX" and "SQ *PIZZA SHOP" -> "SQ PIZZA SHOP"
+    rather than one key shared by every PayPal or Square merchant
+    """
+    title_upper = transaction_title.upper().strip()
+    prefix = PROCESSOR_PREFIX_PATTERN.match(title_upper)
+    if prefix:
+        return f"{prefix.group(1)} {extract_merchant_pattern(title_upper[prefix.end():])}"
+    return extract_merchant_pattern(title_upper)
+
+
+# One complete ["CATEGORY", confidence] pair of a JSON response, also found in a truncated reply
+JSON_RESULT_PATTERN = re.compile(r'\[\s*"([^"]*)"\s*,\s*([0-9]*\.?[0-9]+)\s*\]')
+
+# Output tokens allowed per transaction in a JSON response (one pair is about 8)
+TOKENS_PER_RESULT = 16
+
+# One row of a batch response, e.g. "3 | Eating Out | 0.85" (brackets and "3." tolerated)
+BATCH_RESPONSE_PATTERN = re.compile(r'^\s*\[?(\d+)\]?[.):]?\s*\|?\s*\[?([^|\[\]]+?)\]?\s*\|\s*\[?([0-9]*\.?[0-9]+)\]?\s*$')
 
 
 class TransactionCategorizer:
-    def __init__(self, model_name: Optional[str] = None, confidence_threshold: float = 0.7):
+    def __init__(self, model_name: Optional[str] = None, confidence_threshold: float = 0.7,
+                 batch_size: int = 10, max_batch_retries: int = 2,
+                 use_cache: bool = True, cache_path: Optional[str] = None,
+                 max_parallel_requests: Optional[int] = None, host: Optional[str] = None,
+                 use_embeddings: bool = True, embedding_model: Optional[str] = None,
+                 embedding_index_path: Optional[str] = None, keep_alive: Optional[str] = None,
+                 interactive: bool = True, review_queue=None):
         self.model_name = model_name
+        # Ollama server address; defaults to OLLAMA_HOST (e.g. a fake_ollama_server.py instance), else localhost
+        self.host = host or os.getenv('OLLAMA_HOST')
+        self._ollama_client = None
+        self._ollama_client_lock = threading.Lock()
+        # How long Ollama keeps the model (and its prompt cache) loaded after each request
+        self.keep_alive = keep_alive or os.getenv('OLLAMA_KEEP_ALIVE', '30m')
         self.confidence_threshold = confidence_threshold  # Threshold for auto-categorization
+        # Headless runs never prompt: low-confidence transactions keep a provisional category and
+        # are flagged needs_review; queue_reviews() records the uploaded ones in review_queue (a ReviewQueue)
+        self.interactive = interactive
+        self.review_queue = review_queue
+        self._deferred_reviews: Dict[tuple[str, str], tuple[str, float]] = {}  # (account, ID) -> (category, confidence)
+        self.batch_size = batch_size  # Transactions per LLM request (1 disables batching)
+        self.max_batch_retries = max_batch_retries  # Re-asks for rows missing from a batch response
+        # Concurrent LLM requests; defaults to the local server's OLLAMA_NUM_PARALLEL setting
+        if max_parallel_requests is None:
+            try:
+                max_parallel_requests = int(os.getenv('OLLAMA_NUM_PARALLEL', '1'))
+            except ValueError:
+                max_parallel_requests = 1
+        self.max_parallel_requests = max(1, max_parallel_requests)
         # Default categories - will be extended with categories from rules file
         self.default_categories = [
             "Partying",      # Alcohol/club/bar (LCBO, Fifth Social Club, Track & Field, etc.)
@@ -28,13 +131,53 @@ class TransactionCategorizer:
             "Vanity"         # Beauty, grooming, personal care (Sephora, barber shops, etc.)
         ]
         
+        # Rules and descriptions accepted during a session are appended here and merged
+        # into transaction_rules.txt by compact_rules()
+        self.rule_journal = RuleJournal(Path(__file__).parent.parent / "transaction_rules.txt")
+        
         # Load rules and dynamically discover categories
         self.rules, self.category_descriptions = self._load_categorization_rules()
         self.categories = self._get_all_categories()
         
-        # If no model specified, prompt user to select one
-        if not self.model_name:
-            self.model_name = self._select_model_interactive()
+        # Compile all rules into one automaton so each title is scanned once
+        self.rule_matcher = RuleMatcher(self.rules)
+        
+        # Remember LLM and manual answers per merchant across runs
+        self.category_cache = None
+        if use_cache:
+            cache_file = Path(cache_path) if cache_path else Path(__file__).parent.parent / "categorization_cache.db"
+            try:
+                categories_hash = CategoryCache.hash_categories(self.categories, self.category_descriptions)
+                self.category_cache = CategoryCache(cache_file, categories_hash)
+            except sqlite3.Error as e:
+                print(f"⚠️  Could not open categorization cache {cache_file}: {e}")
+        
+        # Nearest-neighbour tier between the cache and the LLM: embeddings of confirmed
+        # categorizations, searched by cosine similarity (needs numpy and an Ollama embedding model)
+        self.use_embeddings = use_embeddings
+        self.embedding_model = embedding_model or os.getenv('OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+        self.embedding_index_path = (Path(embedding_index_path) if embedding_index_path
+                                     else Path(__file__).parent.parent / "embedding_index.npz")
+        self.embedding_k = 5                    # Neighbours consulted per transaction
+        self.embedding_min_similarity = 0.9     # Neighbours less similar than this are ignored
+        self.embedding_agreement = 0.8          # Share of the (similarity-weighted) vote a label needs
+        self._embedding_index = None            # Opened on first use
+        
+        # Ollama model list, fetched on first use and reused afterwards
+        self._available_models: Optional[List[str]] = None
+        
+        # Cleared when the server rejects JSON schema formats (Ollama before 0.5); replies are then
+        # requested as plain JSON and checked locally
+        self._schema_format = True
+        
+        # If no model is specified, the user is asked to select one the first time the LLM is needed
+    
+    def _client(self):
+        """Return the Ollama client for self.host, creating it on first use (shared by all threads)"""
+        with self._ollama_client_lock:
+            if self._ollama_client is None:
+                self._ollama_client = _ollama().Client(host=self.host)
+            return self._ollama_client
     
     def _load_categorization_rules(self) -> tuple[Dict[str, str], Dict[str, str]]:
         """
@@ -66,7 +209,8 @@ class TransactionCategorizer:
         try:
             if rules_file.exists():
                 with open(rules_file, 'r', encoding='utf-8') as f:
-                    for line_num, line in enumerate(f, 1):
+                    # Journaled entries not yet compacted into the file count as if appended to it
+                    for line_num, line in enumerate(itertools.chain(f, self.rule_journal.entries()), 1):
                         line = line.strip()
                         
                         # Skip empty lines
@@ -91,14 +235,17 @@ class TransactionCategorizer:
                         if line.startswith('#'):
                             continue
                         
-                        # Parse rule: "SEARCH_STRING -> CATEGORY"
+                        # Parse rule: "SEARCH_STRING -> CATEGORY" (see rule_matcher for the full grammar)
                         if ' -> ' in line:
                             search_string, category = line.split(' -> ', 1)
                             search_string = search_string.strip()
                             category = category.strip()
                             
                             if search_string and category:
-                                rules[search_string.upper()] = category
+                                try:
+                                    rules[normalize_pattern(search_string)] = category
+                                except ValueError as e:
+                                    print(f"Warning: Invalid rule on line {line_num}: {e}")
                         else:
                             print(f"Warning: Invalid rule format on line {line_num}: {line}")
                 
@@ -116,35 +263,11 @@ class TransactionCategorizer:
     
     def _save_category_description(self, category: str, description: str):
         """
-        Save a category description to the transaction_rules.txt file
+        Save a category description (journaled, merged into transaction_rules.txt by compact_rules)
         """
-        rules_file = Path(__file__).parent.parent / "transaction_rules.txt"
-        
         try:
-            # Check if description already exists
-            description_line = f"# CATEGORY_DESC: {category} | {description}"
-            existing_descriptions = set()
-            
-            if rules_file.exists():
-                with open(rules_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # Check if this category description already exists
-                for line in content.split('\n'):
-                    if line.startswith('# CATEGORY_DESC:'):
-                        desc_part = line.replace('# CATEGORY_DESC:', '').strip()
-                        if ' | ' in desc_part:
-                            cat, _ = desc_part.split(' | ', 1)
-                            existing_descriptions.add(cat.strip())
-                
-                # If category description doesn't exist, append it
-                if category not in existing_descriptions:
-                    with open(rules_file, 'a', encoding='utf-8') as f:
-                        f.write(f"\n{description_line}\n")
-                    print(f"✅ Saved description for '{category}' to {rules_file.name}")
-                else:
-                    print(f"ℹ️  Description for '{category}' already exists in {rules_file.name}")
-            
+            self.rule_journal.append_description(category, description)
+            print(f"✅ Saved description for '{category}'")
         except Exception as e:
             print(f"❌ Error saving category description: {e}")
     
@@ -175,24 +298,54 @@ class TransactionCategorizer:
         """
         Apply rule-based categorization
         Returns category if a rule matches, None otherwise
+        If several rules match, the one listed first in the rules file wins
         """
-        transaction_title = transaction['title'].upper()
-        
-        # Check each rule
-        for search_string, category in self.rules.items():
-            if search_string in transaction_title:
-                return category
+        return self.rule_matcher.match(transaction['title'].upper(), transaction.get('location') or '',
+                                       transaction.get('amount'))
+    
+    def _get_cached_category(self, transaction: Dict) -> Optional[tuple[str, float]]:
+        """
+        Look up a previous categorization of this transaction's merchant
+        Returns (category, confidence) or None if nothing usable is cached
+        """
+        if self.category_cache is None:
+            return None
         
+        cached = self.category_cache.get(merchant_cache_key(transaction['title']))
+        if cached and cached[0] in self.categories and cached[1] >= self.confidence_threshold:
+            return cached
         return None
     
+    def _cache_category(self, transaction: Dict, category: str, confidence: float, source: Optional[str] = None):
+        """
+        Remember a categorization for this transaction's merchant
+        source defaults to the current model name; manual answers are stored as "manual"
+        """
+        if self.category_cache is None:
+            return
+        
+        merchant = merchant_cache_key(transaction['title'])
+        try:
+            self.category_cache.put(merchant, category, confidence, source or self.model_name or "unknown")
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not cache category for {merchant}: {e}")
+    
     def _parse_ai_response(self, response_text: str) -> tuple[str, float]:
         """
         Parse AI response to extract category and confidence
+        Accepts the JSON reply ({"results": [...]} or {"category", "confidence"}) and falls back
+        to "Category: ... / Confidence: ..." lines
         Returns (category, confidence)
         """
         category = "Misc"
         confidence = 0.5  # Default low confidence
         
+        results = self._parse_json_results(response_text)
+        if results:
+            answer = results[min(results)]
+            categories_by_name = {name.lower(): name for name in self.categories}
+            return categories_by_name.get(answer[0].lower(), category), answer[1]
+        
         lines = response_text.strip().split('\n')
         
         for line in lines:
@@ -211,15 +364,23 @@ class TransactionCategorizer:
         
         return category, confidence
     
-    def _ask_user_for_category(self, transaction: Dict, ai_category: str, ai_confidence: float) -> str:
+    def _ask_user_for_category(self, transaction: Dict, ai_category: str, ai_confidence: float,
+                               similar: Optional[List[Dict]] = None) -> str:
         """
         Ask user to manually categorize a transaction when AI confidence is low
+        similar lists other transactions from the same merchant that the answer also applies to
         """
         print(f"\n❓ Low confidence categorization for:")
         print(f"   Transaction: {transaction['title']}")
         print(f"   Location: {transaction['location']}")
         print(f"   Amount: ${abs(transaction['amount']):.2f}")
         print(f"   AI suggestion: {ai_category} (confidence: {ai_confidence:.2f})")
+        if similar:
+            print(f"   Also applies to {len(similar)} more transaction(s) from this merchant:")
+            for other in similar[:5]:
+                print(f"      - {other['title']} (${abs(other['amount']):.2f})")
+            if len(similar) > 5:
+                print(f"      ... and {len(similar) - 5} more")
         
         print(f"\n📋 Available categories:")
         for i, category in enumerate(self.categories, 1):
@@ -316,6 +477,54 @@ class TransactionCategorizer:
                 print(f"\nUsing AI suggestion: {ai_category}")
                 return ai_category
     
+    def group_by_merchant(self, transactions: List[Dict]) -> List[List[int]]:
+        """
+        Indexes of the given transactions grouped by merchant (the category cache key),
+        groups and members in order of first appearance
+        """
+        groups: Dict[str, List[int]] = {}
+        for i, transaction in enumerate(transactions):
+            groups.setdefault(merchant_cache_key(transaction['title']), []).append(i)
+        return list(groups.values())
+    
+    def _ask_user_for_merchant(self, transactions: List[Dict], suggestions: List[tuple[str, float]]) -> str:
+        """
+        Ask once for the category of several low-confidence transactions from one merchant
+        The most confident AI suggestion is offered; the answer is cached as a manual answer
+        """
+        best = max(range(len(transactions)), key=lambda i: suggestions[i][1])
+        ai_category, ai_confidence = suggestions[best]
+        category = self._ask_user_for_category(transactions[best], ai_category, ai_confidence,
+                                               transactions[:best] + transactions[best + 1:])
+        self._cache_category(transactions[best], category, 1.0, "manual")
+        return category
+    
+    def _defer_review(self, transaction: Dict, ai_category: str, ai_confidence: float) -> str:
+        """
+        Headless alternative to _ask_user_for_category: flag the transaction for review and
+        return a provisional category (the AI suggestion if it is a known category, else Misc)
+        """
+        category = ai_category if ai_category in self.categories else "Misc"
+        transaction['needs_review'] = True
+        self._deferred_reviews[(transaction.get('account', ''), transaction['id'])] = (category, ai_confidence)
+        return category
+    
+    def queue_reviews(self, transactions: List[Dict]) -> int:
+        """
+        Queue the flagged transactions whose Notion page was just created by the upload
+        Ones that already existed in Notion (or failed to upload) are dropped, so a review
+        never patches a page this tool didn't create; returns how many were queued
+        """
+        queued = 0
+        for transaction in transactions:
+            deferred = self._deferred_reviews.pop((transaction.get('account', ''), transaction['id']), None)
+            if (deferred is None or self.review_queue is None or transaction.get('status') != STATUS_UPLOADED
+                    or not transaction.get('page_id')):
+                continue
+            self.review_queue.add(transaction, *deferred)
+            queued += 1
+        return queued
+    
     def _suggest_new_rule(self, transaction_title: str, category: str):
         """
         Suggest adding a new rule based on user input
@@ -360,9 +569,11 @@ Examples:
 
 Identifying pattern:"""
             
-            response = ollama.chat(
+            response = self._client().chat(
                 model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
+                messages=[{'role': 'user', 'content': prompt}],
+                options={'num_predict': 24, 'temperature': 0},
+                keep_alive=self.keep_alive
             )
             
             pattern = response['message']['content'].strip().upper()
@@ -381,101 +592,64 @@ Identifying pattern:"""
         """
         Fallback manual pattern extraction
         """
-        title_upper = transaction_title.upper()
-        
-        # Remove common patterns
-        import re
+        return extract_merchant_pattern(transaction_title)
+    
+    def _add_rule_to_file(self, pattern: str, category: str):
+        """
+        Add a new rule: applied immediately, journaled, and merged into transaction_rules.txt by compact_rules
+        """
+        try:
+            pattern = normalize_pattern(pattern)
+        except ValueError as e:
+            print(f"❌ Invalid rule pattern {pattern!r}: {e}")
+            return
         
-        # Remove patterns like /ABC123, #12345, *ABC123
-        cleaned = re.sub(r'[/#*]\w+', '', title_upper)
+        new_rule = f"{pattern} -> {category}"
+        if self.rules.get(pattern) == category:
+            print(f"✅ Rule already exists: {new_rule}")
+            return
         
-        # Remove standalone numbers
-        cleaned = re.sub(r'\b\d+\b', '', cleaned)
+        try:
+            self.rule_journal.append_rule(pattern, category)
+        except Exception as e:
+            print(f"❌ Error adding rule to file: {e}")
+            print(f"Please manually add: {new_rule}")
+            return
         
-        # Remove extra spaces
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+        print(f"✅ Added rule: {new_rule}")
         
-        # Take first 1-2 meaningful words
-        words = cleaned.split()
-        if len(words) >= 2:
-            return ' '.join(words[:2])
-        elif len(words) == 1:
-            return words[0]
-        else:
-            return title_upper
+        # Update our in-memory rules
+        self.rules[pattern] = category
+        self.rule_matcher.add(pattern, category)
     
-    def _add_rule_to_file(self, pattern: str, category: str):
+    def compact_rules(self) -> int:
         """
-        Add a new rule to the transaction_rules.txt file
+        Merge journaled rules and descriptions into transaction_rules.txt (one atomic rewrite)
+        Returns the number of entries merged
         """
-        rules_file = Path(__file__).parent.parent / "transaction_rules.txt"
-        
         try:
-            # Read existing content
-            existing_content = ""
-            if rules_file.exists():
-                with open(rules_file, 'r', encoding='utf-8') as f:
-                    existing_content = f.read()
-            
-            # Check if rule already exists
-            new_rule = f"{pattern} -> {category}"
-            if new_rule in existing_content:
-                print(f"✅ Rule already exists: {new_rule}")
-                return
-            
-            # Find the right section to add the rule
-            section_headers = {
-                'Transportation': '# Transportation',
-                'Groceries': '# Groceries',
-                'Subscription': '# Subscriptions',
-                'Partying': '# Partying (Alcohol/Bars/Clubs)',
-                'Cafe': '# Coffee/Cafes',
-                'Eating Out': '# Eating Out',
-                'Clothing': '# Clothing',
-                'Technology': '# Technology',
-                'Events': '# Events',
-                'Vanity': '# Vanity',
-                'Misc': '# Misc (known patterns that should be misc)'
-            }
-            
-            header = section_headers.get(category, '# Misc (known patterns that should be misc)')
-            
-            # Add rule to appropriate section
-            lines = existing_content.split('\n')
-            insert_index = len(lines)
-            
-            # Find the section
-            for i, line in enumerate(lines):
-                if line.strip() == header:
-                    # Find next section or end of file
-                    for j in range(i + 1, len(lines)):
-                        if lines[j].strip().startswith('# ') and lines[j].strip() != header:
-                            insert_index = j
-                            break
-                    else:
-                        insert_index = len(lines)
-                    break
-            
-            # Insert the new rule
-            lines.insert(insert_index, f"{pattern} -> {category}")
-            
-            # Write back to file
-            with open(rules_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(lines))
-            
-            print(f"✅ Added rule to {rules_file}: {new_rule}")
-            
-            # Update our in-memory rules
-            self.rules[pattern] = category
-            
+            merged = self.rule_journal.compact()
         except Exception as e:
-            print(f"❌ Error adding rule to file: {e}")
-            print(f"Please manually add: {pattern} -> {category}")
+            print(f"❌ Error merging rule journal (kept in {self.rule_journal.journal_path.name}): {e}")
+            return 0
+        if merged:
+            print(f"📋 Merged {merged} new rule(s)/description(s) into {self.rule_journal.rules_path.name}")
+        return merged
     
-    def _get_available_models(self) -> List[str]:
-        """Get list of available Ollama models"""
+    def _get_available_models(self, refresh: bool = False) -> List[str]:
+        """Get list of available Ollama models (cached after the first successful call)"""
+        if self._available_models and not refresh:
+            return self._available_models
+        
+        model_names = self._fetch_available_models()
+        if model_names:
+            self._available_models = model_names
+        return model_names
+    
+    def _fetch_available_models(self) -> List[str]:
+        """Ask the Ollama server for its list of models"""
         try:
-            models_response = ollama.list()
+            models_response = self._client().list()
             
             # Handle different response structures
             if 'models' in models_response:
@@ -536,6 +710,12 @@ Identifying pattern:"""
         if recommended:
             print(f"\n💡 Recommended: {recommended[0]} (Llama models work well for categorization)")
         
+        # Headless runs take the default instead of waiting for input
+        if not self.interactive:
+            selected = recommended[0] if recommended else available_models[0]
+            print(f"Using default: {selected}")
+            return selected
+        
         # Prompt for selection
         while True:
             try:
@@ -561,39 +741,212 @@ Identifying pattern:"""
                 print("\nUsing default model: llama3.2")
                 return "llama3.2"
     
-    def _create_categorization_prompt(self, transaction: Dict) -> str:
+    def _create_system_prompt(self) -> str:
         """
-        Create a prompt for the LLM to categorize a transaction with confidence
+        Create the system message shared by every categorization request
+        It holds everything static (categories, rules, output format) so Ollama can reuse
+        its evaluation of this prefix from one request to the next
         """
-        # Build categories list dynamically using descriptions
-        categories_text = ""
-        for category in self.categories:
-            description = self.category_descriptions.get(category, "Custom category")
-            categories_text += f"- {category}: {description}\n"
+        categories_text = self._format_categories_for_prompt()
         
-        prompt = f"""You are a transaction categorization assistant. Given a credit card transaction, categorize it into one of these exact categories and provide a confidence score.
+        return f"""You are a transaction categorization assistant. Categorize each numbered credit card transaction into one of these exact categories and provide a confidence score.
 
 Categories:
 {categories_text.strip()}
 
-Transaction Details:
-- Name: {transaction['title']}
-- Location: {transaction['location']}
-- Amount: ${abs(transaction['amount']):.2f}
-
-Response format (exactly like this):
-Category: [CATEGORY_NAME]
-Confidence: [0.0-1.0]
-
 Rules:
 1. Category must be exactly one of the categories listed above
 2. Confidence should be between 0.0 (not sure) and 1.0 (very sure)
 3. Consider how clearly the merchant name indicates the category
 4. If merchant name is unclear or ambiguous, use lower confidence
+5. Answer every transaction exactly once, in the order given
 
-Response:"""
+Respond with JSON only: one [category, confidence] pair per transaction, like this:
+{{"results": [["CATEGORY_NAME", 0.9]]}}"""
+    
+    def _create_user_prompt(self, transactions: List[Dict]) -> str:
+        """
+        Create the small per-request message listing the transactions to categorize
+        """
+        lines = [f"{number}. Name: {transaction['title']} | Location: {transaction['location']} | "
+                 f"Amount: ${abs(transaction['amount']):.2f}"
+                 for number, transaction in enumerate(transactions, 1)]
+        return "Transactions:\n" + '\n'.join(lines)
+    
+    def _create_categorization_messages(self, transactions: List[Dict]) -> List[Dict[str, str]]:
+        """
+        Chat messages asking the LLM to categorize one or more transactions
+        """
+        return [
+            {'role': 'system', 'content': self._create_system_prompt()},
+            {'role': 'user', 'content': self._create_user_prompt(transactions)}
+        ]
+    
+    def _response_format(self, count: int) -> Dict:
+        """
+        JSON schema for the reply: exactly one [category, confidence] pair per transaction,
+        known categories only
+        """
+        return {
+            'type': 'object',
+            'properties': {
+                'results': {
+                    'type': 'array',
+                    'minItems': count,
+                    'maxItems': count,
+                    'items': {
+                        'type': 'array',
+                        'prefixItems': [
+                            {'type': 'string', 'enum': list(self.categories)},
+                            {'type': 'number'}
+                        ],
+                        'minItems': 2,
+                        'maxItems': 2
+                    }
+                }
+            },
+            'required': ['results']
+        }
+    
+    def _request_categories(self, transactions: List[Dict]) -> str:
+        """
+        Send one categorization request and return the raw reply text
+        Output is constrained to the JSON schema and capped at TOKENS_PER_RESULT per transaction
+        If the server rejects the schema, this and later requests fall back to format='json'
+        """
+        request = {
+            'model': self.model_name,
+            'messages': self._create_categorization_messages(transactions),
+            'options': {'num_predict': 16 + TOKENS_PER_RESULT * len(transactions), 'temperature': 0},
+            'keep_alive': self.keep_alive
+        }
+        if self._schema_format:
+            try:
+                response = self._client().chat(format=self._response_format(len(transactions)), **request)
+                return response['message']['content']
+            except _ollama().ResponseError as e:
+                if e.status_code != 400 and 'format' not in str(e.error).lower():
+                    raise
+                with self._ollama_client_lock:
+                    warn, self._schema_format = self._schema_format, False
+                if warn:
+                    print(f"⚠️  Ollama rejected the JSON schema format ({e.error}); requesting plain JSON instead")
+                    print("   Structured outputs need Ollama 0.5 or newer")
         
-        return prompt
+        response = self._client().chat(format='json', **request)
+        return response['message']['content']
+    
+    def _parse_json_results(self, response_text: str, expected: Optional[int] = None) -> Dict[int, tuple[str, float]]:
+        """
+        Parse a JSON reply into {transaction number: (category as written, confidence)}
+        Results are [category, confidence] pairs in transaction order ({"category", "confidence"}
+        objects are accepted too); complete pairs are still recovered from a reply cut off by num_predict
+        A complete list of pairs with other than the expected count can't be aligned and gives no results,
+        and confidences outside 0..1 are dropped, since without the schema the model may return either
+        """
+        rows = []
+        try:
+            data = json.loads(response_text)
+            if isinstance(data, dict) and isinstance(data.get('results'), list):
+                if (expected is not None and len(data['results']) != expected
+                        and not all(isinstance(item, dict) and 'number' in item for item in data['results'])):
+                    return {}
+                for position, item in enumerate(data['results'], 1):
+                    if isinstance(item, list) and len(item) == 2:
+                        rows.append((position, item[0], item[1]))
+                    elif isinstance(item, dict):
+                        rows.append((item.get('number', position), item.get('category'), item.get('confidence')))
+            elif isinstance(data, dict) and 'category' in data:
+                rows = [(1, data.get('category'), data.get('confidence'))]
+        except ValueError:
+            rows = [(position, category, confidence) for position, (category, confidence)
+                    in enumerate(JSON_RESULT_PATTERN.findall(response_text), 1)]
+        
+        results = {}
+        for number, category, confidence in rows:
+            try:
+                number, confidence = int(number), float(confidence)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(category, str) and 0.0 <= confidence <= 1.0 and number not in results:
+                results[number] = (category.strip(), confidence)
+        return results
+    
+    def _format_categories_for_prompt(self) -> str:
+        """
+        Build the category list (with descriptions) shared by all categorization prompts
+        """
+        categories_text = ""
+        for category in self.categories:
+            description = self.category_descriptions.get(category, "Custom category")
+            categories_text += f"- {category}: {description}\n"
+        return categories_text
+    
+    def _parse_batch_response(self, response_text: str, batch_length: int) -> Dict[int, tuple[str, float]]:
+        """
+        Parse a batch response: the JSON reply, or "NUMBER | CATEGORY | CONFIDENCE" lines
+        Returns {zero-based index: (category, confidence)} for valid rows only;
+        rows with unknown numbers, unknown categories or bad confidences are dropped
+        """
+        categories_by_name = {category.lower(): category for category in self.categories}
+        results = {}
+        
+        for number, (category, confidence) in self._parse_json_results(response_text, batch_length).items():
+            category = categories_by_name.get(category.lower())
+            if 0 <= number - 1 < batch_length and category:
+                results[number - 1] = (category, confidence)
+        if results:
+            return results
+        
+        for line in response_text.strip().split('\n'):
+            match = BATCH_RESPONSE_PATTERN.match(line)
+            if not match:
+                continue
+            
+            index = int(match.group(1)) - 1
+            category = categories_by_name.get(match.group(2).strip().lower())
+            try:
+                confidence = max(0.0, min(1.0, float(match.group(3))))
+            except ValueError:
+                continue
+            
+            if 0 <= index < batch_length and category and index not in results:
+                results[index] = (category, confidence)
+        
+        return results
+    
+    def categorize_batch(self, transactions: List[Dict]) -> List[Optional[tuple[str, float]]]:
+        """
+        Ask the LLM for (category, confidence) of several transactions in one request
+        Rows missing or malformed in the response are re-asked up to max_batch_retries times
+        Returns one entry per transaction, None where no valid answer was obtained
+        """
+        if not self.model_name:
+            self.model_name = self._select_model_interactive()
+        
+        results: List[Optional[tuple[str, float]]] = [None] * len(transactions)
+        pending = list(range(len(transactions)))
+        
+        for attempt in range(self.max_batch_retries + 1):
+            if not pending:
+                break
+            
+            batch = [transactions[i] for i in pending]
+            try:
+                response_text = self._request_categories(batch)
+            except Exception as e:
+                print(f"Error categorizing batch of {len(batch)} transactions: {e}")
+                break
+            
+            parsed = self._parse_batch_response(response_text, len(batch))
+            for batch_index, suggestion in parsed.items():
+                results[pending[batch_index]] = suggestion
+            
+            pending = [i for i in pending if results[i] is None]
+            if pending and attempt < self.max_batch_retries:
+                print(f"   Re-asking for {len(pending)} transaction(s) missing from the batch response...")
+        
+        return results
     
     def categorize_transaction(self, transaction: Dict) -> str:
         """
@@ -605,119 +958,309 @@ Response:"""
         if rule_category:
             return rule_category
         
+        # Then reuse an earlier answer for the same merchant
+        cached = self._get_cached_category(transaction)
+        if cached:
+            return cached[0]
+        
         # If no rule matches, fall back to AI with confidence
+        suggestion = self._get_ai_suggestion(transaction)
+        if suggestion is None:
+            return "Misc"
+        
+        category, confidence = suggestion
+        
+        # If confidence is below threshold, ask user (or queue it for review when headless)
+        if confidence < self.confidence_threshold:
+            if not self.interactive:
+                return self._defer_review(transaction, category, confidence)
+            category = self._ask_user_for_category(transaction, category, confidence)
+            self._cache_category(transaction, category, 1.0, "manual")
+            return category
+        
+        # Validate that the category is one of our expected categories
+        if category in self.categories:
+            self._cache_category(transaction, category, confidence)
+            return category
+        else:
+            print(f"Warning: LLM returned unexpected category '{category}' for {transaction['title']}, using 'Misc'")
+            return "Misc"
+    
+    def _get_ai_suggestion(self, transaction: Dict) -> Optional[tuple[str, float]]:
+        """
+        Ask the LLM to categorize a single transaction
+        Returns (category, confidence), or None if the request failed
+        """
         # Ensure we have a model name
         if not self.model_name:
             self.model_name = self._select_model_interactive()
         
         try:
-            prompt = self._create_categorization_prompt(transaction)
-            
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[
-                    {
-                        'role': 'user',
-                        'content': prompt
-                    }
-                ]
-            )
+            response_text = self._request_categories([transaction]).strip()
             
             # Parse the response to get category and confidence
-            response_text = response['message']['content'].strip()
-            category, confidence = self._parse_ai_response(response_text)
+            return self._parse_ai_response(response_text)
             
-            # If confidence is below threshold, ask user
-            if confidence < self.confidence_threshold:
-                return self._ask_user_for_category(transaction, category, confidence)
-            
-            # Validate that the category is one of our expected categories
-            if category in self.categories:
-                return category
-            else:
-                print(f"Warning: LLM returned unexpected category '{category}' for {transaction['title']}, using 'Misc'")
-                return "Misc"
-                
         except Exception as e:
             print(f"Error categorizing transaction {transaction['title']}: {e}")
-            return "Misc"
+            return None
+    
+    def _suggest_categories(self, transactions: List[Dict]) -> List[Optional[tuple[str, float]]]:
+        """
+        Get AI suggestions for one chunk of transactions (one batch request, or a single
+        prompt for a chunk of one). Rows a batch could not answer are asked individually
+        Safe to call from worker threads: it never prompts the user
+        """
+        if len(transactions) == 1:
+            return [self._get_ai_suggestion(transactions[0])]
+        
+        results = self.categorize_batch(transactions)
+        return [result if result else self._get_ai_suggestion(transaction)
+                for transaction, result in zip(transactions, results)]
     
     def categorize_transactions(self, transactions: List[Dict]) -> List[str]:
         """
         Categorize multiple transactions
-        Returns list of category names in same order as input transactions
+        Rule misses are looked up in the merchant cache, then labeled from similar confirmed
+        merchants (embedding nearest neighbours), and the rest are sent to the LLM
+        (batched and concurrently, identical charges once) before any manual prompts,
+        which are asked once per merchant
+        Each transaction's category is set inline; the list of category names is also returned
+        in the same order as the input transactions
         """
         categories = []
         rules_used = 0
+        cache_used = 0
+        neighbours_used = 0
         ai_auto = 0
         ai_manual = 0
+        deferred = 0
+        
+        print(f"🤖 Categorizing {len(transactions)} transactions using rules + {self.model_name or 'AI'}...")
+        below_threshold = "asks for manual input" if self.interactive else "is queued for review"
+        print(f"   Confidence threshold: {self.confidence_threshold:.1f} (below this {below_threshold})")
+        
+        rule_categories = [self._apply_rules(transaction) for transaction in transactions]
+        rule_count = len(self.rule_matcher)
+        
+        # Merchants categorized in earlier runs don't need the LLM
+        cached_categories = {}
+        for i, category in enumerate(rule_categories):
+            if not category:
+                cached = self._get_cached_category(transactions[i])
+                if cached:
+                    cached_categories[i] = cached[0]
+        
+        unmatched = [i for i, category in enumerate(rule_categories) if not category and i not in cached_categories]
+        
+        # Close variants of merchants confirmed before are labeled by their nearest neighbours,
+        # which costs one embedding call instead of a chat completion
+        neighbour_categories = {}
+        embeddings = {}
+        if unmatched and self.use_embeddings:
+            neighbour_results, vectors = self._suggest_from_neighbours([transactions[i] for i in unmatched])
+            if vectors is not None:
+                embeddings = dict(zip(unmatched, vectors))
+            for i, suggestion in zip(unmatched, neighbour_results):
+                if suggestion and suggestion[1] >= self.confidence_threshold:
+                    neighbour_categories[i] = suggestion
+            unmatched = [i for i in unmatched if i not in neighbour_categories]
+        
+        # Send every remaining transaction to the LLM, in batches of batch_size and with up
+        # to max_parallel_requests requests in flight. Nothing here waits on the user;
+        # low-confidence results are reviewed in the loop below
+        suggestions = {}
+        if unmatched:
+            if not self.model_name:
+                self.model_name = self._select_model_interactive()
+            
+            # Repeats of the same charge (same title and location) get the same answer, so each is asked once
+            duplicates: Dict[tuple[str, str], List[int]] = {}
+            for i in unmatched:
+                duplicates.setdefault((transactions[i]['title'], transactions[i]['location']), []).append(i)
+            distinct = [indexes[0] for indexes in duplicates.values()]
+            
+            chunk_size = max(1, self.batch_size)
+            chunks = [distinct[start:start + chunk_size] for start in range(0, len(distinct), chunk_size)]
+            print(f"   Sending {len(distinct)} distinct unmatched transactions to the LLM "
+                  f"({len(chunks)} request(s), up to {self.max_parallel_requests} at a time)...")
+            
+            def suggest_chunk(chunk: List[int]) -> List[Optional[tuple[str, float]]]:
+                return self._suggest_categories([transactions[i] for i in chunk])
+            
+            if self.max_parallel_requests > 1 and len(chunks) > 1:
+                with ThreadPoolExecutor(max_workers=self.max_parallel_requests) as executor:
+                    chunk_results = list(executor.map(suggest_chunk, chunks))
+            else:
+                chunk_results = [suggest_chunk(chunk) for chunk in chunks]
+            
+            for chunk, results in zip(chunks, chunk_results):
+                for index, suggestion in zip(chunk, results):
+                    if suggestion:
+                        for i in duplicates[(transactions[index]['title'], transactions[index]['location'])]:
+                            suggestions[i] = suggestion
         
-        print(f"🤖 Categorizing {len(transactions)} transactions using rules + {self.model_name}...")
-        print(f"   Confidence threshold: {self.confidence_threshold:.1f} (below this asks for manual input)")
+        # Low-confidence answers are reviewed once per merchant: one prompt labels the whole group
+        reviewed = {}
+        low_confidence = [i for i in sorted(suggestions) if suggestions[i][1] < self.confidence_threshold]
+        if low_confidence and self.interactive:
+            groups = self.group_by_merchant([transactions[i] for i in low_confidence])
+            if len(groups) < len(low_confidence):
+                print(f"\n❓ {len(low_confidence)} low-confidence transactions from {len(groups)} merchant(s), "
+                      f"asking once per merchant")
+            for group in groups:
+                # A rule added while answering an earlier merchant may cover this one
+                members = [low_confidence[j] for j in group if not self._apply_rules(transactions[low_confidence[j]])]
+                if not members:
+                    continue
+                category = self._ask_user_for_merchant([transactions[i] for i in members],
+                                                       [suggestions[i] for i in members])
+                for i in members:
+                    reviewed[i] = category
         
+        confirmed = []  # Indexes whose category the LLM or the user settled, for the embedding index
         for i, transaction in enumerate(transactions):
-            # Check if rule applies first
-            rule_category = self._apply_rules(transaction)
+            rule_category = rule_categories[i]
+            
+            # A rule added during a manual prompt may now cover later transactions
+            if not rule_category and i not in reviewed and len(self.rule_matcher) != rule_count:
+                rule_category = self._apply_rules(transaction)
             
             if rule_category:
                 category = rule_category
                 method = "📏 Rule"
                 rules_used += 1
-            else:
-                # Get AI categorization with confidence check
-                original_categorize = self.categorize_transaction
-                # Temporarily override to get detailed info
-                category = self._categorize_with_confidence_info(transaction)
-                
-                if hasattr(self, '_last_was_manual') and self._last_was_manual:
+            elif i in cached_categories:
+                category = cached_categories[i]
+                method = "💾 Cache"
+                cache_used += 1
+            elif i in neighbour_categories:
+                category, confidence = neighbour_categories[i]
+                self._cache_category(transaction, category, confidence, "embedding")
+                method = "🧭 Neighbours"
+                neighbours_used += 1
+            elif i in suggestions:
+                ai_category, confidence = suggestions[i]
+                if confidence < self.confidence_threshold and not self.interactive:
+                    category = self._defer_review(transaction, ai_category, confidence)
+                    method = "📝 Review"
+                    deferred += 1
+                elif confidence < self.confidence_threshold:
+                    category = reviewed[i]
+                    confirmed.append(i)
                     method = "❓ Manual"
                     ai_manual += 1
-                    delattr(self, '_last_was_manual')
+                elif ai_category in self.categories:
+                    category = ai_category
+                    self._cache_category(transaction, category, confidence)
+                    confirmed.append(i)
+                    method = "🤖 AI"
+                    ai_auto += 1
                 else:
+                    category = "Misc"
                     method = "🤖 AI"
                     ai_auto += 1
+            else:
+                # The LLM request failed (error already printed)
+                category = "Misc"
+                method = "🤖 AI"
+                ai_auto += 1
             
+            transaction['category'] = category
             categories.append(category)
             print(f"   {i+1:3d}. {transaction['title'][:30]:<30} → {category:<15} ({method})")
         
-        print(f"\n📊 Categorization summary: {rules_used} by rules, {ai_auto} by AI, {ai_manual} manual")
+        learned = [i for i in confirmed if i in embeddings]
+        if learned:
+            self._learn_embeddings([transactions[i] for i in learned], [embeddings[i] for i in learned],
+                                   [categories[i] for i in learned])
+        
+        print(f"\n📊 Categorization summary: {rules_used} by rules, {cache_used} from cache, "
+              f"{neighbours_used} by nearest neighbours, {ai_auto} by AI, {ai_manual} manual"
+              + (f", {deferred} flagged for review" if deferred else ""))
         return categories
     
-    def _categorize_with_confidence_info(self, transaction: Dict) -> str:
+    def _embedding_text(self, transaction: Dict) -> str:
+        """Text embedded for the nearest-neighbour tier: merchant title and location"""
+        return f"{transaction['title']} {transaction['location']}".strip()
+    
+    def _get_embedding_index(self):
+        """Open the embedding index on first use; returns None (and disables the tier) if unavailable"""
+        if not self.use_embeddings:
+            return None
+        if self._embedding_index is None:
+            try:
+                from embedding_index import EmbeddingIndex
+                self._embedding_index = EmbeddingIndex(self.embedding_index_path, self.embedding_model)
+            except ImportError as e:
+                print(f"⚠️  Nearest-neighbour categorization disabled: {e}")
+                self.use_embeddings = False
+        return self._embedding_index
+    
+    def _embed(self, texts: List[str], chunk_size: int = 256) -> Optional[list]:
         """
-        Helper method to categorize and track if manual input was used
+        Embed texts with the Ollama embedding model
+        Returns one vector per text, or None (and disables the tier for this run) if the model is unavailable
+        or the server predates /api/embed (Ollama 0.3), so the warning is printed once rather than per batch
         """
-        # This is a bit hacky but allows us to track manual vs auto AI
-        rule_category = self._apply_rules(transaction)
-        if rule_category:
-            return rule_category
-        
-        if not self.model_name:
-            self.model_name = self._select_model_interactive()
-        
+        vectors = []
         try:
-            prompt = self._create_categorization_prompt(transaction)
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-            
-            response_text = response['message']['content'].strip()
-            category, confidence = self._parse_ai_response(response_text)
-            
-            if confidence < self.confidence_threshold:
-                self._last_was_manual = True
-                return self._ask_user_for_category(transaction, category, confidence)
-            
-            return category if category in self.categories else "Misc"
-            
+            for start in range(0, len(texts), chunk_size):
+                response = self._client().embed(model=self.embedding_model, input=texts[start:start + chunk_size])
+                vectors.extend(response['embeddings'])
         except Exception as e:
-            print(f"Error categorizing transaction {transaction['title']}: {e}")
-            return "Misc"
+            print(f"⚠️  Embedding model {self.embedding_model} unavailable ({e}); skipping nearest-neighbour tier")
+            print(f"   Try running: ollama pull {self.embedding_model}")
+            self.use_embeddings = False
+            return None
+        return vectors
+    
+    def _suggest_from_neighbours(self, transactions: List[Dict]) -> tuple[List[Optional[tuple[str, float]]], Optional[list]]:
+        """
+        Label transactions from previously confirmed categorizations of similar merchants
+        Returns ([(category, confidence) or None per transaction], embeddings or None)
+        The embeddings are returned so confirmed answers can be added to the index without re-embedding
+        """
+        index = self._get_embedding_index()
+        if index is None or not transactions:
+            return [None] * len(transactions), None
+        
+        vectors = self._embed([self._embedding_text(transaction) for transaction in transactions])
+        if vectors is None:
+            return [None] * len(transactions), None
+        
+        suggestions = index.classify(vectors, k=self.embedding_k, min_similarity=self.embedding_min_similarity,
+                                     agreement=self.embedding_agreement, allowed_categories=self.categories)
+        return suggestions, vectors
+    
+    def _learn_embeddings(self, transactions: List[Dict], vectors: list, categories: List[str]):
+        """Add confirmed categorizations to the embedding index and save it"""
+        index = self._get_embedding_index()
+        if index is None or not transactions:
+            return
+        index.add([self._embedding_text(transaction) for transaction in transactions], vectors, categories)
+        index.save()
+    
+    def categorize_offline(self, transactions: List[Dict]) -> int:
+        """
+        Set each transaction's category from the rules or the merchant cache, without the LLM
+        Transactions neither covers are left uncategorized; returns how many were categorized
+        """
+        categorized = 0
+        for transaction in transactions:
+            category = self._apply_rules(transaction)
+            if not category:
+                cached = self._get_cached_category(transaction)
+                category = cached[0] if cached else None
+            if category:
+                transaction['category'] = category
+                categorized += 1
+        return categorized
     
     def test_connection(self) -> bool:
         """
         Test connection to Ollama and check if model is available
+        Only lists the server's models (no inference), so it is fast even with a cold model
         """
         try:
             # Get available models
@@ -743,18 +1286,6 @@ Response:"""
             
             if model_available:
                 print(f"✅ Model {self.model_name} is available")
-                
-                # Test with a simple prompt
-                test_transaction = {
-                    'title': 'STARBUCKS',
-                    'location': 'TORONTO ON',
-                    'amount': -5.50
-                }
-                
-                print("🧪 Testing categorization...")
-                category = self.categorize_transaction(test_transaction)
-                print(f"   Test result: STARBUCKS → {category}")
-                
                 return True
             else:
                 print(f"❌ Model {self.model_name} not found")